@@ -5,16 +5,125 @@ Stateless FastAPI microservice for AI-powered interview preparation.
 Uses Groq API for LLM, preserves existing RAG and embeddings.
 """
 
-from fastapi import FastAPI, HTTPException
-from models.request_models import QueryRequest, QueryResponse
-from services.llm_service import process_query
-from utils.errors import AIServiceError
+import time
+
+# Cold-start clock, started before the imports below
+_PROCESS_STARTED = time.monotonic()
+
+import asyncio
+import hmac
+import json
+import math
+import os
+from contextlib import asynccontextmanager
+from typing import Optional
+from fastapi import FastAPI, Header, HTTPException
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from models.request_models import BatchQueryRequest, QueryRequest, QueryResponse
+from services.llm_service import BATCH_MAX_RESUMES, batch_query, process_query, stream_query
+from services.rag_service import get_retrieval_cache, get_vector_store
+from services.embedding_service import get_batcher, get_cache, warm_up
+from prompts.token_budget import get_tokenizer
+from services.scraper_service import get_company_cache
+from services.response_cache import get_response_cache
+from services.session_service import get_session_store
+from services.admission import AdmissionController, admission_stats, get_admission
+from clients.groq_client import aclose, get_async_client, get_llm_stats
+from clients.rate_limiter import rate_limit_stats
+from utils.errors import AIServiceError, LLMRateLimitError, OverloadedError, SessionNotFoundError
+from utils.metrics import COLD_START, ERRORS, MetricsMiddleware, register_stats
+from utils.profiler import sample_stacks
+
+# Shared secret for /admin endpoints (sent as X-Admin-Token); unset disables them
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "60"))
+
+# Ingest the sample knowledge base during warm-up (idempotent: unchanged
+# documents are skipped)
+SEED_KNOWLEDGE_BASE = os.getenv("SEED_KNOWLEDGE_BASE", "0") == "1"
+
+_readiness = {"ready": False, "phase": "starting", "error": None, "cold_start_seconds": None}
+
+
+def _warm_up():
+    """
+    Bring the worker to full speed before it reports ready.
+    
+    Opens the vector store, loads the embedding model with one dummy
+    encode, the prompt tokenizer and the LLM client, and optionally seeds
+    the knowledge base, timing each phase.
+    """
+    phases = [
+        ("vector_store", get_vector_store().open),
+        ("embedding_model", warm_up),
+        ("prompt_tokenizer", get_tokenizer),
+        ("llm_client", get_async_client)
+    ]
+    if SEED_KNOWLEDGE_BASE:
+        phases.append(("seed_knowledge_base", initialize_RAG))
+    
+    for phase, step in phases:
+        _readiness["phase"] = phase
+        started = time.monotonic()
+        step()
+        COLD_START.labels(phase).set(time.monotonic() - started)
+    
+    total = time.monotonic() - _PROCESS_STARTED
+    COLD_START.labels("total").set(total)
+    _readiness.update(ready=True, phase="ready", cold_start_seconds=round(total, 3))
+    print(f"Worker ready in {total:.2f}s")
+
+
+async def _run_warm_up():
+    try:
+        await asyncio.to_thread(_warm_up)
+    except Exception as e:
+        _readiness["error"] = f"{_readiness['phase']}: {e}"
+        print(f"Warm-up failed: {_readiness['error']}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Application lifespan: warm up in the background on startup, release
+    pools on shutdown. The health endpoint answers immediately; /ready
+    waits for the warm-up.
+    """
+    warm_up_task = asyncio.create_task(_run_warm_up())
+    yield
+    warm_up_task.cancel()
+    await aclose()
+
 
 app = FastAPI(
     title="NeuraFlow AI Services",
     description="AI microservice powered by Groq with RAG",
-    version="2.0.0"
+    version="2.0.0",
+    lifespan=lifespan
 )
+app.add_middleware(MetricsMiddleware)
+
+# Component counters are read from their stats() only when /metrics is scraped
+register_stats("response_cache", lambda: get_response_cache().stats(),
+               counters=("hits", "misses", "coalesced"), gauges=("entries", "in_flight"))
+register_stats("company_cache", lambda: get_company_cache().stats(),
+               counters=("hits", "misses", "coalesced"), gauges=("entries", "in_flight"))
+register_stats("embedding_cache", lambda: get_cache().stats(),
+               counters=("memory_hits", "disk_hits", "misses", "evictions"), gauges=("memory_entries",))
+register_stats("retrieval_cache", lambda: get_retrieval_cache().stats(),
+               counters=("hits", "misses", "invalidations"), gauges=("entries", "hit_rate"))
+register_stats("embedding_batcher", lambda: get_batcher().stats(),
+               counters=("batches", "items"), gauges=("queue_depth",))
+register_stats("sessions", lambda: get_session_store().stats(), gauges=("memory_sessions",))
+register_stats("llm", lambda: get_llm_stats().stats(),
+               counters=("attempts", "failures", "fallbacks", "hedges", "hedge_wins"))
+register_stats("rate_limiter", rate_limit_stats, label="model",
+               counters=("granted", "throttled_429"),
+               gauges=("queue_depth", "requests_available", "tokens_available"))
+register_stats("admission", lambda: {kind: get_admission(kind).stats() for kind in ("analysis", "followup")},
+               label="kind", counters=("admitted", "rejected", "timed_out"),
+               gauges=("active", "waiting", "utilisation"))
 
 
 @app.get("/")
@@ -24,10 +133,97 @@ def health_check():
         "service": "NeuraFlow AI Services",
         "status": "running",
         "version": "2.0.0",
-        "llm_provider": "Groq"
+        "llm_provider": "Groq",
+        "ready": _readiness["ready"],
+        "embedding_batcher": get_batcher().stats(),
+        "embedding_cache": get_cache().stats(),
+        "retrieval_cache": get_retrieval_cache().stats(),
+        "company_cache": get_company_cache().stats(),
+        "response_cache": get_response_cache().stats(),
+        "sessions": get_session_store().stats(),
+        "llm": get_llm_stats().stats(),
+        "rate_limits": rate_limit_stats(),
+        "admission": admission_stats()
     }
 
 
+@app.get("/ready")
+def ready():
+    """
+    Readiness probe: 200 once the worker is warm, 503 while warming up
+    or after a failed warm-up, so traffic only reaches warm replicas.
+    """
+    if not _readiness["ready"]:
+        return JSONResponse(status_code=503, content=_readiness)
+    return _readiness
+
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus metrics."""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
+def _require_admin(token: Optional[str]):
+    """Reject callers without the admin token; hide admin routes when none is set."""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not token or not hmac.compare_digest(token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+
+@app.post("/admin/profile")
+async def profile(
+    seconds: float = 10.0,
+    interval_ms: float = 10.0,
+    include_idle: bool = False,
+    format: str = "json",
+    x_admin_token: Optional[str] = Header(None)
+):
+    """
+    Sample this worker's stacks for a few seconds.
+    
+    Requests keep being served while the profile runs. With
+    format=collapsed the body is plain collapsed stacks for
+    flamegraph.pl / speedscope; otherwise JSON with a top-functions
+    summary and the collapsed stacks.
+    
+    Args:
+        seconds: Sampling duration (capped at PROFILE_MAX_SECONDS)
+        interval_ms: Time between samples
+        include_idle: Keep threads blocked in select/wait/queue.get
+        format: "json" or "collapsed"
+        x_admin_token: Must match ADMIN_TOKEN
+        
+    Returns:
+        Profile report
+    """
+    _require_admin(x_admin_token)
+    seconds = min(max(seconds, 0.1), PROFILE_MAX_SECONDS)
+    interval = max(interval_ms, 1.0) / 1000.0
+    try:
+        report = await asyncio.to_thread(sample_stacks, seconds, interval, include_idle)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    
+    if format == "collapsed":
+        return PlainTextResponse(report["collapsed"] + "\n")
+    return report
+
+
+def _admission_for(request: QueryRequest) -> AdmissionController:
+    """Follow-ups and full analyses are admitted against separate limits."""
+    return get_admission("followup" if request.session_id else "analysis")
+
+
+def _overloaded(e: OverloadedError) -> HTTPException:
+    """503 telling the client (or proxy) when to retry."""
+    return HTTPException(
+        status_code=503, detail=str(e),
+        headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))}
+    )
+
+
 @app.post("/ai/query", response_model=QueryResponse)
 async def query(request: QueryRequest):
     """
@@ -40,22 +236,146 @@ async def query(request: QueryRequest):
         AI-generated response
     """
     try:
-        response = await process_query(
-            resume_text=request.resume_text,
-            job_description=request.job_description,
-            previous_output=request.previous_output
+        async with _admission_for(request).slot():
+            return await process_query(
+                resume_text=request.resume_text,
+                job_description=request.job_description,
+                previous_output=request.previous_output,
+                session_id=request.session_id
+            )
+    except OverloadedError as e:
+        print(f"Shedding request: {e}")
+        ERRORS.labels(type(e).__name__).inc()
+        raise _overloaded(e)
+    except LLMRateLimitError as e:
+        print(f"Rate limited: {e}")
+        ERRORS.labels(type(e).__name__).inc()
+        raise HTTPException(
+            status_code=429, detail=str(e),
+            headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))}
         )
-        return QueryResponse(ai_output=response)
+    except SessionNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except AIServiceError as e:
         print(f"AI Service Error: {e}")
+        ERRORS.labels(type(e).__name__).inc()
         raise HTTPException(status_code=500, detail=str(e))
     except Exception as e:
         print(f"Unexpected Error: {e}")
+        ERRORS.labels(type(e).__name__).inc()
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Internal error: {str(e)}")
 
 
+@app.post("/ai/query/stream")
+async def query_stream(request: QueryRequest):
+    """
+    Stream AI query output as Server-Sent Events.
+    
+    An `event: stages` message reports skipped pipeline stages, then each
+    generated text delta is sent as a `data:` event carrying
+    {"token": "..."}, then an `event: session` message carries the id for
+    follow-ups. The stream ends with an `event: done` message, or an
+    `event: error` message if generation fails mid-stream.
+    
+    Args:
+        request: User query with resume, job description, and optional previous output
+        
+    Returns:
+        text/event-stream response
+    """
+    # Checked before the 200 response starts; the stream re-checks under
+    # the session lock
+    if request.session_id and await get_session_store().get(request.session_id) is None:
+        raise HTTPException(status_code=404, detail=f"Unknown or expired session: {request.session_id}")
+    
+    admission = _admission_for(request)
+    try:
+        await admission.acquire()
+    except OverloadedError as e:
+        print(f"Shedding request: {e}")
+        ERRORS.labels(type(e).__name__).inc()
+        raise _overloaded(e)
+    
+    async def event_stream():
+        try:
+            async for event, data in stream_query(
+                resume_text=request.resume_text,
+                job_description=request.job_description,
+                previous_output=request.previous_output,
+                session_id=request.session_id
+            ):
+                if event == "token":
+                    yield f"data: {json.dumps({'token': data})}\n\n"
+                else:
+                    yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+            yield "event: done\ndata: {}\n\n"
+        except Exception as e:
+            print(f"Streaming Error: {e}")
+            ERRORS.labels(type(e).__name__).inc()
+            yield f"event: error\ndata: {json.dumps({'detail': str(e)})}\n\n"
+        finally:
+            admission.release()
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.post("/ai/query/batch")
+async def query_batch(request: BatchQueryRequest):
+    """
+    Analyze many resumes against one job description, streamed as SSE.
+    
+    Company scraping and retrieval run once for the whole batch. Each
+    finished resume is sent as an `event: result` message carrying its
+    `index` and the usual response fields, or as `event: failed` with
+    `index` and `detail`, in completion order. The stream ends with
+    `event: done` and the success/failure counts.
+    
+    Args:
+        request: Job description and the list of resumes
+        
+    Returns:
+        text/event-stream response
+    """
+    if not request.resume_texts:
+        raise HTTPException(status_code=400, detail="resume_texts must not be empty")
+    if len(request.resume_texts) > BATCH_MAX_RESUMES:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_RESUMES} resumes per batch")
+    
+    # One slot admits the batch and covers its shared stages; batch_query
+    # takes it over and gives each in-flight generation its own slot
+    admission = get_admission("analysis")
+    try:
+        await admission.acquire()
+    except OverloadedError as e:
+        print(f"Shedding request: {e}")
+        ERRORS.labels(type(e).__name__).inc()
+        raise _overloaded(e)
+    
+    async def event_stream():
+        counts = {"total": len(request.resume_texts), "succeeded": 0, "failed": 0}
+        try:
+            async for event, data in batch_query(request.resume_texts, request.job_description, admission):
+                counts["succeeded" if event == "result" else "failed"] += 1
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+            yield f"event: done\ndata: {json.dumps(counts)}\n\n"
+        except Exception as e:
+            print(f"Batch Error: {e}")
+            ERRORS.labels(type(e).__name__).inc()
+            yield f"event: error\ndata: {json.dumps({'detail': str(e), **counts})}\n\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 # Backward compatibility endpoint
 @app.post("/analyze")
 async def analyze(request: QueryRequest):
@@ -0,0 +1,132 @@
+"""
+Embedding Backend Benchmark
+
+Compares the torch and int8 ONNX embedding backends side by side:
+load time, resident memory, single-query latency, batch throughput and
+vector agreement. Each backend runs in its own subprocess so memory
+numbers are not shared. Export the ONNX model first (export_onnx.py),
+then from the ai-services directory:
+
+    python -m benchmarks.embedding_backends --texts 512 --batch-size 32
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+
+def _rss_mb() -> tuple:
+    """Current and peak resident set size in MB (Linux)."""
+    values = {}
+    with open("/proc/self/status") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            if key in ("VmRSS", "VmHWM"):
+                values[key] = int(value.split()[0]) / 1024
+    return round(values["VmRSS"], 1), round(values["VmHWM"], 1)
+
+
+def _texts(count: int) -> list:
+    """Resume- and JD-like texts of mixed length."""
+    rng = np.random.default_rng(0)
+    words = ("python fastapi postgres redis kubernetes design caching latency distributed systems "
+             "mentor team lead microservices event driven api interview behavioral scalability "
+             "reliability cloud aws terraform observability on-call incident review").split()
+    return [" ".join(rng.choice(words, size=int(rng.integers(5, 200)))) for _ in range(count)]
+
+
+def _worker(backend: str, count: int, batch_size: int, queries: int, output: str):
+    """Measure one backend in this process and write results next to its vectors."""
+    from services.embedding_backends import load_backend
+    from services.embedding_service import EMBEDDING_MODEL, EMBEDDING_ONNX_PATH
+    
+    baseline_rss, _ = _rss_mb()
+    started = time.perf_counter()
+    model = load_backend(backend, EMBEDDING_MODEL, EMBEDDING_ONNX_PATH)
+    model.encode(["warm up"])
+    load_s = time.perf_counter() - started
+    loaded_rss, _ = _rss_mb()
+    
+    texts = _texts(count)
+    latencies = []
+    for text in texts[:queries]:
+        started = time.perf_counter()
+        model.encode([text])
+        latencies.append(time.perf_counter() - started)
+    latencies.sort()
+    
+    started = time.perf_counter()
+    vectors = model.encode(texts, batch_size=batch_size)
+    batch_s = time.perf_counter() - started
+    rss, peak_rss = _rss_mb()
+    
+    np.save(output + ".npy", vectors)
+    with open(output + ".json", "w") as f:
+        json.dump({
+            "backend": model.name,
+            "load_s": round(load_s, 2),
+            "rss_mb": {"interpreter": baseline_rss, "after_load": loaded_rss, "after_run": rss, "peak": peak_rss},
+            "torch_imported": "torch" in sys.modules,
+            "single_query_ms": {
+                "p50": round(latencies[len(latencies) // 2] * 1000, 2),
+                "p95": round(latencies[min(int(0.95 * len(latencies)), len(latencies) - 1)] * 1000, 2)
+            },
+            "batch_texts_per_second": round(count / batch_s, 1)
+        }, f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark torch vs ONNX int8 embedding backends")
+    parser.add_argument("--texts", type=int, default=512)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--queries", type=int, default=100, help="Single-text encodes for latency")
+    parser.add_argument("--threads", type=int, default=None, help="Pin torch/ONNX Runtime threads")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.worker:
+        _worker(args.worker, args.texts, args.batch_size, args.queries, args.output)
+        return
+    
+    env = dict(os.environ)
+    if args.threads:
+        env["OMP_NUM_THREADS"] = str(args.threads)
+        env["EMBED_ONNX_THREADS"] = str(args.threads)
+    
+    workdir = tempfile.mkdtemp(prefix="neuraflow-embed-bench-")
+    results = {}
+    for backend in ("torch", "onnx"):
+        output = os.path.join(workdir, backend)
+        subprocess.run([
+            sys.executable, "-m", "benchmarks.embedding_backends", "--worker", backend,
+            "--texts", str(args.texts), "--batch-size", str(args.batch_size),
+            "--queries", str(args.queries), "--output", output
+        ], env=env, check=True)
+        with open(output + ".json") as f:
+            results[backend] = json.load(f)
+    
+    expected = np.load(os.path.join(workdir, "torch.npy"))
+    actual = np.load(os.path.join(workdir, "onnx.npy"))
+    cosine = (expected * actual).sum(axis=1) / (np.linalg.norm(expected, axis=1) * np.linalg.norm(actual, axis=1))
+    results["agreement"] = {
+        "min_cosine": round(float(cosine.min()), 5),
+        "mean_cosine": round(float(cosine.mean()), 5),
+        "max_abs_diff": round(float(np.abs(expected - actual).max()), 5)
+    }
+    results["speedup"] = {
+        "batch": round(results["onnx"]["batch_texts_per_second"] / results["torch"]["batch_texts_per_second"], 2),
+        "single_query_p50": round(results["torch"]["single_query_ms"]["p50"] / results["onnx"]["single_query_ms"]["p50"], 2),
+        "rss_saved_mb": round(results["torch"]["rss_mb"]["after_run"] - results["onnx"]["rss_mb"]["after_run"], 1)
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
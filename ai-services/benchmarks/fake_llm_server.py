@@ -0,0 +1,133 @@
+"""
+Fake LLM Server
+
+Minimal OpenAI-compatible chat completions endpoint for offline benchmarks.
+Point the Groq client at it with GROQ_BASE_URL=http://127.0.0.1:<port>.
+"""
+
+import asyncio
+import json
+import random
+import threading
+import time
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# Simulated generation latency in seconds (non-streaming requests);
+# None derives it from TTFT + OUTPUT_TOKENS / TOKENS_PER_SECOND
+LATENCY = 2.0
+# Simulated time to first token and decode speed
+TTFT = 0.3
+TOKENS_PER_SECOND = 200.0
+# Completion length in words (None = the canned text as is)
+OUTPUT_TOKENS = None
+# Slow tail: this fraction of requests takes SLOW_LATENCY instead
+SLOW_RATE = 0.0
+SLOW_LATENCY = 10.0
+# Injected failures: this fraction of requests (and every request for a
+# model in FAILING_MODELS) is answered with ERROR_STATUS
+ERROR_RATE = 0.0
+ERROR_STATUS = 503
+FAILING_MODELS = set()
+# Retry-After header (seconds) sent with injected 429s
+RETRY_AFTER = 1
+# Canned completion text
+COMPLETION = "This is a simulated analysis from the fake LLM server."
+
+app = FastAPI(title="Fake LLM Server")
+
+
+@app.post("/openai/v1/chat/completions")
+async def chat_completions(request: Request):
+    """Return a canned completion after the configured latency, or an injected error."""
+    body = await request.json()
+    if body.get("model") in FAILING_MODELS or random.random() < ERROR_RATE:
+        return JSONResponse(
+            status_code=ERROR_STATUS,
+            content={"error": {"message": "Injected failure", "type": "fake_error"}},
+            headers={"Retry-After": str(RETRY_AFTER)} if ERROR_STATUS == 429 else None
+        )
+    if body.get("stream"):
+        return StreamingResponse(_stream_chunks(body.get("model", "fake")), media_type="text/event-stream")
+    words = _completion_words()
+    latency = LATENCY if LATENCY is not None else TTFT + len(words) / TOKENS_PER_SECOND
+    await asyncio.sleep(SLOW_LATENCY if random.random() < SLOW_RATE else latency)
+    prompt_tokens = sum(len(str(m.get("content", ""))) // 4 for m in body.get("messages", []))
+    return {
+        "id": "chatcmpl-fake",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "fake"),
+        "choices": [
+            {
+                "index": 0,
+                "finish_reason": "stop",
+                "logprobs": {"content": None},
+                "message": {"role": "assistant", "content": " ".join(words)}
+            }
+        ],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(words),
+            "total_tokens": prompt_tokens + len(words)
+        }
+    }
+
+
+async def _stream_chunks(model: str):
+    """Emit the canned completion word by word as SSE chunks."""
+    await asyncio.sleep(TTFT)
+    for i, word in enumerate(_completion_words()):
+        if i:
+            await asyncio.sleep(1.0 / TOKENS_PER_SECOND)
+        chunk = {
+            "id": "chatcmpl-fake",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "system_fingerprint": "fake",
+            "x_groq": None,
+            "choices": [
+                {
+                    "index": 0,
+                    "finish_reason": "",
+                    "logprobs": {"content": None},
+                    "delta": {"role": "assistant", "content": word if i == 0 else " " + word}
+                }
+            ]
+        }
+        yield f"data: {json.dumps(chunk)}\n\n"
+    yield "data: [DONE]\n\n"
+
+
+def _completion_words() -> list:
+    """Canned completion as words, repeated or cut to OUTPUT_TOKENS."""
+    words = COMPLETION.split(" ")
+    if OUTPUT_TOKENS is None:
+        return words
+    return [words[i % len(words)] for i in range(OUTPUT_TOKENS)]
+
+
+def start_in_thread(host: str = "127.0.0.1", port: int = 8900) -> uvicorn.Server:
+    """
+    Run the fake server in a daemon thread and wait until it accepts requests.
+    
+    Args:
+        host: Interface to bind
+        port: Port to bind
+        
+    Returns:
+        The running uvicorn server (set should_exit to stop it)
+    """
+    config = uvicorn.Config(app, host=host, port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+if __name__ == "__main__":
+    uvicorn.run(app, host="127.0.0.1", port=8900)
@@ -0,0 +1,67 @@
+"""
+Fake Search Server
+
+Serves search-result HTML shaped like the page scrape_company_info parses,
+for offline benchmarks. Point the scraper at it with
+SCRAPE_SEARCH_URL=http://127.0.0.1:<port>/search.
+"""
+
+import asyncio
+import html
+import threading
+import time
+import uvicorn
+from fastapi import FastAPI
+from fastapi.responses import HTMLResponse
+
+# Simulated search latency in seconds
+LATENCY = 0.3
+# Result snippets per page
+RESULTS = 8
+
+app = FastAPI(title="Fake Search Server")
+
+_SNIPPETS = [
+    "The interview process at {company} has 4 stages: recruiter screen, coding, system design and a behavioral round.",
+    "Technical round at {company}: 60 minutes of data structures and algorithm questions.",
+    "Common question at {company}: design a rate limiter. Prepare to discuss trade-offs.",
+    "Tip: {company} interviewers focus on communication; practice explaining your approach.",
+    "Final round at {company} is with the hiring manager and covers past projects.",
+    "{company} asks questions about APIs, caching and databases in the onsite interview.",
+]
+
+
+@app.get("/search")
+async def search(q: str = ""):
+    """Return a results page with interview-related snippets for the query."""
+    await asyncio.sleep(LATENCY)
+    company = html.escape(q.split(" interview")[0] or "Example")
+    results = "\n".join(
+        f'<div class="BNeawe s3v9rd AP7Wnd">{_SNIPPETS[i % len(_SNIPPETS)].format(company=company)}</div>'
+        for i in range(RESULTS)
+    )
+    return HTMLResponse(f"<html><body>{results}</body></html>")
+
+
+def start_in_thread(host: str = "127.0.0.1", port: int = 8901) -> uvicorn.Server:
+    """
+    Run the fake server in a daemon thread and wait until it accepts requests.
+    
+    Args:
+        host: Interface to bind
+        port: Port to bind
+        
+    Returns:
+        The running uvicorn server (set should_exit to stop it)
+    """
+    config = uvicorn.Config(app, host=host, port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+if __name__ == "__main__":
+    uvicorn.run(app, host="127.0.0.1", port=8901)
@@ -0,0 +1,80 @@
+"""
+LLM Concurrency Benchmark
+
+Compares a blocking Groq client called from coroutines (the request
+path before agenerate()) with the async agenerate() path against the
+fake LLM server. Run from the ai-services directory:
+
+    python -m benchmarks.llm_concurrency --concurrency 32 --latency 1.0
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+from benchmarks import fake_llm_server
+
+
+def _sync_generate(base_url: str):
+    """Blocking baseline: one sync Groq client, one completion per call."""
+    from groq import Groq
+    client = Groq(api_key="benchmark", base_url=base_url, max_retries=0)
+    
+    def generate(prompt: str) -> str:
+        chat_completion = client.chat.completions.create(
+            messages=[{"role": "user", "content": prompt}],
+            model="llama-3.1-8b-instant",
+            temperature=0.7,
+            max_tokens=2048
+        )
+        return chat_completion.choices[0].message.content
+    
+    return generate
+
+
+async def _run_sync(generate, concurrency: int) -> float:
+    """Old request path: blocking generate() called from coroutines."""
+    async def one():
+        generate("benchmark prompt")
+    
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(concurrency)))
+    return time.perf_counter() - start
+
+
+async def _run_async(agenerate, concurrency: int) -> float:
+    """New request path: awaited agenerate() on the shared pool."""
+    start = time.perf_counter()
+    await asyncio.gather(*(agenerate("benchmark prompt") for _ in range(concurrency)))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark sync vs async LLM client")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--latency", type=float, default=1.0)
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--skip-sync", action="store_true", help="Only run the async path")
+    args = parser.parse_args()
+    
+    fake_llm_server.LATENCY = args.latency
+    fake_llm_server.start_in_thread(port=args.port)
+    os.environ["GROQ_BASE_URL"] = f"http://127.0.0.1:{args.port}"
+    # Measure the client itself, not the default provider quota
+    os.environ.setdefault("LLM_RPM", "0")
+    os.environ.setdefault("LLM_TPM", "0")
+    
+    # Imported after GROQ_BASE_URL is set so the clients target the fake server
+    from clients.groq_client import agenerate
+    
+    print(f"concurrency={args.concurrency} latency={args.latency}s")
+    if not args.skip_sync:
+        elapsed = asyncio.run(_run_sync(_sync_generate(os.environ["GROQ_BASE_URL"]), args.concurrency))
+        print(f"sync  generate():  {elapsed:6.2f}s  {args.concurrency / elapsed:6.1f} req/s")
+    elapsed = asyncio.run(_run_async(agenerate, args.concurrency))
+    print(f"async agenerate(): {elapsed:6.2f}s  {args.concurrency / elapsed:6.1f} req/s")
+
+
+if __name__ == "__main__":
+    main()
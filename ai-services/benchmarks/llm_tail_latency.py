@@ -0,0 +1,86 @@
+"""
+LLM Tail Latency Benchmark
+
+Measures agenerate() latency percentiles against the fake LLM server with
+a slow tail, with and without hedging, then checks that a failing primary
+model falls back to the next one. Run from the ai-services directory:
+
+    python -m benchmarks.llm_tail_latency --requests 200 --slow-rate 0.05
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+from benchmarks import fake_llm_server
+
+
+def _percentile(values: list, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[int(fraction * (len(ordered) - 1))]
+
+
+async def _run(agenerate, requests: int, concurrency: int) -> list:
+    """Issue requests with bounded concurrency and return their latencies."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            await agenerate("benchmark prompt")
+            latencies.append(time.perf_counter() - start)
+    
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return latencies
+
+
+def _report(label: str, latencies: list):
+    print(
+        f"{label:<10} p50={_percentile(latencies, 0.50):6.2f}s  "
+        f"p95={_percentile(latencies, 0.95):6.2f}s  "
+        f"p99={_percentile(latencies, 0.99):6.2f}s  "
+        f"max={max(latencies):6.2f}s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark hedged requests and model fallback")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--slow-rate", type=float, default=0.05)
+    parser.add_argument("--slow-latency", type=float, default=3.0)
+    parser.add_argument("--port", type=int, default=8900)
+    args = parser.parse_args()
+    
+    fake_llm_server.LATENCY = args.latency
+    fake_llm_server.SLOW_RATE = args.slow_rate
+    fake_llm_server.SLOW_LATENCY = args.slow_latency
+    fake_llm_server.start_in_thread(port=args.port)
+    os.environ["GROQ_BASE_URL"] = f"http://127.0.0.1:{args.port}"
+    # Measure the client itself, not the default provider quota
+    os.environ.setdefault("LLM_RPM", "0")
+    os.environ.setdefault("LLM_TPM", "0")
+    
+    # Imported after GROQ_BASE_URL is set so the clients target the fake server
+    from clients import groq_client
+    
+    print(f"requests={args.requests} latency={args.latency}s slow_rate={args.slow_rate} slow_latency={args.slow_latency}s")
+    groq_client.LLM_HEDGE = False
+    _report("unhedged", asyncio.run(_run(groq_client.agenerate, args.requests, args.concurrency)))
+    
+    # The p95 window is already warm from the unhedged run
+    groq_client.LLM_HEDGE = True
+    _report("hedged", asyncio.run(_run(groq_client.agenerate, args.requests, args.concurrency)))
+    
+    fake_llm_server.SLOW_RATE = 0.0
+    fake_llm_server.FAILING_MODELS = {groq_client.DEFAULT_MODEL}
+    _report("fallback", asyncio.run(_run(groq_client.agenerate, args.concurrency, args.concurrency)))
+    
+    print(groq_client.get_llm_stats().stats())
+
+
+if __name__ == "__main__":
+    main()
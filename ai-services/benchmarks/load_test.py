@@ -0,0 +1,254 @@
+"""
+End-to-End Load Test
+
+Starts the real FastAPI app against the fake LLM and fake search servers,
+drives /ai/query (or /ai/query/stream) at a fixed concurrency, and prints
+a JSON report: latency percentiles, requests/sec, status codes and the
+per-stage breakdown from /metrics. Runs fully offline. From the
+ai-services directory:
+
+    python -m benchmarks.load_test --requests 200 --concurrency 16 --output report.json
+
+Use --fake-embeddings when the MiniLM model is not available locally.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import Counter
+
+import httpx
+import numpy as np
+import uvicorn
+from prometheus_client.parser import text_string_to_metric_families
+
+from benchmarks import fake_llm_server, fake_search_server
+
+
+class _FakeEncoder:
+    """Deterministic stand-in for SentenceTransformer (hash-seeded vectors)."""
+    
+    def encode(self, texts, batch_size=None, convert_to_numpy=True):
+        vectors = []
+        for text in texts:
+            seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+            vector = np.random.default_rng(seed).standard_normal(384).astype(np.float32)
+            vectors.append(vector / np.linalg.norm(vector))
+        return np.stack(vectors)
+
+
+def _start_app(app, port: int) -> uvicorn.Server:
+    config = uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def _percentile(values: list, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+def _stage_histograms(metrics_text: str) -> dict:
+    """Parse stage histograms into {stage: {"buckets": {le: n}, "sum": s, "count": n}}."""
+    stages = {}
+    for family in text_string_to_metric_families(metrics_text):
+        if family.name != "neuraflow_stage_duration_seconds":
+            continue
+        for sample in family.samples:
+            stage = stages.setdefault(sample.labels["stage"], {"buckets": {}, "sum": 0.0, "count": 0.0})
+            if sample.name.endswith("_bucket"):
+                stage["buckets"][float(sample.labels["le"])] = sample.value
+            elif sample.name.endswith("_sum"):
+                stage["sum"] = sample.value
+            elif sample.name.endswith("_count"):
+                stage["count"] = sample.value
+    return stages
+
+
+def _bucket_quantile(buckets: dict, count: float, fraction: float) -> float:
+    """Quantile estimate by linear interpolation inside histogram buckets."""
+    target = fraction * count
+    lower, below = 0.0, 0.0
+    for bound in sorted(buckets):
+        if buckets[bound] >= target:
+            if bound == float("inf"):
+                return lower
+            span = buckets[bound] - below
+            return lower + (bound - lower) * ((target - below) / span if span else 1.0)
+        lower, below = bound, buckets[bound]
+    return lower
+
+
+def _stage_breakdown(before: str, after: str) -> dict:
+    """Per-stage count, mean and estimated p50/p95 for this run only."""
+    start = _stage_histograms(before)
+    end = _stage_histograms(after)
+    breakdown = {}
+    for name, stage in sorted(end.items()):
+        base = start.get(name, {"buckets": {}, "sum": 0.0, "count": 0.0})
+        count = stage["count"] - base["count"]
+        if count <= 0:
+            continue
+        buckets = {le: n - base["buckets"].get(le, 0.0) for le, n in stage["buckets"].items()}
+        breakdown[name] = {
+            "count": int(count),
+            "mean_ms": round((stage["sum"] - base["sum"]) / count * 1000, 1),
+            "p50_ms": round(_bucket_quantile(buckets, count, 0.50) * 1000, 1),
+            "p95_ms": round(_bucket_quantile(buckets, count, 0.95) * 1000, 1)
+        }
+    return breakdown
+
+
+def _payload(index: int, distinct: int, companies: int) -> dict:
+    variant = index % distinct
+    return {
+        "resume_text": f"Candidate {variant}. Five years of Python, FastAPI, PostgreSQL and Redis. "
+                       f"Built event-driven services handling {1000 + variant} requests per second.",
+        "job_description": f"Company: Acme{variant % companies}.\n"
+                           "Senior Backend Engineer. Design APIs, own caching and database performance, "
+                           "mentor engineers. Requires Python, distributed systems and cloud experience."
+    }
+
+
+async def _drive(base_url: str, endpoint: str, requests: int, concurrency: int,
+                 distinct: int, companies: int) -> dict:
+    """Send the requests with bounded concurrency and collect timings."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    first_tokens = []
+    statuses = Counter()
+    path = "/ai/query/stream" if endpoint == "stream" else "/ai/query"
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    
+    async with httpx.AsyncClient(base_url=base_url, timeout=300.0, limits=limits) as client:
+        async def one(index: int):
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    if endpoint == "stream":
+                        first_token = None
+                        async with client.stream("POST", path, json=_payload(index, distinct, companies)) as response:
+                            async for line in response.aiter_lines():
+                                if first_token is None and line.startswith('data: {"token"'):
+                                    first_token = time.perf_counter() - started
+                            status = response.status_code
+                        if first_token is not None:
+                            first_tokens.append(first_token)
+                    else:
+                        response = await client.post(path, json=_payload(index, distinct, companies))
+                        status = response.status_code
+                except httpx.HTTPError as e:
+                    status = type(e).__name__
+                statuses[str(status)] += 1
+                if status == 200:
+                    latencies.append(time.perf_counter() - started)
+        
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(requests)))
+        elapsed = time.perf_counter() - started
+    
+    report = {
+        "elapsed_s": round(elapsed, 3),
+        "requests": requests,
+        "succeeded": len(latencies),
+        "status_codes": dict(statuses),
+        "requests_per_second": round(len(latencies) / elapsed, 2),
+        "latency_ms": {}
+    }
+    if latencies:
+        report["latency_ms"] = {
+            "p50": round(_percentile(latencies, 0.50) * 1000, 1),
+            "p95": round(_percentile(latencies, 0.95) * 1000, 1),
+            "p99": round(_percentile(latencies, 0.99) * 1000, 1),
+            "mean": round(sum(latencies) / len(latencies) * 1000, 1),
+            "max": round(max(latencies) * 1000, 1)
+        }
+    if first_tokens:
+        report["first_token_ms"] = {
+            "p50": round(_percentile(first_tokens, 0.50) * 1000, 1),
+            "p95": round(_percentile(first_tokens, 0.95) * 1000, 1),
+            "p99": round(_percentile(first_tokens, 0.99) * 1000, 1)
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end load test against stubbed LLM and search")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--endpoint", choices=["query", "stream"], default="query")
+    parser.add_argument("--distinct", type=int, default=None,
+                        help="Distinct payloads (default: every request unique, so no response-cache hits)")
+    parser.add_argument("--companies", type=int, default=10, help="Distinct companies to scrape")
+    parser.add_argument("--ttft", type=float, default=0.3, help="Fake LLM time to first token (s)")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--output-tokens", type=int, default=300)
+    parser.add_argument("--search-latency", type=float, default=0.3)
+    parser.add_argument("--fake-embeddings", action="store_true", help="Skip loading the MiniLM model")
+    parser.add_argument("--llm-port", type=int, default=8900)
+    parser.add_argument("--search-port", type=int, default=8901)
+    parser.add_argument("--app-port", type=int, default=8902)
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    args = parser.parse_args()
+    
+    fake_llm_server.LATENCY = None
+    fake_llm_server.TTFT = args.ttft
+    fake_llm_server.TOKENS_PER_SECOND = args.tokens_per_second
+    fake_llm_server.OUTPUT_TOKENS = args.output_tokens
+    fake_llm_server.start_in_thread(port=args.llm_port)
+    fake_search_server.LATENCY = args.search_latency
+    fake_search_server.start_in_thread(port=args.search_port)
+    
+    workdir = tempfile.mkdtemp(prefix="neuraflow-load-")
+    os.environ["GROQ_BASE_URL"] = f"http://127.0.0.1:{args.llm_port}"
+    os.environ["SCRAPE_SEARCH_URL"] = f"http://127.0.0.1:{args.search_port}/search"
+    os.environ["CHROMA_PATH"] = os.path.join(workdir, "chroma_db")
+    os.environ["SESSION_DB_PATH"] = os.path.join(workdir, "sessions.sqlite3")
+    os.environ["EMBED_CACHE_PATH"] = ""
+    # Measure the service itself, not the default provider quota
+    os.environ.setdefault("LLM_RPM", "0")
+    os.environ.setdefault("LLM_TPM", "0")
+    
+    # Imported after the environment is set so every module picks it up
+    import app as service
+    from services import embedding_service
+    
+    if args.fake_embeddings:
+        embedding_service._model = _FakeEncoder()
+    service.initialize_RAG()
+    _start_app(service.app, args.app_port)
+    base_url = f"http://127.0.0.1:{args.app_port}"
+    # Keep the warm-up out of the measurement
+    while httpx.get(f"{base_url}/ready").status_code != 200:
+        time.sleep(0.1)
+    
+    before = httpx.get(f"{base_url}/metrics").text
+    report = asyncio.run(_drive(
+        base_url, args.endpoint, args.requests, args.concurrency,
+        args.distinct or args.requests, args.companies
+    ))
+    after = httpx.get(f"{base_url}/metrics").text
+    
+    report["config"] = {
+        key: value for key, value in vars(args).items()
+        if key not in ("output", "llm_port", "search_port", "app_port")
+    }
+    report["stages"] = _stage_breakdown(before, after)
+    
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Vector Index Benchmark
+
+Compares ChromaDB (HNSW) with the memory-mapped NumPy index on a
+synthetic clustered corpus: recall@k against exact float32 search,
+single-query and batched latency, cold open time and resident memory.
+Each backend is measured in a fresh subprocess. From the ai-services
+directory:
+
+    python -m benchmarks.vector_index --chunks 50000 --queries 200 --top-k 5
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+COLLECTION = "benchmark"
+
+
+def _rss_mb() -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return round(int(line.split()[1]) / 1024, 1)
+    return 0.0
+
+
+def _corpus(chunks: int, queries: int, dim: int) -> tuple:
+    """Clustered unit vectors (topics) and queries near random chunks."""
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((max(chunks // 200, 1), dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, len(centers), chunks)] + 0.6 * rng.standard_normal((chunks, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    picks = vectors[rng.integers(0, chunks, queries)]
+    query_vectors = picks + 0.3 * rng.standard_normal(picks.shape).astype(np.float32) / np.sqrt(dim)
+    query_vectors /= np.linalg.norm(query_vectors, axis=1, keepdims=True)
+    return vectors, query_vectors
+
+
+def _build(workdir: str, vectors: np.ndarray):
+    """Load the corpus into ChromaDB and export the NumPy snapshot from it."""
+    import chromadb
+    from services.vector_index import export_snapshot
+    
+    client = chromadb.PersistentClient(path=os.path.join(workdir, "chroma"))
+    collection = client.get_or_create_collection(COLLECTION)
+    for start in range(0, len(vectors), 5000):
+        rows = range(start, min(start + 5000, len(vectors)))
+        collection.add(
+            ids=[f"c{i}" for i in rows],
+            embeddings=vectors[start:start + len(rows)].tolist(),
+            documents=[f"chunk {i}" for i in rows]
+        )
+    export_snapshot(client, 1, os.path.join(workdir, "numpy"))
+
+
+def _worker(backend: str, workdir: str, top_k: int, output: str):
+    """Open one backend cold, run the queries and record ids and timings."""
+    queries = np.load(os.path.join(workdir, "queries.npy"))
+    baseline_rss = _rss_mb()
+    started = time.perf_counter()
+    if backend == "chroma":
+        import chromadb
+        collection = chromadb.PersistentClient(path=os.path.join(workdir, "chroma")).get_collection(COLLECTION)
+    else:
+        from services.vector_index import NumpyStore
+        collection = NumpyStore(os.path.join(workdir, "numpy")).get_collection(COLLECTION)
+    collection.query(query_embeddings=[queries[0].tolist()], n_results=top_k)
+    open_s = time.perf_counter() - started
+    
+    ids = []
+    latencies = []
+    for query in queries:
+        started = time.perf_counter()
+        result = collection.query(query_embeddings=[query.tolist()], n_results=top_k)
+        latencies.append(time.perf_counter() - started)
+        ids.append(result["ids"][0])
+    latencies.sort()
+    
+    started = time.perf_counter()
+    collection.query(query_embeddings=queries.tolist(), n_results=top_k)
+    batch_s = time.perf_counter() - started
+    
+    with open(output, "w") as f:
+        json.dump({
+            "open_s": round(open_s, 3),
+            "rss_mb": round(_rss_mb() - baseline_rss, 1),
+            "single_query_ms": {
+                "p50": round(latencies[len(latencies) // 2] * 1000, 3),
+                "p95": round(latencies[min(int(0.95 * len(latencies)), len(latencies) - 1)] * 1000, 3)
+            },
+            "batch_queries_per_second": round(len(queries) / batch_s, 1),
+            "ids": ids
+        }, f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ChromaDB vs the memory-mapped NumPy index")
+    parser.add_argument("--chunks", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    parser.add_argument("--output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.worker:
+        _worker(args.worker, args.workdir, args.top_k, args.output)
+        return
+    
+    workdir = tempfile.mkdtemp(prefix="neuraflow-index-bench-")
+    vectors, queries = _corpus(args.chunks, args.queries, args.dim)
+    np.save(os.path.join(workdir, "queries.npy"), queries)
+    started = time.perf_counter()
+    _build(workdir, vectors)
+    build_s = time.perf_counter() - started
+    
+    exact = np.argsort(-(queries @ vectors.T), axis=1)[:, :args.top_k]
+    truth = [{f"c{i}" for i in row} for row in exact]
+    
+    from services.vector_index import VECTOR_INDEX_DTYPE
+    report = {
+        "chunks": args.chunks, "queries": args.queries, "top_k": args.top_k,
+        "numpy_dtype": VECTOR_INDEX_DTYPE, "build_s": round(build_s, 1)
+    }
+    for backend in ("chroma", "numpy"):
+        output = os.path.join(workdir, f"{backend}.json")
+        subprocess.run([
+            sys.executable, "-m", "benchmarks.vector_index", "--worker", backend,
+            "--workdir", workdir, "--top-k", str(args.top_k), "--output", output
+        ], check=True)
+        with open(output) as f:
+            result = json.load(f)
+        hits = sum(len(truth[i] & set(ids)) for i, ids in enumerate(result.pop("ids")))
+        result["recall_at_k"] = round(hits / (args.top_k * args.queries), 4)
+        report[backend] = result
+    
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -5,53 +5,429 @@ This is the ONLY file that knows about Groq.
 Replaces Ollama with Groq API for LLM inference.
 """
 
-from groq import Groq
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from typing import AsyncIterator, Optional, Union
 import httpx
+from clients.rate_limiter import (
+    DEFAULT_RETRY_AFTER, PRIORITY_STANDARD, RateLimiter, get_rate_limiter
+)
 from clients.secret import GROQ_API_KEY
+from utils.errors import LLMError, LLMRateLimitError
+from utils.metrics import LLM_ERRORS, LLM_TOKENS
 
-# Initialize Groq client with custom httpx client to avoid proxies issue
-try:
-    # Create a custom httpx client without proxies
-    http_client = httpx.Client()
-    client = Groq(
-        api_key=GROQ_API_KEY(),
-        http_client=http_client
-    )
-except Exception as e:
-    # Fallback: try without custom http_client
-    client = Groq(
-        api_key=GROQ_API_KEY()
-    )
+DEFAULT_MODEL = "llama-3.1-8b-instant"
 
+# Models tried in order after the requested one fails with a retryable
+# error (timeout, connection error, rate limit, 5xx, unknown model)
+FALLBACK_MODELS = [m.strip() for m in os.getenv("LLM_FALLBACK_MODELS", "llama-3.3-70b-versatile").split(",") if m.strip()]
 
-def generate(prompt: str, model: str = "llama-3.1-8b-instant") -> str:
+# Total time budget for one generation across all attempts, and the cap
+# for any single attempt within it
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60.0"))
+LLM_ATTEMPT_TIMEOUT = float(os.getenv("LLM_ATTEMPT_TIMEOUT", "30.0"))
+
+# Hedging: if an attempt has not answered within the model's observed p95
+# latency, send a duplicate and take whichever finishes first. Off by
+# default because hedged requests count against the provider's rate limit.
+LLM_HEDGE = os.getenv("LLM_HEDGE", "0") == "1"
+HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", "0.5"))
+HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+LATENCY_WINDOW = 200
+
+# Connection pool shared by every in-flight request on this worker.
+# Keep-alive connections avoid a TLS handshake per generation.
+HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=30.0)
+HTTP_TIMEOUT = httpx.Timeout(60.0, connect=5.0)
+
+# Async client used by the FastAPI request path, created on first use
+_async_client = None
+_async_client_lock = threading.Lock()
+
+
+def get_async_client():
+    """
+    Return the shared AsyncGroq client, creating it on first use.
+    
+    The SDK's own retries are disabled so the fallback chain below owns
+    retry timing. groq is imported here and in the functions that catch
+    its errors: the SDK takes most of a second to import, which the app
+    pays during warm-up instead of before it can bind its port.
+    """
+    global _async_client
+    if _async_client is None:
+        with _async_client_lock:
+            if _async_client is None:
+                from groq import AsyncGroq
+                try:
+                    async_http_client = httpx.AsyncClient(limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT)
+                    _async_client = AsyncGroq(
+                        api_key=GROQ_API_KEY(),
+                        http_client=async_http_client,
+                        max_retries=0
+                    )
+                except Exception:
+                    # Fallback: let the SDK build its own http client
+                    _async_client = AsyncGroq(
+                        api_key=GROQ_API_KEY(),
+                        max_retries=0
+                    )
+    return _async_client
+
+
+class LLMStats:
+    """
+    Per-model latency window and fallback/hedging counters.
+    
+    Latencies are kept per (model, max_tokens) because output length
+    dominates generation time; the p95 of each window sets the hedge delay.
+    """
+    
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.window = window
+        self._lock = threading.Lock()
+        self._latencies = {}
+        self._attempts = 0
+        self._failures = 0
+        self._fallbacks = 0
+        self._hedges = 0
+        self._hedge_wins = 0
+    
+    def record(self, model: str, max_tokens: int, latency: float):
+        with self._lock:
+            window = self._latencies.get((model, max_tokens))
+            if window is None:
+                window = self._latencies[(model, max_tokens)] = deque(maxlen=self.window)
+            window.append(latency)
+    
+    def count(self, **increments):
+        with self._lock:
+            for name, value in increments.items():
+                setattr(self, f"_{name}", getattr(self, f"_{name}") + value)
+    
+    def hedge_delay(self, model: str, max_tokens: int) -> Optional[float]:
+        """p95 latency for the model, or None until enough samples exist."""
+        with self._lock:
+            window = self._latencies.get((model, max_tokens))
+            if window is None or len(window) < HEDGE_MIN_SAMPLES:
+                return None
+            ordered = sorted(window)
+        return max(HEDGE_MIN_DELAY, ordered[int(0.95 * (len(ordered) - 1))])
+    
+    def stats(self) -> dict:
+        """Attempt/fallback/hedge counters and latency percentiles since startup."""
+        with self._lock:
+            latencies = {}
+            for (model, max_tokens), window in self._latencies.items():
+                ordered = sorted(window)
+                latencies[f"{model}:{max_tokens}"] = {
+                    "samples": len(ordered),
+                    "p50_ms": round(ordered[len(ordered) // 2] * 1000, 1),
+                    "p95_ms": round(ordered[int(0.95 * (len(ordered) - 1))] * 1000, 1)
+                }
+            return {
+                "attempts": self._attempts,
+                "failures": self._failures,
+                "fallbacks": self._fallbacks,
+                "hedges": self._hedges,
+                "hedge_wins": self._hedge_wins,
+                "latency": latencies
+            }
+
+
+_stats = LLMStats()
+
+def get_llm_stats() -> LLMStats:
+    return _stats
+
+
+def _model_chain(model: str) -> list:
+    """The requested model followed by the configured fallbacks."""
+    return list(dict.fromkeys([model] + FALLBACK_MODELS))
+
+
+def _is_retryable(error: Exception) -> bool:
+    """Whether another attempt (on the next model) might succeed."""
+    import groq
+    if isinstance(error, (asyncio.TimeoutError, LLMRateLimitError, groq.APIConnectionError,
+                          groq.RateLimitError, groq.NotFoundError)):
+        return True
+    return isinstance(error, groq.APIStatusError) and error.status_code >= 500
+
+
+def _to_messages(prompt: Union[str, list]) -> list:
+    """Wrap a plain prompt as a single user message; pass chat messages through."""
+    if isinstance(prompt, str):
+        return [
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ]
+    return prompt
+
+
+async def agenerate(
+    prompt: Union[str, list],
+    model: str = DEFAULT_MODEL,
+    max_tokens: int = 2048,
+    priority: int = PRIORITY_STANDARD
+) -> str:
     """
-    Generate text using Groq API.
+    Generate text using Groq API without blocking the event loop.
     
     This function is provider-agnostic from the caller's perspective.
     ALL intelligence and reasoning happens inside the LLM based on the prompt.
+    The request is awaited on the shared keep-alive connection pool so one
+    worker can serve many requests.
+    Requests wait their turn for the model's RPM/TPM quota, retryable
+    failures fall back through FALLBACK_MODELS within LLM_TIMEOUT, and
+    slow attempts are hedged when LLM_HEDGE is on.
     
     Args:
-        prompt: Complete prompt with all context and instructions
+        prompt: Complete prompt, or chat messages (e.g. a stable system
+            message followed by the per-request user message)
         model: Groq model name (default: llama-3.1-8b-instant)
+        max_tokens: Maximum tokens to generate
+        priority: Rate-limiter queue class (PRIORITY_INTERACTIVE first)
         
     Returns:
         Raw LLM output as string
     """
+    messages = _to_messages(prompt)
+    deadline = time.monotonic() + LLM_TIMEOUT
+    errors = []
+    error = None
+    for attempt, candidate in enumerate(_model_chain(model)):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            errors.append("deadline exceeded")
+            break
+        if attempt:
+            _stats.count(fallbacks=1)
+            print(f"Falling back to {candidate}")
+        try:
+            return await _hedged_completion(
+                messages, candidate, max_tokens, min(LLM_ATTEMPT_TIMEOUT, remaining), priority
+            )
+        except Exception as e:
+            print(f"Groq API Error ({candidate}): {e}")
+            errors.append(f"{candidate}: {str(e) or type(e).__name__}")
+            error = e
+            if not _is_retryable(e):
+                break
+    raise _final_error(errors, error)
+
+
+async def _hedged_completion(messages: list, model: str, max_tokens: int, timeout: float, priority: int) -> str:
+    """
+    One attempt on one model, hedged with a duplicate past the p95 latency.
+    
+    No hedge is sent while requests are already queued for quota, since
+    a duplicate would only take a slot from someone else.
+    
+    Args:
+        messages: Chat messages
+        model: Groq model name
+        max_tokens: Maximum tokens to generate
+        timeout: Deadline for the attempt in seconds
+        priority: Rate-limiter queue class
+        
+    Returns:
+        Output of whichever request finished first
+    """
+    delay = _stats.hedge_delay(model, max_tokens) if LLM_HEDGE else None
+    started = time.monotonic()
+    tasks = [asyncio.ensure_future(_completion(messages, model, max_tokens, timeout, priority))]
     try:
-        chat_completion = client.chat.completions.create(
-            messages=[
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            model=model,
-            temperature=0.7,
-            max_tokens=2048
-        )
+        if delay is not None and delay < timeout:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done and not get_rate_limiter(model).queued:
+                _stats.count(hedges=1)
+                tasks.append(asyncio.ensure_future(
+                    _completion(messages, model, max_tokens, timeout - (time.monotonic() - started), priority)
+                ))
+        
+        pending = set(tasks)
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is not tasks[0]:
+                        _stats.count(hedge_wins=1)
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def _completion(messages: list, model: str, max_tokens: int, timeout: float, priority: int) -> str:
+    """
+    Single chat completion request, bounded by timeout.
+    
+    Waits for quota first; a 429 pauses the model's queue for the
+    provider's Retry-After and the request queues again.
+    """
+    import groq
+    client = get_async_client()
+    limiter = get_rate_limiter(model)
+    deadline = time.monotonic() + timeout
+    estimate = _estimate_tokens(messages) + max_tokens
+    while True:
+        reserved = await _acquire(limiter, model, estimate, priority, deadline)
+        _stats.count(attempts=1)
+        started = time.monotonic()
+        try:
+            chat_completion = await asyncio.wait_for(
+                client.chat.completions.create(
+                    messages=messages,
+                    model=model,
+                    temperature=0.7,
+                    max_tokens=max_tokens
+                ),
+                deadline - started
+            )
+        except groq.RateLimitError as e:
+            _record_failure(model, e)
+            limiter.settle(reserved, 0)
+            limiter.penalize(_retry_after(e))
+            continue
+        except Exception as e:
+            _record_failure(model, e)
+            raise
         
+        usage = chat_completion.usage
+        limiter.settle(reserved, usage.total_tokens if usage else reserved)
+        if usage:
+            LLM_TOKENS.labels(model, "prompt").inc(usage.prompt_tokens)
+            LLM_TOKENS.labels(model, "completion").inc(usage.completion_tokens)
+        _stats.record(model, max_tokens, time.monotonic() - started)
         return chat_completion.choices[0].message.content
-    except Exception as e:
-        print(f"Groq API Error: {e}")
-        raise Exception(f"LLM generation failed: {str(e)}")
+
+
+async def _acquire(limiter: RateLimiter, model: str, estimate: int, priority: int, deadline: float) -> int:
+    """Wait for quota until deadline; raises LLMRateLimitError if it does not come."""
+    try:
+        return await asyncio.wait_for(limiter.acquire(estimate, priority), deadline - time.monotonic())
+    except asyncio.TimeoutError:
+        raise LLMRateLimitError(
+            f"Rate limit: no {model} quota before the deadline",
+            retry_after=limiter.retry_after()
+        )
+
+
+def _record_failure(model: str, error: BaseException):
+    _stats.count(failures=1)
+    LLM_ERRORS.labels(model, type(error).__name__).inc()
+
+
+def _estimate_tokens(messages: list) -> int:
+    """Cheap prompt-size estimate for quota reservations (settled afterwards)."""
+    return sum(len(message["content"]) // 4 + 4 for message in messages)
+
+
+def _retry_after(error: Exception) -> float:
+    """Seconds the provider asked us to wait, from the Retry-After header."""
+    try:
+        return max(float(error.response.headers.get("retry-after")), 0.0)
+    except (AttributeError, TypeError, ValueError):
+        return DEFAULT_RETRY_AFTER
+
+
+def _final_error(errors: list, error: Optional[Exception]) -> LLMError:
+    """Error raised once every model in the chain has failed."""
+    message = f"LLM generation failed: {'; '.join(errors)}"
+    if isinstance(error, LLMRateLimitError):
+        return LLMRateLimitError(message, retry_after=error.retry_after)
+    return LLMError(message)
+
+
+async def astream(
+    prompt: Union[str, list],
+    model: str = DEFAULT_MODEL,
+    priority: int = PRIORITY_STANDARD
+) -> AsyncIterator[str]:
+    """
+    Stream generated text from Groq API as it is produced.
+    
+    Args:
+        prompt: Complete prompt, or chat messages
+        model: Groq model name (default: llama-3.1-8b-instant)
+        priority: Rate-limiter queue class (PRIORITY_INTERACTIVE first)
+        
+    Yields:
+        Text deltas in generation order
+    """
+    import groq
+    client = get_async_client()
+    messages = _to_messages(prompt)
+    deadline = time.monotonic() + LLM_TIMEOUT
+    estimate = _estimate_tokens(messages) + 2048
+    errors = []
+    error = None
+    for attempt, candidate in enumerate(_model_chain(model)):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            errors.append("deadline exceeded")
+            break
+        if attempt:
+            _stats.count(fallbacks=1)
+            print(f"Falling back to {candidate}")
+        
+        # Fall back only before the first token; a stream that already
+        # reached the client cannot be restarted on another model
+        limiter = get_rate_limiter(candidate)
+        attempt_deadline = time.monotonic() + min(LLM_ATTEMPT_TIMEOUT, remaining)
+        parts = []
+        reserved = 0
+        try:
+            while True:
+                reserved = await _acquire(limiter, candidate, estimate, priority, attempt_deadline)
+                _stats.count(attempts=1)
+                try:
+                    stream = await asyncio.wait_for(
+                        client.chat.completions.create(
+                            messages=messages,
+                            model=candidate,
+                            temperature=0.7,
+                            max_tokens=2048,
+                            stream=True
+                        ),
+                        attempt_deadline - time.monotonic()
+                    )
+                    break
+                except groq.RateLimitError as e:
+                    _record_failure(candidate, e)
+                    limiter.settle(reserved, 0)
+                    limiter.penalize(_retry_after(e))
+            
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    parts.append(chunk.choices[0].delta.content)
+                    yield parts[-1]
+            completion_tokens = len("".join(parts)) // 4
+            limiter.settle(reserved, estimate - 2048 + completion_tokens)
+            LLM_TOKENS.labels(candidate, "prompt").inc(estimate - 2048)
+            LLM_TOKENS.labels(candidate, "completion").inc(completion_tokens)
+            return
+        except Exception as e:
+            if not isinstance(e, LLMRateLimitError):
+                _record_failure(candidate, e)
+            print(f"Groq API Error ({candidate}): {e}")
+            errors.append(f"{candidate}: {str(e) or type(e).__name__}")
+            error = e
+            if parts or not _is_retryable(e):
+                break
+    raise _final_error(errors, error)
+
+
+async def aclose():
+    """Close the async connection pool (called on application shutdown)."""
+    if _async_client is not None:
+        await _async_client.close()
@@ -0,0 +1,219 @@
+"""
+Rate Limiter - Provider Quota Scheduler
+
+Client-side token buckets for the LLM provider's requests-per-minute and
+tokens-per-minute quotas, with a priority queue in front of them so that
+throughput stays just under quota instead of bouncing off 429s.
+"""
+
+import asyncio
+import heapq
+import itertools
+import os
+import time
+
+# Per-model provider quotas (0 disables the corresponding bucket). Off
+# by default: quotas depend on the account tier. The buckets live in each
+# worker process, so set these to the account quota divided by the
+# number of workers sharing the API key.
+LLM_RPM = float(os.getenv("LLM_RPM", "0"))
+LLM_TPM = float(os.getenv("LLM_TPM", "0"))
+
+# Pause used after a 429 that carries no Retry-After header
+DEFAULT_RETRY_AFTER = 1.0
+
+# Priority classes, lowest value served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_STANDARD = 1
+PRIORITY_BATCH = 2
+
+_PRIORITY_NAMES = {
+    PRIORITY_INTERACTIVE: "interactive",
+    PRIORITY_STANDARD: "standard",
+    PRIORITY_BATCH: "batch"
+}
+
+
+class _Bucket:
+    """Token bucket refilled continuously up to one minute of quota."""
+    
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.level = per_minute
+        self.updated = time.monotonic()
+    
+    @property
+    def limited(self) -> bool:
+        return self.capacity > 0
+    
+    def refill(self, now: float):
+        if self.limited:
+            self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    def wait_time(self, amount: float) -> float:
+        """Seconds until amount is available (0 if it is available now)."""
+        if not self.limited or self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+    
+    def take(self, amount: float):
+        if self.limited:
+            self.level -= amount
+    
+    def give(self, amount: float):
+        if self.limited:
+            self.level = min(self.capacity, self.level + amount)
+
+
+class RateLimiter:
+    """
+    Priority scheduler over an RPM bucket and an estimated-TPM bucket.
+    
+    Callers await acquire() with their estimated token cost; a background
+    task grants waiters strictly in priority order (FIFO within a class)
+    as soon as both buckets can cover the head of the queue. After a 429
+    the whole queue pauses for the provider's Retry-After. Callers settle()
+    with the actual token usage so over-estimates are refunded.
+    """
+    
+    def __init__(self, rpm: float = LLM_RPM, tpm: float = LLM_TPM):
+        self._requests = _Bucket(rpm)
+        self._tokens = _Bucket(tpm)
+        self._queue = []
+        self._seq = itertools.count()
+        self._blocked_until = 0.0
+        self._loop = None
+        self._wakeup = None
+        self._worker = None
+        self._granted = 0
+        self._throttled = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+    
+    @property
+    def queued(self) -> int:
+        """Number of callers waiting for quota."""
+        return sum(1 for entry in self._queue if not entry[3].done())
+    
+    async def acquire(self, tokens: int, priority: int = PRIORITY_STANDARD) -> int:
+        """
+        Wait until one request of the given token cost fits the quota.
+        
+        Args:
+            tokens: Estimated tokens (prompt + completion) for the request
+            priority: PRIORITY_INTERACTIVE, PRIORITY_STANDARD or PRIORITY_BATCH
+            
+        Returns:
+            Tokens reserved, to be passed to settle()
+        """
+        if self._tokens.limited:
+            # A request larger than the whole bucket would never be granted
+            tokens = min(tokens, self._tokens.capacity)
+        
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = []
+            self._wakeup = asyncio.Event()
+            self._worker = loop.create_task(self._run())
+        
+        future = loop.create_future()
+        heapq.heappush(self._queue, (priority, next(self._seq), tokens, future, time.monotonic()))
+        self._wakeup.set()
+        try:
+            return await future
+        except asyncio.CancelledError:
+            # Granted just as the caller gave up: return the quota
+            if future.done() and not future.cancelled():
+                self._requests.give(1)
+                self._tokens.give(tokens)
+            raise
+    
+    def settle(self, reserved: int, used: int):
+        """Refund (or charge) the difference between reserved and actual tokens."""
+        self._tokens.refill(time.monotonic())
+        self._tokens.give(reserved - used)
+    
+    def penalize(self, retry_after: float):
+        """Pause all grants for retry_after seconds after a provider 429."""
+        self._throttled += 1
+        self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+        if self._wakeup is not None:
+            self._wakeup.set()
+    
+    def retry_after(self) -> float:
+        """Rough seconds until the next queued request could be granted."""
+        now = time.monotonic()
+        self._requests.refill(now)
+        self._tokens.refill(now)
+        return max(self._blocked_until - now, self._requests.wait_time(1), 0.0)
+    
+    async def _run(self):
+        queue = self._queue
+        wakeup = self._wakeup
+        while True:
+            while queue and queue[0][3].cancelled():
+                heapq.heappop(queue)
+            if not queue:
+                wakeup.clear()
+                await wakeup.wait()
+                continue
+            
+            _, _, tokens, future, enqueued = queue[0]
+            now = time.monotonic()
+            self._requests.refill(now)
+            self._tokens.refill(now)
+            delay = max(self._blocked_until - now, self._requests.wait_time(1), self._tokens.wait_time(tokens))
+            if delay <= 0:
+                heapq.heappop(queue)
+                self._requests.take(1)
+                self._tokens.take(tokens)
+                self._granted += 1
+                self._total_wait += now - enqueued
+                self._max_wait = max(self._max_wait, now - enqueued)
+                future.set_result(tokens)
+                continue
+            
+            # Sleep until quota refills, or until a new (maybe higher
+            # priority) waiter or a 429 changes the picture
+            wakeup.clear()
+            try:
+                await asyncio.wait_for(wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+    
+    def stats(self) -> dict:
+        """Queue depth, wait time and quota headroom since startup."""
+        now = time.monotonic()
+        queued = {name: 0 for name in _PRIORITY_NAMES.values()}
+        for priority, _, _, future, _ in self._queue:
+            if not future.done():
+                queued[_PRIORITY_NAMES.get(priority, str(priority))] += 1
+        return {
+            "queue_depth": sum(queued.values()),
+            "queued": queued,
+            "granted": self._granted,
+            "throttled_429": self._throttled,
+            "avg_wait_ms": round(self._total_wait / (self._granted or 1) * 1000, 1),
+            "max_wait_ms": round(self._max_wait * 1000, 1),
+            "blocked_for_s": round(max(self._blocked_until - now, 0.0), 2),
+            "requests_available": round(self._requests.level, 1) if self._requests.limited else None,
+            "tokens_available": round(self._tokens.level) if self._tokens.limited else None
+        }
+
+
+_limiters = {}
+
+def get_rate_limiter(model: str) -> RateLimiter:
+    """Return the limiter for a model (provider quotas are per model)."""
+    limiter = _limiters.get(model)
+    if limiter is None:
+        limiter = _limiters[model] = RateLimiter()
+    return limiter
+
+
+def rate_limit_stats() -> dict:
+    """Limiter statistics for every model used so far."""
+    return {model: limiter.stats() for model, limiter in _limiters.items()}
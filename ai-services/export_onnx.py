@@ -0,0 +1,73 @@
+"""
+ONNX Export - int8 Embedding Model
+
+Exports the embedding model for EMBEDDING_BACKEND=onnx and checks that
+the quantized vectors agree with the PyTorch model before the export is
+used. Run once per model version, from the ai-services directory:
+
+    python export_onnx.py --output ./onnx_models/all-MiniLM-L6-v2-int8
+
+Needs torch, sentence-transformers and onnx (export only; serving needs
+just onnxruntime and tokenizers).
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+from services.embedding_backends import (
+    EMBED_ONNX_TOLERANCE, OnnxBackend, TorchBackend, compare_backends, export_onnx
+)
+from services.embedding_service import EMBEDDING_MODEL, EMBEDDING_ONNX_PATH
+
+# Verification texts: short queries, long passages and near-empty input
+VERIFY_TEXTS = [
+    "Senior Backend Engineer with Python, FastAPI and PostgreSQL",
+    "Design a rate limiter for a public API",
+    "Tell me about a time you disagreed with your manager.",
+    "STAR method: Situation, Task, Action, Result",
+    "Kubernetes, Terraform, AWS, CI/CD pipelines and on-call experience",
+    "a",
+    " ".join(["Five years building event-driven microservices, owning caching, database performance "
+              "and mentoring engineers across three product teams."] * 12),
+    "Entwicklung verteilter Systeme und Datenbanken",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the embedding model to int8 ONNX")
+    parser.add_argument("--model", default=EMBEDDING_MODEL)
+    parser.add_argument("--output", default=EMBEDDING_ONNX_PATH)
+    parser.add_argument("--tolerance", type=float, default=EMBED_ONNX_TOLERANCE,
+                        help="Minimum cosine similarity to the torch vectors")
+    args = parser.parse_args()
+    
+    # Export next to the output and move it into place only once it has
+    # passed the check, so a rejected or failed export never replaces the
+    # model the service loads
+    output = os.path.normpath(args.output)
+    staging = f"{output}.tmp-{os.getpid()}"
+    shutil.rmtree(staging, ignore_errors=True)
+    try:
+        export_onnx(args.model, staging)
+        print(f"Exported {args.model} to {staging}")
+        
+        agreement = compare_backends(TorchBackend(args.model), OnnxBackend(staging, args.model), VERIFY_TEXTS)
+        print(json.dumps(agreement, indent=2))
+        if agreement["min_cosine"] < args.tolerance:
+            print(f"Export rejected: min cosine {agreement['min_cosine']} < {args.tolerance}; {output} left unchanged")
+            sys.exit(1)
+        
+        previous = f"{output}.old-{os.getpid()}"
+        if os.path.exists(output):
+            os.rename(output, previous)
+        os.rename(staging, output)
+        shutil.rmtree(previous, ignore_errors=True)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    print(f"Vectors match the torch backend within tolerance; installed at {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,40 +1,400 @@
 """
-RAG Ingestion - One-Time Document Loading
+RAG Ingestion - Streaming Document Loading
 
 Loads interview preparation documents into ChromaDB.
 Uses Sentence-Transformers for embeddings.
+
+Documents are streamed from a JSONL file or a directory of Markdown/text
+files, split into chunks, batch-encoded and upserted in bounded batches.
+Re-runs are incremental: only new or changed chunks are re-embedded and
+chunks whose source disappeared are deleted. Progress is checkpointed so
+an interrupted run resumes where it stopped.
 """
 
-import chromadb
-from services.embedding_service import generate_embedding
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator
+from services.embedding_service import generate_embeddings, EMBEDDING_MODEL
+from services.rag_service import VECTOR_BACKEND, get_store
+from services.vector_index import VECTOR_INDEX_PATH, export_snapshot, read_current_version
+from utils.chunking import CHUNK_OVERLAP, CHUNK_SIZE, chunk_text
+
+# Chunks embedded and upserted per batch (bounds memory use)
+BATCH_SIZE = 256
+# Encoder batch size inside one upsert batch
+ENCODE_BATCH_SIZE = 64
+PROGRESS_INTERVAL = 5.0
+
+_TEXT_EXTENSIONS = (".md", ".markdown", ".txt")
 
 
-def ingest_documents(documents: list[dict], collection_name: str = "interview_prep"):
+def iter_jsonl(path: str) -> Iterator[dict]:
     """
-    Ingest interview preparation documents into ChromaDB.
+    Stream documents from a JSONL file.
+    
+    Each line is an object with 'text' and optional 'id' and 'metadata'
+    keys. Lines without an id get one derived from the file and line number.
+    
+    Args:
+        path: JSONL file path
+        
+    Yields:
+        Document dicts
+    """
+    base = os.path.splitext(os.path.basename(path))[0]
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if not record.get("text"):
+                continue
+            record.setdefault("id", f"{base}:{line_no}")
+            yield record
+
+
+def iter_directory(path: str) -> Iterator[dict]:
+    """
+    Stream Markdown/text files from a directory tree in a stable order.
+    
+    Args:
+        path: Directory path
+        
+    Yields:
+        Document dicts keyed by the file's path relative to the directory
+    """
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for name in sorted(files):
+            if not name.lower().endswith(_TEXT_EXTENSIONS):
+                continue
+            file_path = os.path.join(root, name)
+            with open(file_path, encoding="utf-8") as f:
+                text = f.read()
+            if text.strip():
+                yield {"id": os.path.relpath(file_path, path).replace(os.sep, "/"), "text": text}
+
+
+def iter_source(path: str) -> Iterator[dict]:
+    """Stream documents from a JSONL file or a directory of text files."""
+    if os.path.isdir(path):
+        return iter_directory(path)
+    return iter_jsonl(path)
+
+
+def iter_chunks(documents: Iterable[dict], chunk_size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP) -> Iterator[tuple[dict, list[dict]]]:
+    """
+    Chunk each document.
+    
+    Single-chunk documents keep their id; longer documents get
+    '<id>#<n>' chunk ids. Every chunk records its source document id.
+    
+    Yields:
+        (document, chunks) pairs
+    """
+    for doc in documents:
+        pieces = chunk_text(doc["text"], chunk_size, overlap)
+        extra = {
+            key: value for key, value in (doc.get("metadata") or {}).items()
+            if isinstance(value, (str, int, float, bool))
+        }
+        chunks = []
+        for i, piece in enumerate(pieces):
+            chunk_id = doc["id"] if len(pieces) == 1 else f"{doc['id']}#{i}"
+            chunks.append({
+                "id": chunk_id,
+                "text": piece,
+                "metadata": {**extra, "source": doc["id"], "chunk": i}
+            })
+        yield doc, chunks
+
+
+def _load_checkpoint(path: str, key: str) -> tuple[int, bool]:
+    """Documents already synced, and whether the interrupted run wrote anything."""
+    if not path or not os.path.exists(path):
+        return 0, False
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    entry = data.get(key, 0)
+    if isinstance(entry, int):
+        # Checkpoint written before the dirty flag existed: assume it wrote
+        return entry, entry > 0
+    return entry["documents"], entry["dirty"]
+
+
+def _save_checkpoint(path: str, key: str, docs_done: int, dirty: bool):
+    data = {}
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    data[key] = {"documents": docs_done, "dirty": dirty}
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def _clear_checkpoint(path: str, key: str):
+    if not path or not os.path.exists(path):
+        return
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    data.pop(key, None)
+    if data:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+    else:
+        os.remove(path)
+
+
+def _content_hash(chunk: dict) -> str:
+    """Hash of everything that determines a stored chunk (text, metadata, model)."""
+    metadata = json.dumps(chunk["metadata"], sort_keys=True)
+    payload = f"{EMBEDDING_MODEL}\0{chunk['text']}\0{metadata}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _existing_hashes(collection, ids: list[str]) -> dict:
+    """Map of id -> stored content hash for ids already in the collection."""
+    result = collection.get(ids=ids, include=["metadatas"])
+    return {
+        chunk_id: (metadata or {}).get("content_hash")
+        for chunk_id, metadata in zip(result["ids"], result["metadatas"])
+    }
+
+
+def _prune_missing(collection, origin: str, seen: set, page_size: int = 5000, before_delete=None) -> int:
+    """
+    Delete chunks from origin whose id was not produced by this run.
+    
+    before_delete, if given, is called once before the first delete.
+    """
+    stale = []
+    offset = 0
+    while True:
+        page = collection.get(where={"origin": origin}, include=[], limit=page_size, offset=offset)
+        if not page["ids"]:
+            break
+        stale.extend(chunk_id for chunk_id in page["ids"] if chunk_id not in seen)
+        offset += len(page["ids"])
+    
+    if stale and before_delete is not None:
+        before_delete()
+    for i in range(0, len(stale), page_size):
+        collection.delete(ids=stale[i:i + page_size])
+    return len(stale)
+
+
+def ingest_stream(
+    documents: Iterable[dict],
+    collection_name: str = "interview_prep",
+    origin: str = "default",
+    batch_size: int = BATCH_SIZE,
+    chunk_size: int = CHUNK_SIZE,
+    chunk_overlap: int = CHUNK_OVERLAP,
+    prune: bool = True,
+    checkpoint_path: str = None
+) -> dict:
+    """
+    Incrementally sync documents into ChromaDB.
+    
+    Every chunk stores a content hash and its origin (the source it was
+    loaded from). Chunks whose hash is unchanged are skipped without
+    re-embedding; new and changed chunks are embedded in batches of about
+    batch_size and upserted on a writer thread while the next batch is
+    prepared. With prune, chunks from the same origin that this run did
+    not produce (deleted documents, documents that shrank) are removed.
+    
+    At most one batch is in flight, so memory stays bounded regardless of
+    corpus size. After each upsert the number of completed source
+    documents is checkpointed, and a rerun with the same checkpoint skips
+    re-checking them. Upserts are idempotent, so re-processing a batch
+    interrupted by a crash is harmless. The checkpoint also records
+    whether the interrupted run had started writing: a resumed run then
+    bumps the knowledge base version even if everything it checks is
+    already unchanged, so readers pick up the earlier run's writes.
     
     Args:
-        documents: List of dicts with 'text' and 'id' keys
+        documents: Iterable of dicts with 'text' and 'id' keys
         collection_name: Name of the ChromaDB collection
+        origin: Identifies the source; pruning only touches this origin
+        batch_size: Approximate chunks per embedding/upsert batch
+        chunk_size: Maximum characters per chunk
+        chunk_overlap: Characters repeated between consecutive chunks
+        prune: Delete chunks from this origin that were not seen
+        checkpoint_path: Optional JSON file used to resume interrupted runs
+        
+    Returns:
+        Summary with added/updated/unchanged/removed chunk counts
     """
-    client = chromadb.PersistentClient(path="./chroma_db")
+    store = get_store()
     
-    collection = client.get_or_create_collection(
+    collection = store.get_or_create_collection(
         name=collection_name,
         metadata={"description": "Interview preparation knowledge base"}
     )
     
-    # Generate embeddings using existing embedding service
-    for doc in documents:
-        embedding = generate_embedding(doc['text'])
+    checkpoint_key = f"{collection_name}::{origin}"
+    skip, resumed_dirty = _load_checkpoint(checkpoint_path, checkpoint_key)
+    if skip or resumed_dirty:
+        print(f"Resuming after {skip} already synced documents")
+    dirty = resumed_dirty
+    
+    summary = {"added": 0, "updated": 0, "unchanged": 0, "removed": 0}
+    seen = set()
+    started = time.perf_counter()
+    last_report = started
+    docs_done = skip
+    docs_seen = 0
+    batch = []
+    in_flight = None
+    
+    def mark_dirty():
+        # Recorded before the first write lands, so a crash at any later
+        # point still leaves the resumed run knowing it must bump
+        nonlocal dirty
+        if not dirty:
+            dirty = True
+            if checkpoint_path:
+                _save_checkpoint(checkpoint_path, checkpoint_key, docs_done, dirty)
+    
+    def wait_for_write(pending):
+        nonlocal docs_done
+        future, docs_after = pending
+        future.result()
+        docs_done = docs_after
+        if checkpoint_path:
+            _save_checkpoint(checkpoint_path, checkpoint_key, docs_done, dirty)
+    
+    def flush(chunks: list[dict], docs_after: int):
+        nonlocal in_flight
+        existing = _existing_hashes(collection, [c["id"] for c in chunks])
+        changed = []
+        for chunk in chunks:
+            if existing.get(chunk["id"]) == chunk["metadata"]["content_hash"]:
+                summary["unchanged"] += 1
+                continue
+            summary["updated" if chunk["id"] in existing else "added"] += 1
+            changed.append(chunk)
+        
+        if in_flight is not None:
+            wait_for_write(in_flight)
+            in_flight = None
+        if not changed:
+            if checkpoint_path:
+                _save_checkpoint(checkpoint_path, checkpoint_key, docs_after, dirty)
+            return
+        mark_dirty()
         
-        collection.add(
-            ids=[doc['id']],
-            embeddings=[embedding],
-            documents=[doc['text']]
+        embeddings = generate_embeddings([c["text"] for c in changed], batch_size=ENCODE_BATCH_SIZE, use_cache=False)
+        future = writer.submit(
+            collection.upsert,
+            ids=[c["id"] for c in changed],
+            embeddings=embeddings,
+            documents=[c["text"] for c in changed],
+            metadatas=[c["metadata"] for c in changed]
         )
+        in_flight = (future, docs_after)
+    
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingest-writer") as writer:
+        for _, chunks in iter_chunks(documents, chunk_size, chunk_overlap):
+            docs_seen += 1
+            for chunk in chunks:
+                seen.add(chunk["id"])
+            if docs_seen <= skip:
+                # Already synced before the interruption; only remember ids for pruning
+                continue
+            
+            for chunk in chunks:
+                chunk["metadata"]["origin"] = origin
+                chunk["metadata"]["content_hash"] = _content_hash(chunk)
+            batch.extend(chunks)
+            if len(batch) >= batch_size:
+                flush(batch, docs_seen)
+                batch = []
+            
+            now = time.perf_counter()
+            if now - last_report >= PROGRESS_INTERVAL:
+                last_report = now
+                rate = (docs_seen - skip) / (now - started)
+                print(f"Progress: {docs_seen} docs checked ({rate:.1f} docs/sec), {summary}")
+        
+        if batch:
+            flush(batch, docs_seen)
+        if in_flight is not None:
+            wait_for_write(in_flight)
     
-    print(f"Ingested {len(documents)} documents into ChromaDB")
+    if prune:
+        summary["removed"] = _prune_missing(collection, origin, seen, before_delete=mark_dirty)
+    
+    if dirty:
+        # Let readers in other worker processes pick up the new data
+        store.bump_version()
+    if VECTOR_BACKEND == "numpy" and read_current_version(VECTOR_INDEX_PATH) != store.version:
+        # Workers search the memory-mapped export, so publish the new version
+        export_snapshot(store.open(), store.version)
+    _clear_checkpoint(checkpoint_path, checkpoint_key)
+    
+    elapsed = time.perf_counter() - started
+    summary["documents"] = docs_seen
+    summary["seconds"] = round(elapsed, 3)
+    print(
+        f"Synced {docs_seen} documents into ChromaDB in {elapsed:.1f}s "
+        f"({(docs_seen - skip) / elapsed if elapsed else 0:.1f} docs/sec): "
+        f"{summary['added']} added, {summary['updated']} updated, "
+        f"{summary['unchanged']} unchanged, {summary['removed']} removed"
+    )
+    return summary
+
+
+def ingest_documents(documents: Iterable[dict], collection_name: str = "interview_prep", origin: str = "default"):
+    """
+    Ingest interview preparation documents into ChromaDB.
+    
+    Re-running with the same documents is cheap: unchanged documents are
+    skipped, changed ones are re-embedded and removed ones are deleted.
+    
+    Args:
+        documents: Iterable of dicts with 'text' and 'id' keys
+        collection_name: Name of the ChromaDB collection
+        origin: Identifies this document set for pruning
+        
+    Returns:
+        Summary with added/updated/unchanged/removed chunk counts
+    """
+    return ingest_stream(documents, collection_name, origin=origin)
+
+
+def main(default_documents: list[dict]):
+    parser = argparse.ArgumentParser(description="Ingest documents into the interview prep knowledge base")
+    parser.add_argument("source", nargs="?", help="JSONL file or directory of .md/.txt files (default: built-in samples)")
+    parser.add_argument("--collection", default="interview_prep")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--chunk-overlap", type=int, default=CHUNK_OVERLAP)
+    parser.add_argument("--no-prune", action="store_true", help="Keep chunks whose source document disappeared")
+    parser.add_argument("--checkpoint", default=".ingest_checkpoint.json", help="Resume file ('' to disable)")
+    args = parser.parse_args()
+    
+    if not args.source:
+        ingest_documents(default_documents, args.collection)
+        return
+    
+    ingest_stream(
+        iter_source(args.source),
+        collection_name=args.collection,
+        origin=os.path.abspath(args.source),
+        batch_size=args.batch_size,
+        chunk_size=args.chunk_size,
+        chunk_overlap=args.chunk_overlap,
+        prune=not args.no_prune,
+        checkpoint_path=args.checkpoint or None
+    )
 
 
 if __name__ == "__main__":
@@ -95,4 +455,4 @@ if __name__ == "__main__":
         }
     ]
     
-    ingest_documents(sample_docs)
+    main(sample_docs)
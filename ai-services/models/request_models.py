@@ -4,17 +4,34 @@ Request Models
 Pydantic models for API request and response validation.
 """
 
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, model_validator
+from typing import List, Optional
 
 
 class QueryRequest(BaseModel):
     """Request model for AI query."""
-    resume_text: str
+    resume_text: str = ""
     job_description: str
     previous_output: Optional[str] = None
+    session_id: Optional[str] = None
+    
+    @model_validator(mode="after")
+    def _require_resume(self):
+        # Follow-ups take the resume from the session; everything else needs one
+        if not self.session_id and not self.resume_text.strip():
+            raise ValueError("resume_text is required unless session_id is given")
+        return self
+
+
+class BatchQueryRequest(BaseModel):
+    """Request model for analyzing many resumes against one job description."""
+    resume_texts: List[str]
+    job_description: str
 
 
 class QueryResponse(BaseModel):
     """Response model containing AI-generated output."""
     ai_output: str
+    skipped_stages: List[str] = []
+    prompt_tokens: Optional[int] = None
+    session_id: Optional[str] = None
@@ -1,12 +1,12 @@
-def build_analysis_prompt(
-    resume_text: str,
-    job_description: str,
-    retrieved_context: str,
-    previous_output: str = None,
-    company_info: dict = None
-) -> str:
-    
-    prompt = f"""You are an AI assistant that analyzes a candidate's resume against a job description.
+# Bump whenever the prompt template changes (invalidates cached responses)
+PROMPT_VERSION = "2"
+
+# System prompts are module constants so they are byte-for-byte identical
+# across requests; everything request-specific goes in the user message.
+# This keeps the long instruction block a stable prefix that provider-side
+# prompt caching can reuse.
+
+ANALYSIS_SYSTEM_PROMPT = """You are an AI assistant that analyzes a candidate's resume against a job description.
 Your goal is to produce a clear, honest, and professional evaluation suitable for real-world hiring or interview preparation.
 
 Follow these rules strictly:
@@ -17,66 +17,9 @@ Follow these rules strictly:
 • Keep the tone neutral, constructive, and realistic
 • Base all analysis only on the provided context
 
-=== RETRIEVED KNOWLEDGE BASE ===
-{retrieved_context}
-"""
-
-    if company_info:
-        prompt += f"""
-=== COMPANY INTERVIEW INSIGHTS (Web Scraped) ===
-**Interview Process:** {company_info.get('process', 'N/A')}
-
-**Interview Rounds:** {company_info.get('rounds', 'N/A')}
-
-**Common Questions:** {company_info.get('questions', 'N/A')}
-
-**Preparation Tips:** {company_info.get('tips', 'N/A')}
-
-"""
-
-    prompt += f"""
-=== CANDIDATE RESUME ===
-{resume_text}
-
-=== TARGET JOB DESCRIPTION ===
-{job_description}
-"""
-
-    if previous_output:
-        prompt = f"""You are a helpful AI career advisor assisting a candidate with their interview preparation.
-
-=== ORIGINAL ANALYSIS CONTEXT ===
-Resume: {resume_text}
-Job Description: {job_description}
+The user message contains the retrieved knowledge base, optional web-scraped company interview insights, the candidate resume and the target job description.
 
-You previously provided this analysis:
-{previous_output}
-
-The candidate now asks: "{job_description}"
-
-**CRITICAL INSTRUCTIONS:**
-- Answer naturally and conversationally
-- DO NOT use rigid section templates unless the question requires structured information
-- Use headings ONLY when they add value to the answer
-- For simple questions, provide direct answers without unnecessary structure
-- Always reference the resume and job description in your response
-- Use bullet points and formatting naturally, not as a template
-- Be flexible - adapt your response format to the question type
-
-**Response Guidelines:**
-- For "how" questions: Provide step-by-step guidance
-- For "what" questions: Give direct explanations with examples
-- For "why" questions: Explain reasoning with context
-- For complex topics: Use sections to organize information
-- For simple queries: Answer directly without over-structuring
-
-Provide a natural, helpful response that directly addresses their question while referencing their specific resume and the job requirements.
-
-Respond now:
-"""
-        return prompt
-
-    prompt += """
+Produce your analysis in exactly this format:
 
 # 🎯 Interview Preparation Analysis
 
@@ -407,8 +350,195 @@ Feel free to ask follow-up questions about:
 **Good luck! You've got this! 🚀**
 
 ---
+"""
+
+CONTINUATION_SYSTEM_PROMPT = """You are a helpful AI career advisor assisting a candidate with their interview preparation.
+
+The user message contains the original resume and job description, the analysis you previously provided, and the candidate's new question.
+
+**CRITICAL INSTRUCTIONS:**
+- Answer naturally and conversationally
+- DO NOT use rigid section templates unless the question requires structured information
+- Use headings ONLY when they add value to the answer
+- For simple questions, provide direct answers without unnecessary structure
+- Always reference the resume and job description in your response
+- Use bullet points and formatting naturally, not as a template
+- Be flexible - adapt your response format to the question type
+
+**Response Guidelines:**
+- For "how" questions: Provide step-by-step guidance
+- For "what" questions: Give direct explanations with examples
+- For "why" questions: Explain reasoning with context
+- For complex topics: Use sections to organize information
+- For simple queries: Answer directly without over-structuring
+
+Provide a natural, helpful response that directly addresses their question while referencing their specific resume and the job requirements.
+"""
+
+SUMMARY_SYSTEM_PROMPT = """You maintain a running summary of an interview preparation conversation between a candidate and an AI career advisor.
+
+Merge the new exchange into the existing summary. Keep the key findings (match score, skill gaps, likely interview rounds, roadmap decisions) and the topics the candidate asked about. Drop formatting, examples and pleasantries.
+
+Reply with the updated summary only: at most 200 words of concise bullet points, no preamble.
+"""
+
+
+def build_analysis_messages(
+    resume_text: str,
+    job_description: str,
+    retrieved_context: str,
+    previous_output: str = None,
+    company_info: dict = None
+) -> list[dict]:
+    """
+    Build chat messages for an analysis or a follow-up question.
+    
+    Args:
+        resume_text: Candidate's resume
+        job_description: Target job description (or the follow-up question)
+        retrieved_context: Retrieved knowledge base text
+        previous_output: Optional previous AI output for continuation
+        company_info: Optional scraped company interview info
+        
+    Returns:
+        [system message, user message]; the system message is a constant
+    """
+    if previous_output:
+        user = f"""=== ORIGINAL ANALYSIS CONTEXT ===
+Resume: {resume_text}
+Job Description: {job_description}
+
+You previously provided this analysis:
+{previous_output}
+
+The candidate now asks: "{job_description}"
+
+Respond now:
+"""
+        return [
+            {"role": "system", "content": CONTINUATION_SYSTEM_PROMPT},
+            {"role": "user", "content": user}
+        ]
+    
+    parts = [f"""=== RETRIEVED KNOWLEDGE BASE ===
+{retrieved_context}
+"""]
+    
+    if company_info:
+        parts.append(f"""
+=== COMPANY INTERVIEW INSIGHTS (Web Scraped) ===
+**Interview Process:** {company_info.get('process', 'N/A')}
+
+**Interview Rounds:** {company_info.get('rounds', 'N/A')}
+
+**Common Questions:** {company_info.get('questions', 'N/A')}
+
+**Preparation Tips:** {company_info.get('tips', 'N/A')}
+
+""")
+    
+    parts.append(f"""
+=== CANDIDATE RESUME ===
+{resume_text}
+
+=== TARGET JOB DESCRIPTION ===
+{job_description}
 
 Begin your analysis now:
+""")
+    
+    return [
+        {"role": "system", "content": ANALYSIS_SYSTEM_PROMPT},
+        {"role": "user", "content": "".join(parts)}
+    ]
+
+
+def build_analysis_prompt(
+    resume_text: str,
+    job_description: str,
+    retrieved_context: str,
+    previous_output: str = None,
+    company_info: dict = None
+) -> str:
+    """Single-string form of build_analysis_messages for providers without chat roles."""
+    messages = build_analysis_messages(
+        resume_text, job_description, retrieved_context, previous_output, company_info
+    )
+    return "\n\n".join(message["content"] for message in messages)
+
+
+def build_session_messages(
+    resume_text: str,
+    job_description: str,
+    retrieved_context: str,
+    summary: str,
+    last_question: str,
+    last_output: str,
+    question: str
+) -> list[dict]:
+    """
+    Build chat messages for a follow-up turn in a server-side session.
+    
+    Earlier turns are represented by the rolling summary and only the most
+    recent response is included verbatim, so the prompt size stays roughly
+    constant as the conversation grows.
+    
+    Args:
+        resume_text: Candidate's resume
+        job_description: Target job description
+        retrieved_context: Context retrieved for the original analysis
+        summary: Rolling summary of turns before the most recent one
+        last_question: Question answered by last_output (None for the analysis)
+        last_output: Most recent AI response
+        question: The candidate's new question
+        
+    Returns:
+        [system message, user message]
+    """
+    asked = f'(The candidate asked: "{last_question}")\n' if last_question else ""
+    user = f"""=== ORIGINAL ANALYSIS CONTEXT ===
+Resume: {resume_text}
+Job Description: {job_description}
+
+=== RETRIEVED KNOWLEDGE BASE ===
+{retrieved_context}
+
+=== EARLIER CONVERSATION (summary) ===
+{summary or "(none)"}
+
+You previously provided this response:
+{asked}{last_output}
+
+The candidate now asks: "{question}"
+
+Respond now:
 """
+    return [
+        {"role": "system", "content": CONTINUATION_SYSTEM_PROMPT},
+        {"role": "user", "content": user}
+    ]
+
 
-    return prompt
+def build_summary_messages(summary: str, question: str, output: str) -> list[dict]:
+    """
+    Build chat messages that fold one exchange into the rolling summary.
+    
+    Args:
+        summary: Current summary ("" for none)
+        question: Candidate question (None for the initial analysis)
+        output: AI response to fold in
+        
+    Returns:
+        [system message, user message]
+    """
+    exchange = f'Candidate asked: "{question}"\n\nAdvisor answered:\n{output}' if question else f"Initial analysis:\n{output}"
+    user = f"""=== EXISTING SUMMARY ===
+{summary or "(none)"}
+
+=== NEW EXCHANGE ===
+{exchange}
+"""
+    return [
+        {"role": "system", "content": SUMMARY_SYSTEM_PROMPT},
+        {"role": "user", "content": user}
+    ]
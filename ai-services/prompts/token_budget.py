@@ -0,0 +1,346 @@
+"""
+Token Budget
+
+Fits the variable parts of the analysis messages into a per-model input
+token budget. Sections are trimmed lowest priority first: retrieved
+knowledge base text, then scraped company snippets, then the older part
+of the conversation, and only as a last resort the resume and job
+description themselves.
+
+Token counts use the Llama 3 tokenizer (PROMPT_TOKENIZER). Without it
+they fall back to tiktoken's cl100k, then to a length estimate, and say
+so once in the log.
+"""
+
+import os
+import threading
+from functools import lru_cache
+from typing import Optional
+from prompts.system_prompt import build_analysis_messages, build_session_messages
+
+# Input-token budget per model; PROMPT_TOKEN_BUDGET overrides all models
+MODEL_INPUT_TOKEN_BUDGETS = {
+    "llama-3.1-8b-instant": 8000,
+    "llama-3.3-70b-versatile": 8000,
+}
+DEFAULT_INPUT_TOKEN_BUDGET = 8000
+
+# Tokenizer used for counting: a tokenizer.json path, or a Hugging Face
+# repo id whose tokenizer.json is downloaded once (meta-llama repos are
+# gated and need HF_TOKEN)
+PROMPT_TOKENIZER = os.getenv("PROMPT_TOKENIZER", "./tokenizers/llama3-tokenizer.json")
+
+# Rough characters per token when no tokenizer is available
+_CHARS_PER_TOKEN = 4
+
+
+class _HFTokenizer:
+    """Hugging Face tokenizers model (the Llama 3 tokenizer.json)."""
+    
+    def __init__(self, source: str):
+        from tokenizers import Tokenizer
+        self.name = source
+        if not os.path.exists(source):
+            from huggingface_hub import hf_hub_download
+            source = hf_hub_download(source, "tokenizer.json")
+        self._tokenizer = Tokenizer.from_file(source)
+    
+    def count(self, text: str) -> int:
+        return len(self._tokenizer.encode(text, add_special_tokens=False).ids)
+    
+    def truncate(self, text: str, max_tokens: int, keep_end: bool) -> str:
+        # Cut the original text at token offsets instead of decoding ids
+        offsets = self._tokenizer.encode(text, add_special_tokens=False).offsets
+        if keep_end:
+            return text[offsets[-max_tokens][0]:]
+        return text[:offsets[max_tokens - 1][1]]
+
+
+class _TiktokenTokenizer:
+    """tiktoken cl100k: a different BPE vocabulary, close but not exact for Llama 3."""
+    
+    name = "tiktoken cl100k_base (approximate)"
+    
+    def __init__(self):
+        import tiktoken
+        self._encoding = tiktoken.get_encoding("cl100k_base")
+    
+    def count(self, text: str) -> int:
+        return len(self._encoding.encode(text, disallowed_special=()))
+    
+    def truncate(self, text: str, max_tokens: int, keep_end: bool) -> str:
+        tokens = self._encoding.encode(text, disallowed_special=())
+        return self._encoding.decode(tokens[-max_tokens:] if keep_end else tokens[:max_tokens])
+
+
+_tokenizer = None
+_tokenizer_loaded = False
+_tokenizer_lock = threading.Lock()
+
+
+def get_tokenizer():
+    """
+    Load the counting tokenizer once (None means the length estimate).
+    
+    Falls back to tiktoken, then to characters / 4, printing a warning
+    once: budgets are then only approximate.
+    """
+    global _tokenizer, _tokenizer_loaded
+    if _tokenizer_loaded:
+        return _tokenizer
+    with _tokenizer_lock:
+        if _tokenizer_loaded:
+            return _tokenizer
+        try:
+            _tokenizer = _HFTokenizer(PROMPT_TOKENIZER)
+        except Exception as e:
+            print(f"WARNING: prompt tokenizer {PROMPT_TOKENIZER!r} unavailable ({e})")
+            try:
+                _tokenizer = _TiktokenTokenizer()
+            except Exception:
+                _tokenizer = None
+            fallback = _tokenizer.name if _tokenizer else f"{_CHARS_PER_TOKEN} characters per token"
+            print(f"WARNING: prompt token budgets are approximate, counting with {fallback}")
+        _tokenizer_loaded = True
+        return _tokenizer
+
+
+def input_token_budget(model: str) -> int:
+    """Input-token budget for model."""
+    override = os.getenv("PROMPT_TOKEN_BUDGET")
+    if override:
+        return int(override)
+    return MODEL_INPUT_TOKEN_BUDGETS.get(model, DEFAULT_INPUT_TOKEN_BUDGET)
+
+
+def count_tokens(text: str) -> int:
+    """
+    Count tokens in text.
+    
+    Uses the configured tokenizer, or estimates from length if none loaded.
+    """
+    if not text:
+        return 0
+    tokenizer = get_tokenizer()
+    if tokenizer is not None:
+        return tokenizer.count(text)
+    return -(-len(text) // _CHARS_PER_TOKEN)
+
+
+def truncate_tokens(text: str, max_tokens: int, keep_end: bool = False) -> str:
+    """
+    Truncate text to at most max_tokens tokens.
+    
+    Args:
+        text: Text to truncate
+        max_tokens: Token limit
+        keep_end: Keep the end of the text instead of the beginning
+        
+    Returns:
+        Truncated text (unchanged if it already fits)
+    """
+    if max_tokens <= 0:
+        return ""
+    if count_tokens(text) <= max_tokens:
+        return text
+    tokenizer = get_tokenizer()
+    if tokenizer is not None:
+        return tokenizer.truncate(text, max_tokens, keep_end)
+    limit = max_tokens * _CHARS_PER_TOKEN
+    return text[-limit:] if keep_end else text[:limit]
+
+
+def count_message_tokens(messages: list[dict]) -> int:
+    """Count tokens across all chat message contents."""
+    return sum(count_tokens(message["content"]) for message in messages)
+
+
+@lru_cache(maxsize=8)
+def _template_tokens(has_company: bool, has_previous: bool) -> int:
+    """Tokens used by the fixed system prompt and user template for a prompt shape."""
+    return count_message_tokens(build_analysis_messages(
+        resume_text="",
+        job_description="",
+        retrieved_context="",
+        previous_output="-" if has_previous else None,
+        company_info={"process": "", "rounds": "", "questions": "", "tips": ""} if has_company else None
+    ))
+
+
+def _shave(sections: dict, names: tuple, overshoot: int, copies: dict = None) -> bool:
+    """
+    Cut overshoot tokens from the first non-empty section in names.
+    
+    Sections truncated separately can re-tokenize a little longer at
+    their edges, so the assembled prompt may still exceed the budget by a
+    few tokens; this removes the remainder. copies gives how many times a
+    section appears in the prompt.
+    
+    Returns:
+        False if every named section is already empty
+    """
+    for name in names:
+        size = count_tokens(sections[name])
+        if size:
+            cut = -(-overshoot // (copies or {}).get(name, 1))
+            sections[name] = truncate_tokens(sections[name], size - cut)
+            return True
+    return False
+
+
+# Rebuilds allowed to shave an overshoot off an assembled prompt
+_CAP_PASSES = 4
+
+
+def _trim_company_info(company_info: dict, max_tokens: int) -> Optional[dict]:
+    """Shrink scraped fields evenly to fit max_tokens (None if nothing fits)."""
+    if max_tokens <= 0:
+        return None
+    per_field = max_tokens // max(len(company_info), 1)
+    return {key: truncate_tokens(str(value), per_field) for key, value in company_info.items()}
+
+
+def build_budgeted_messages(
+    resume_text: str,
+    job_description: str,
+    retrieved_context: str,
+    previous_output: str = None,
+    company_info: dict = None,
+    model: str = None
+) -> tuple[list[dict], int]:
+    """
+    Build the analysis messages within the model's input-token budget.
+    
+    Args:
+        resume_text: Candidate's resume
+        job_description: Target job description (or follow-up question)
+        retrieved_context: Retrieved knowledge base text
+        previous_output: Optional previous AI output for continuation
+        company_info: Optional scraped company interview info
+        model: Model the prompt is sent to
+        
+    Returns:
+        The chat messages and their total token count
+    """
+    budget = input_token_budget(model)
+    # The continuation template repeats the question and ignores scraped info
+    jd_copies = 2 if previous_output else 1
+    if previous_output:
+        company_info = None
+    
+    available = budget - _template_tokens(bool(company_info), bool(previous_output))
+    sizes = {
+        "resume": count_tokens(resume_text),
+        "jd": count_tokens(job_description) * jd_copies,
+        "context": count_tokens(retrieved_context),
+        "company": sum(count_tokens(str(v)) for v in company_info.values()) if company_info else 0,
+        "previous": count_tokens(previous_output)
+    }
+    excess = sum(sizes.values()) - available
+    
+    if excess > 0 and sizes["context"]:
+        keep = max(sizes["context"] - excess, 0)
+        retrieved_context = truncate_tokens(retrieved_context, keep)
+        excess -= sizes["context"] - keep
+    
+    if excess > 0 and sizes["company"]:
+        keep = max(sizes["company"] - excess, 0)
+        company_info = _trim_company_info(company_info, keep)
+        excess -= sizes["company"] - keep
+    
+    if excess > 0 and sizes["previous"]:
+        # Older conversation goes first: keep the most recent output
+        keep = max(sizes["previous"] - excess, 0)
+        previous_output = truncate_tokens(previous_output, keep, keep_end=True) or "(earlier conversation omitted)"
+        excess -= sizes["previous"] - keep
+    
+    if excess > 0:
+        # Last resort: shrink resume and job description proportionally
+        core = sizes["resume"] + sizes["jd"]
+        if core:
+            resume_cut = -(-excess * sizes["resume"] // core)
+            # The job description's share is spread over its copies, so
+            # round the cut up per copy rather than the kept size down
+            jd_cut = -(-excess * sizes["jd"] // core)
+            resume_text = truncate_tokens(resume_text, sizes["resume"] - resume_cut)
+            job_description = truncate_tokens(job_description, sizes["jd"] // jd_copies - -(-jd_cut // jd_copies))
+    
+    sections = dict(
+        resume_text=resume_text,
+        job_description=job_description,
+        retrieved_context=retrieved_context,
+        previous_output=previous_output
+    )
+    messages = build_analysis_messages(**sections, company_info=company_info)
+    tokens = count_message_tokens(messages)
+    for _ in range(_CAP_PASSES):
+        if tokens <= budget or not _shave(
+            sections, ("retrieved_context", "resume_text", "job_description"),
+            tokens - budget, copies={"job_description": jd_copies}
+        ):
+            break
+        messages = build_analysis_messages(**sections, company_info=company_info)
+        tokens = count_message_tokens(messages)
+    return messages, tokens
+
+
+def build_budgeted_session_messages(session: dict, question: str, model: str = None) -> tuple[list[dict], int]:
+    """
+    Build follow-up messages for a session within the input-token budget.
+    
+    Trims retrieved context first, then the rolling summary, then the most
+    recent response and the question it answered, and only then the
+    resume, job description and new question.
+    
+    Args:
+        session: Session dict from the session store
+        question: The candidate's new question
+        model: Model the prompt is sent to
+        
+    Returns:
+        The chat messages and their total token count
+    """
+    sections = {
+        "retrieved_context": session["retrieved_context"] or "",
+        "summary": session["summary"] or "",
+        "last_output": session["last_output"] or "",
+        "last_question": session["last_question"] or "",
+        "resume_text": session["resume_text"],
+        "job_description": session["job_description"],
+        "question": question
+    }
+    # The previous question is quoted inside a fixed wrapper when present
+    shape = {name: "" for name in sections}
+    shape["last_question"] = "-" if sections["last_question"] else ""
+    template = count_message_tokens(build_session_messages(**shape))
+    budget = input_token_budget(model)
+    available = budget - template
+    sizes = {name: count_tokens(text) for name, text in sections.items()}
+    excess = sum(sizes.values()) - available
+    
+    for name in ("retrieved_context", "summary", "last_output", "last_question"):
+        if excess <= 0:
+            break
+        keep = max(sizes[name] - excess, 0)
+        sections[name] = truncate_tokens(sections[name], keep)
+        excess -= sizes[name] - keep
+    
+    if excess > 0:
+        core_names = ("resume_text", "job_description", "question")
+        core = sum(sizes[name] for name in core_names)
+        for name in core_names:
+            if core:
+                cut = -(-excess * sizes[name] // core)
+                sections[name] = truncate_tokens(sections[name], sizes[name] - cut)
+    
+    messages = build_session_messages(**sections)
+    tokens = count_message_tokens(messages)
+    for _ in range(_CAP_PASSES):
+        if tokens <= budget or not _shave(
+            sections, ("retrieved_context", "summary", "last_output", "resume_text", "job_description", "question"),
+            tokens - budget
+        ):
+            break
+        messages = build_session_messages(**sections)
+        tokens = count_message_tokens(messages)
+    return messages, tokens
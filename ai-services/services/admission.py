@@ -0,0 +1,173 @@
+"""
+Admission Control
+
+Bounds how many requests the worker runs at once. Requests beyond the
+limit wait in a short FIFO queue; when that is full (or the wait runs
+out) they are shed immediately with a retryable error instead of
+slowing every in-flight request down together.
+"""
+
+import asyncio
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from utils.errors import OverloadedError
+
+# Full analyses (scrape + retrieval + long generation)
+ANALYSIS_MAX_CONCURRENT = int(os.getenv("ANALYSIS_MAX_CONCURRENT", "32"))
+ANALYSIS_MAX_QUEUE = int(os.getenv("ANALYSIS_MAX_QUEUE", "16"))
+
+# Session follow-ups (small prompts, users actively waiting)
+FOLLOWUP_MAX_CONCURRENT = int(os.getenv("FOLLOWUP_MAX_CONCURRENT", "32"))
+FOLLOWUP_MAX_QUEUE = int(os.getenv("FOLLOWUP_MAX_QUEUE", "32"))
+
+# Longest a queued request waits for a slot, and the Retry-After sent
+# with a shed request (seconds)
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "2.0"))
+ADMISSION_RETRY_AFTER = float(os.getenv("ADMISSION_RETRY_AFTER", "2.0"))
+
+# Batch generations take analysis slots too, but only while this many
+# slots stay free for interactive requests and nothing is queued; they
+# re-check every BATCH_POLL_INTERVAL seconds instead of queueing
+BATCH_RESERVED_SLOTS = int(os.getenv("BATCH_RESERVED_SLOTS", "8"))
+BATCH_POLL_INTERVAL = float(os.getenv("BATCH_POLL_INTERVAL", "0.25"))
+
+
+class AdmissionController:
+    """
+    Concurrency limit with a bounded, time-limited wait queue.
+    
+    A released slot is handed directly to the oldest waiter, so queued
+    requests are admitted in arrival order and never overtaken.
+    """
+    
+    def __init__(self, name: str, max_concurrent: int, max_queue: int,
+                 queue_timeout: float = ADMISSION_QUEUE_TIMEOUT, retry_after: float = ADMISSION_RETRY_AFTER):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self._active = 0
+        self._background = 0
+        self._waiting = 0
+        self._waiters = deque()
+        self._admitted = 0
+        self._rejected = 0
+        self._timed_out = 0
+        self._total_wait = 0.0
+    
+    async def acquire(self):
+        """
+        Take a slot, waiting briefly in the queue if all slots are busy.
+        
+        Raises:
+            OverloadedError: If the queue is full or the wait timed out
+        """
+        if self._active < self.max_concurrent and not self._waiting:
+            self._active += 1
+            self._admitted += 1
+            return
+        if self._waiting >= self.max_queue:
+            self._rejected += 1
+            raise OverloadedError(f"{self.name} queue is full", retry_after=self.retry_after)
+        
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        self._waiting += 1
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(future, self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._timed_out += 1
+            raise OverloadedError(f"{self.name} queue wait timed out", retry_after=self.retry_after)
+        except asyncio.CancelledError:
+            # The slot was handed over just as the caller went away
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+        finally:
+            self._waiting -= 1
+        self._total_wait += time.monotonic() - started
+        self._admitted += 1
+    
+    def release(self):
+        """Return a slot, handing it to the oldest live waiter if any."""
+        while self._waiters:
+            future = self._waiters.popleft()
+            if not future.done():
+                future.set_result(None)
+                return
+        self._active -= 1
+    
+    @asynccontextmanager
+    async def slot(self):
+        """Hold a slot for the duration of the block."""
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+    
+    @asynccontextmanager
+    async def background_slot(self, reserved: int = BATCH_RESERVED_SLOTS, poll_interval: float = BATCH_POLL_INTERVAL):
+        """
+        Hold a slot for background work (batch generations).
+        
+        Never sheds and never joins the queue: waits until a slot is free
+        with reserved slots to spare and no request waiting, so batch work
+        is counted in utilisation but always yields to interactive traffic.
+        """
+        limit = max(self.max_concurrent - reserved, 1)
+        while self._active >= limit or self._waiting:
+            await asyncio.sleep(poll_interval)
+        self._active += 1
+        self._background += 1
+        self._admitted += 1
+        try:
+            yield
+        finally:
+            self._background -= 1
+            self.release()
+    
+    def stats(self) -> dict:
+        """Current occupancy and admission counters since startup."""
+        return {
+            "active": self._active,
+            "background": self._background,
+            "max_concurrent": self.max_concurrent,
+            "waiting": self._waiting,
+            "max_queue": self.max_queue,
+            "utilisation": round(self._active / self.max_concurrent, 3) if self.max_concurrent else 1.0,
+            "admitted": self._admitted,
+            "rejected": self._rejected,
+            "timed_out": self._timed_out,
+            "avg_queue_wait_ms": round(self._total_wait / (self._admitted or 1) * 1000, 1)
+        }
+
+
+_controllers = {}
+
+def get_admission(kind: str) -> AdmissionController:
+    """Return the controller for "analysis" or "followup" requests."""
+    controller = _controllers.get(kind)
+    if controller is None:
+        if kind == "followup":
+            controller = AdmissionController(kind, FOLLOWUP_MAX_CONCURRENT, FOLLOWUP_MAX_QUEUE)
+        else:
+            controller = AdmissionController(kind, ANALYSIS_MAX_CONCURRENT, ANALYSIS_MAX_QUEUE)
+        _controllers[kind] = controller
+    return controller
+
+
+def admission_stats() -> dict:
+    """Per-class stats plus overall utilisation for load balancers."""
+    analysis = get_admission("analysis").stats()
+    followup = get_admission("followup").stats()
+    return {
+        "utilisation": max(analysis["utilisation"], followup["utilisation"]),
+        "saturated": bool(analysis["waiting"] or followup["waiting"]),
+        "analysis": analysis,
+        "followup": followup
+    }
@@ -0,0 +1,246 @@
+"""
+Embedding Backends
+
+Interchangeable encoders behind the embedding service. The default
+backend runs the Sentence-Transformers model on PyTorch; the ONNX
+backend runs the same model exported to ONNX with int8 weights, which
+needs neither torch nor transformers at runtime and is several times
+smaller and faster on CPU-only nodes.
+
+Export the ONNX model once from the ai-services directory:
+
+    python export_onnx.py --output ./onnx_models/all-MiniLM-L6-v2-int8
+"""
+
+import abc
+import json
+import os
+import numpy as np
+
+# ONNX Runtime intra-op threads per worker (0 = one per core)
+EMBED_ONNX_THREADS = int(os.getenv("EMBED_ONNX_THREADS", "0"))
+
+# Minimum cosine similarity between torch and ONNX vectors for an export
+# to be accepted
+EMBED_ONNX_TOLERANCE = float(os.getenv("EMBED_ONNX_TOLERANCE", "0.99"))
+
+_CONFIG_FILE = "embedding_config.json"
+_TOKENIZER_FILE = "tokenizer.json"
+_MODEL_FILE = "model_int8.onnx"
+
+
+class EmbeddingBackend(abc.ABC):
+    """
+    Encoder interface used by the embedding service.
+    
+    encode() returns a float32 array with one L2-normalized row per
+    text. name identifies the vectors a backend produces in logs and
+    benchmark reports. The embedding cache keys on EMBEDDING_KEY instead,
+    which is derived from the same settings without loading the model.
+    """
+    
+    name = "base"
+    
+    @abc.abstractmethod
+    def encode(self, texts: list[str], batch_size: int = None) -> np.ndarray:
+        """
+        Encode texts into embedding vectors.
+        
+        Args:
+            texts: Texts to encode
+            batch_size: Texts per forward pass (backend default if None)
+            
+        Returns:
+            float32 array of shape (len(texts), dim), rows L2-normalized
+        """
+
+
+class TorchBackend(EmbeddingBackend):
+    """Sentence-Transformers model on PyTorch."""
+    
+    def __init__(self, model_name: str):
+        # Imported here: torch and transformers take seconds to import
+        from sentence_transformers import SentenceTransformer
+        self.name = model_name
+        self.model = SentenceTransformer(model_name)
+    
+    def encode(self, texts: list[str], batch_size: int = None) -> np.ndarray:
+        vectors = self.model.encode(texts, batch_size=batch_size or 32, convert_to_numpy=True)
+        return vectors.astype(np.float32)
+
+
+class OnnxBackend(EmbeddingBackend):
+    """
+    int8-quantized transformer on ONNX Runtime.
+    
+    Tokenization uses the exported fast tokenizer; mean pooling and
+    normalization mirror the Sentence-Transformers pipeline. Texts are
+    sorted by length before batching so each batch pads to similar
+    lengths.
+    """
+    
+    def __init__(self, path: str, model_name: str, threads: int = EMBED_ONNX_THREADS):
+        import onnxruntime
+        from tokenizers import Tokenizer
+        
+        config_path = os.path.join(path, _CONFIG_FILE)
+        if not os.path.exists(config_path):
+            raise FileNotFoundError(
+                f"No exported ONNX model at {path}; run export_onnx.py --output {path}"
+            )
+        with open(config_path) as f:
+            config = json.load(f)
+        if config["model_name"] != model_name:
+            raise ValueError(f"ONNX model at {path} was exported from {config['model_name']}, not {model_name}")
+        
+        self.name = f"{model_name}:onnx-int8"
+        self.normalize = config["normalize"]
+        self.tokenizer = Tokenizer.from_file(os.path.join(path, _TOKENIZER_FILE))
+        self.tokenizer.enable_truncation(config["max_seq_length"])
+        self.tokenizer.enable_padding(pad_id=config["pad_id"], pad_token=config["pad_token"])
+        
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = threads
+        # Free activations after each batch instead of keeping the largest
+        # batch's peak for the life of the worker, and don't busy-wait
+        # between ops: both matter with several workers per node
+        options.enable_cpu_mem_arena = False
+        options.add_session_config_entry("session.intra_op.allow_spinning", "0")
+        self.session = onnxruntime.InferenceSession(
+            os.path.join(path, _MODEL_FILE), options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+    
+    def encode(self, texts: list[str], batch_size: int = None) -> np.ndarray:
+        batch_size = batch_size or 32
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        vectors = [None] * len(texts)
+        for start in range(0, len(order), batch_size):
+            indices = order[start:start + batch_size]
+            for index, vector in zip(indices, self._encode_batch([texts[i] for i in indices])):
+                vectors[index] = vector
+        return np.stack(vectors) if vectors else np.zeros((0, 0), dtype=np.float32)
+    
+    def _encode_batch(self, texts: list[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": mask,
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64)
+        }
+        hidden = self.session.run(None, {k: v for k, v in feeds.items() if k in self.input_names})[0]
+        
+        weights = mask[:, :, None].astype(np.float32)
+        pooled = (hidden * weights).sum(axis=1) / np.clip(weights.sum(axis=1), 1e-9, None)
+        if self.normalize:
+            pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return pooled.astype(np.float32)
+
+
+def load_backend(backend: str, model_name: str, onnx_path: str = None) -> EmbeddingBackend:
+    """
+    Create the configured backend.
+    
+    Args:
+        backend: "torch" or "onnx"
+        model_name: Sentence-Transformers model name or path
+        onnx_path: Directory written by export_onnx (onnx backend only)
+        
+    Returns:
+        Loaded backend
+        
+    Raises:
+        ValueError: If the backend name is unknown
+    """
+    if backend == "torch":
+        return TorchBackend(model_name)
+    if backend == "onnx":
+        return OnnxBackend(onnx_path, model_name)
+    raise ValueError(f"Unknown embedding backend: {backend!r} (expected 'torch' or 'onnx')")
+
+
+def compare_backends(reference: EmbeddingBackend, candidate: EmbeddingBackend, texts: list[str]) -> dict:
+    """
+    Cosine agreement between two backends' vectors for the same texts.
+    
+    Returns:
+        Dict with min and mean cosine similarity and max absolute difference
+    """
+    expected = reference.encode(texts)
+    actual = candidate.encode(texts)
+    cosine = (expected * actual).sum(axis=1) / (
+        np.linalg.norm(expected, axis=1) * np.linalg.norm(actual, axis=1)
+    )
+    return {
+        "texts": len(texts),
+        "min_cosine": round(float(cosine.min()), 5),
+        "mean_cosine": round(float(cosine.mean()), 5),
+        "max_abs_diff": round(float(np.abs(expected - actual).max()), 5)
+    }
+
+
+def export_onnx(model_name: str, output: str) -> str:
+    """
+    Export a Sentence-Transformers model for the ONNX backend.
+    
+    Writes the transformer graph with int8 dynamically quantized
+    weights, the fast tokenizer and a pooling config. Requires torch,
+    sentence-transformers and onnx.
+    
+    Returns:
+        Path of the written model file
+        
+    Raises:
+        ValueError: If the model does not use mean pooling
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+    from sentence_transformers.models import Normalize, Pooling
+    
+    model = SentenceTransformer(model_name, device="cpu")
+    pooling = [module for module in model if isinstance(module, Pooling)]
+    if len(pooling) != 1 or pooling[0].get_pooling_mode_str() != "mean":
+        raise ValueError(f"{model_name} does not use mean pooling; only mean pooling is supported")
+    
+    transformer = model[0].auto_model.eval()
+    tokenizer = model.tokenizer
+    os.makedirs(output, exist_ok=True)
+    
+    sample = tokenizer(["export sample"], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    fp32_path = os.path.join(output, "model_fp32.onnx")
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+    
+    class _Encoder(torch.nn.Module):
+        def __init__(self, inner):
+            super().__init__()
+            self.inner = inner
+        
+        def forward(self, *inputs):
+            return self.inner(**dict(zip(input_names, inputs))).last_hidden_state
+    
+    with torch.no_grad():
+        torch.onnx.export(
+            _Encoder(transformer), tuple(sample[name] for name in input_names), fp32_path,
+            input_names=input_names, output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes, opset_version=17, dynamo=False
+        )
+    
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    model_path = os.path.join(output, _MODEL_FILE)
+    quantize_dynamic(fp32_path, model_path, weight_type=QuantType.QInt8)
+    os.remove(fp32_path)
+    
+    tokenizer.backend_tokenizer.save(os.path.join(output, _TOKENIZER_FILE))
+    with open(os.path.join(output, _CONFIG_FILE), "w") as f:
+        json.dump({
+            "model_name": model_name,
+            "max_seq_length": model.max_seq_length,
+            "pad_id": tokenizer.pad_token_id,
+            "pad_token": tokenizer.pad_token,
+            "normalize": any(isinstance(module, Normalize) for module in model)
+        }, f, indent=2)
+    return model_path
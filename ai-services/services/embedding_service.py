@@ -1,22 +1,225 @@
 """
 Embedding Service
 
-Generates text embeddings using Sentence-Transformers.
+Generates text embeddings using Sentence-Transformers (PyTorch, or an
+int8 ONNX export of the same model on CPU-only nodes).
 Local, free, no API keys required.
 """
 
-from sentence_transformers import SentenceTransformer
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+import numpy as np
+from services.embedding_backends import load_backend
 
-# Load model once (singleton pattern)
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+
+# "torch" (Sentence-Transformers) or "onnx" (int8 export, see export_onnx.py)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+EMBEDDING_ONNX_PATH = os.getenv("EMBEDDING_ONNX_PATH", "./onnx_models/all-MiniLM-L6-v2-int8")
+
+# Cache namespace: int8 vectors are close to, not identical to, torch ones
+EMBEDDING_KEY = EMBEDDING_MODEL if EMBEDDING_BACKEND == "torch" else f"{EMBEDDING_MODEL}:{EMBEDDING_BACKEND}"
+
+# Micro-batching window: concurrent requests arriving within this many
+# milliseconds (or until the batch is full) share one forward pass
+EMBED_MAX_BATCH_SIZE = int(os.getenv("EMBED_MAX_BATCH_SIZE", "32"))
+EMBED_BATCH_WINDOW_MS = float(os.getenv("EMBED_BATCH_WINDOW_MS", "5"))
+
+# Texts per encoder forward pass when many are embedded at once; bounds
+# activation memory for large batches of misses
+EMBED_ENCODE_BATCH_SIZE = int(os.getenv("EMBED_ENCODE_BATCH_SIZE", "64"))
+
+# Embedding cache: in-memory LRU in front of a SQLite file that survives
+# restarts. Set EMBED_CACHE_PATH to an empty string to keep memory only.
+EMBED_CACHE_MAX_ENTRIES = int(os.getenv("EMBED_CACHE_MAX_ENTRIES", "10000"))
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", "./embedding_cache.sqlite3")
+EMBED_CACHE_DISK_MAX_ENTRIES = int(os.getenv("EMBED_CACHE_DISK_MAX_ENTRIES", "500000"))
+
+# Load model once (singleton pattern). The lock keeps concurrent first
+# callers (warm-up, the batcher, ingest threads) from loading it twice.
 _model = None
+_model_lock = threading.Lock()
 
 def _get_model():
     global _model
     if _model is None:
-        _model = SentenceTransformer('all-MiniLM-L6-v2')
+        with _model_lock:
+            if _model is None:
+                _model = load_backend(EMBEDDING_BACKEND, EMBEDDING_MODEL, EMBEDDING_ONNX_PATH)
     return _model
 
 
+def warm_up():
+    """Load the model and run one dummy encode so the first request pays for neither."""
+    _get_model().encode(["warm up"])
+
+
+class EmbeddingCache:
+    """
+    Content-addressed embedding cache.
+    
+    Keys are a SHA-256 of the model name and whitespace-normalized text,
+    so the same job description is embedded once no matter how many
+    candidates apply to it. Hot entries live in an in-memory LRU; every
+    entry is also written as a float32 BLOB to SQLite so the cache
+    survives restarts and is shared by workers on the same node.
+    """
+    
+    def __init__(self, max_entries: int = EMBED_CACHE_MAX_ENTRIES, path: str = EMBED_CACHE_PATH,
+                 disk_max_entries: int = EMBED_CACHE_DISK_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.disk_max_entries = disk_max_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._db = None
+        self._writes_since_prune = 0
+        self._hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+        self._evictions = 0
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False, timeout=10.0)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "key TEXT PRIMARY KEY, vector BLOB NOT NULL, created REAL NOT NULL)"
+            )
+            # _prune_disk deletes oldest-first; without this it sorts the
+            # whole table while holding the lock every lookup needs
+            self._db.execute("CREATE INDEX IF NOT EXISTS embeddings_created ON embeddings (created)")
+            self._db.commit()
+    
+    @staticmethod
+    def key(text: str, model_name: str = EMBEDDING_KEY) -> str:
+        """Cache key for text embedded with model_name."""
+        normalized = " ".join(text.split())
+        return hashlib.sha256(f"{model_name}\0{normalized}".encode("utf-8")).hexdigest()
+    
+    def get_memory(self, key: str) -> Optional[list]:
+        """Look up the in-memory tier only (cheap enough for the event loop)."""
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                self._hits += 1
+            return vector
+    
+    def get_many(self, keys: list[str]) -> dict:
+        """
+        Look up keys in memory, then on disk.
+        
+        Args:
+            keys: Cache keys
+            
+        Returns:
+            Mapping of found keys to embedding vectors
+        """
+        found = {}
+        missing = []
+        with self._lock:
+            for key in keys:
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    self._hits += 1
+                    found[key] = vector
+                else:
+                    missing.append(key)
+        
+        rows = []
+        if missing and self._db is not None:
+            placeholders = ",".join("?" * len(missing))
+            with self._db_lock:
+                rows = self._db.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", missing
+                ).fetchall()
+        
+        with self._lock:
+            for key, blob in rows:
+                vector = np.frombuffer(blob, dtype=np.float32).tolist()
+                found[key] = vector
+                self._put_memory(key, vector)
+            self._disk_hits += len(rows)
+            self._misses += len(missing) - len(rows)
+        return found
+    
+    def put_many(self, items: dict):
+        """
+        Store embeddings in both tiers.
+        
+        Args:
+            items: Mapping of cache keys to embedding vectors
+        """
+        with self._lock:
+            for key, vector in items.items():
+                self._put_memory(key, vector)
+        
+        if self._db is not None and items:
+            now = time.time()
+            rows = [(key, np.asarray(vector, dtype=np.float32).tobytes(), now) for key, vector in items.items()]
+            with self._db_lock:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, vector, created) VALUES (?, ?, ?)", rows
+                )
+                self._db.commit()
+                self._writes_since_prune += len(items)
+                if self._writes_since_prune >= 1000:
+                    self._prune_disk()
+    
+    def _put_memory(self, key: str, vector: list):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._evictions += 1
+    
+    def _prune_disk(self):
+        """Drop the oldest disk entries beyond disk_max_entries."""
+        self._writes_since_prune = 0
+        (count,) = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        excess = count - self.disk_max_entries
+        if excess > 0:
+            self._db.execute(
+                "DELETE FROM embeddings WHERE key IN "
+                "(SELECT key FROM embeddings ORDER BY created ASC LIMIT ?)", (excess,)
+            )
+            self._db.commit()
+    
+    def stats(self) -> dict:
+        """Hit/miss/eviction counters since startup."""
+        with self._lock:
+            lookups = self._hits + self._disk_hits + self._misses
+            return {
+                "memory_entries": len(self._memory),
+                "memory_hits": self._hits,
+                "disk_hits": self._disk_hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "hit_rate": round((self._hits + self._disk_hits) / lookups, 4) if lookups else 0.0
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_cache() -> EmbeddingCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = EmbeddingCache()
+    return _cache
+
+
 def generate_embedding(text: str) -> list:
     """
     Generate embedding for text using Sentence-Transformers.
@@ -27,6 +230,180 @@ def generate_embedding(text: str) -> list:
     Returns:
         Embedding vector as list
     """
-    model = _get_model()
-    embedding = model.encode(text, convert_to_numpy=True)
-    return embedding.tolist()
+    return generate_embeddings([text])[0]
+
+
+def generate_embeddings(texts: list[str], batch_size: int = EMBED_ENCODE_BATCH_SIZE,
+                        use_cache: bool = True) -> list[list]:
+    """
+    Generate embeddings for several texts in one batched forward pass.
+    
+    Cached texts are served from the embedding cache; only the misses
+    are encoded.
+    
+    Args:
+        texts: Texts to embed
+        batch_size: Texts per encoder forward pass
+        use_cache: Read and fill the embedding cache. Bulk callers such as
+            ingestion pass False so one-off document chunks don't evict
+            the hot query embeddings.
+            
+    Returns:
+        Embedding vectors as lists, in input order
+    """
+    if not texts:
+        return []
+    if not use_cache:
+        return [vector.astype(np.float32).tolist() for vector in _get_model().encode(texts, batch_size=batch_size)]
+    cache = get_cache()
+    keys = [EmbeddingCache.key(text) for text in texts]
+    found = cache.get_many(list(dict.fromkeys(keys)))
+    
+    pending = {}
+    for key, text in zip(keys, texts):
+        if key not in found and key not in pending:
+            pending[key] = text
+    
+    if pending:
+        model = _get_model()
+        encoded = model.encode(list(pending.values()), batch_size=batch_size)
+        fresh = {key: vector.astype(np.float32).tolist() for key, vector in zip(pending, encoded)}
+        cache.put_many(fresh)
+        found.update(fresh)
+    
+    return [found[key] for key in keys]
+
+
+class EmbeddingBatcher:
+    """
+    Coalesces concurrent embedding requests into batched encode calls.
+    
+    Callers await embed(); a background task collects requests for up to
+    max_wait_ms (or until max_batch_size is reached), runs one batched
+    encode in a worker thread so the event loop stays free, and resolves
+    each caller's future.
+    """
+    
+    def __init__(self, max_batch_size: int = EMBED_MAX_BATCH_SIZE, max_wait_ms: float = EMBED_BATCH_WINDOW_MS):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedding")
+        self._loop = None
+        self._queue = None
+        self._worker = None
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+        self._max_batch = 0
+        self._total_wait = 0.0
+        self._max_wait_seen = 0.0
+        self._total_encode = 0.0
+    
+    async def embed(self, text: str) -> list:
+        """
+        Embed one text as part of the next batch.
+        
+        Args:
+            text: Text to embed
+            
+        Returns:
+            Embedding vector as list
+        """
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+        
+        future = loop.create_future()
+        self._queue.put_nowait((text, future, time.perf_counter()))
+        return await future
+    
+    async def _run(self):
+        queue = self._queue
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            
+            # Drop callers that gave up while waiting
+            batch = [item for item in batch if not item[1].cancelled()]
+            if not batch:
+                continue
+            
+            started = time.perf_counter()
+            texts = [text for text, _, _ in batch]
+            try:
+                embeddings = await loop.run_in_executor(self._executor, generate_embeddings, texts)
+            except Exception as e:
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            
+            self._record(batch, started, time.perf_counter())
+            for (_, future, _), embedding in zip(batch, embeddings):
+                if not future.done():
+                    future.set_result(embedding)
+    
+    def _record(self, batch: list, started: float, finished: float):
+        waits = [started - enqueued for _, _, enqueued in batch]
+        with self._stats_lock:
+            self._batches += 1
+            self._items += len(batch)
+            self._max_batch = max(self._max_batch, len(batch))
+            self._total_wait += sum(waits)
+            self._max_wait_seen = max(self._max_wait_seen, max(waits))
+            self._total_encode += finished - started
+    
+    def stats(self) -> dict:
+        """Batch-size and queue-wait statistics since startup."""
+        with self._stats_lock:
+            batches = self._batches or 1
+            items = self._items or 1
+            return {
+                "batches": self._batches,
+                "items": self._items,
+                "avg_batch_size": round(self._items / batches, 2),
+                "max_batch_size": self._max_batch,
+                "avg_queue_wait_ms": round(self._total_wait / items * 1000, 3),
+                "max_queue_wait_ms": round(self._max_wait_seen * 1000, 3),
+                "avg_encode_ms": round(self._total_encode / batches * 1000, 3),
+                "queue_depth": self._queue.qsize() if self._queue is not None else 0
+            }
+
+
+_batcher = None
+
+def get_batcher() -> EmbeddingBatcher:
+    global _batcher
+    if _batcher is None:
+        _batcher = EmbeddingBatcher()
+    return _batcher
+
+
+async def agenerate_embedding(text: str) -> list:
+    """
+    Generate embedding without blocking the event loop.
+    
+    Memory-cached texts return immediately; other concurrent calls are
+    micro-batched into a single encode.
+    
+    Args:
+        text: Text to embed
+        
+    Returns:
+        Embedding vector as list
+    """
+    cached = get_cache().get_memory(EmbeddingCache.key(text))
+    if cached is not None:
+        return cached
+    return await get_batcher().embed(text)
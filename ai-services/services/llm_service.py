@@ -6,50 +6,451 @@ Contains NO intelligence, NO decision logic, NO scoring.
 Pure orchestration only.
 """
 
-from clients.groq_client import generate
-from services.rag_service import retrieve_context
+import asyncio
+import contextlib
+import os
+import time
+from typing import AsyncIterator
+from clients.groq_client import agenerate, astream, DEFAULT_MODEL
+from clients.rate_limiter import PRIORITY_BATCH, PRIORITY_INTERACTIVE
+from models.request_models import QueryResponse
+from services.admission import AdmissionController
+from services.response_cache import get_response_cache, response_key
+from services.session_service import get_session_store
+from services.rag_service import aretrieve_contexts, aretrieve_query_context
 from services.scraper_service import scrape_company_info, extract_company_name
-from prompts.system_prompt import build_analysis_prompt
+from prompts.system_prompt import PROMPT_VERSION, build_summary_messages
+from prompts.token_budget import build_budgeted_messages, build_budgeted_session_messages, truncate_tokens
+from utils.errors import SessionNotFoundError
+from utils.metrics import STAGE_LATENCY, STAGE_SKIPS, observe_stage
 
+# Latency budget (seconds) for the stages that run before generation.
+# Scrape and retrieval run concurrently; each gets its own deadline capped
+# by the budget, and a stage that overruns is skipped instead of holding
+# the request.
+PIPELINE_BUDGET = float(os.getenv("PIPELINE_BUDGET", "5.0"))
+SCRAPE_TIMEOUT = float(os.getenv("SCRAPE_TIMEOUT", "4.0"))
+RETRIEVAL_TIMEOUT = float(os.getenv("RETRIEVAL_TIMEOUT", "2.0"))
 
-async def process_query(
+# Batch analysis: resumes per request, concurrent LLM calls per batch, and
+# the deadline for embedding and retrieving context for the whole batch
+BATCH_MAX_RESUMES = int(os.getenv("BATCH_MAX_RESUMES", "500"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+BATCH_RETRIEVAL_TIMEOUT = float(os.getenv("BATCH_RETRIEVAL_TIMEOUT", "30.0"))
+
+# Upper bound on the rolling conversation summary kept per session
+SESSION_SUMMARY_MAX_TOKENS = int(os.getenv("SESSION_SUMMARY_MAX_TOKENS", "400"))
+
+
+async def _run_stage(name: str, coro, timeout: float, default, skipped: list):
+    """
+    Await a pipeline stage with a deadline.
+    
+    Args:
+        name: Stage name reported when skipped
+        coro: Stage coroutine
+        timeout: Deadline in seconds
+        default: Value used when the stage overruns
+        skipped: List collecting skipped stage names
+        
+    Returns:
+        Stage result, or default if the deadline passed
+    """
+    try:
+        with observe_stage(name):
+            return await asyncio.wait_for(coro, timeout)
+    except asyncio.TimeoutError:
+        print(f"Stage '{name}' exceeded {timeout:.1f}s deadline, skipping")
+        STAGE_SKIPS.labels(name).inc()
+        skipped.append(name)
+        return default
+
+
+async def _prepare_prompt(
     resume_text: str,
     job_description: str,
     previous_output: str = None
-) -> str:
+) -> dict:
+    """
+    Run the pre-generation stages: (scrape ‖ retrieve) → build prompt.
+    
+    The prompt is fitted to the model's input-token budget.
+    
+    Args:
+        resume_text: Candidate's resume
+        job_description: Target job description
+        previous_output: Optional previous AI output for continuation
+        
+    Returns:
+        Dict with the chat 'messages', 'skipped' stage names,
+        'prompt_tokens' and the 'retrieved_context'
+    """
+    skipped = []
+    stages = []
+    
+    company_name = None
+    if not previous_output:
+        company_name = extract_company_name(job_description)
+    if company_name:
+        print(f"Scraping interview info for: {company_name}")
+        stages.append(_run_stage(
+            "company_insights", scrape_company_info(company_name),
+            min(SCRAPE_TIMEOUT, PIPELINE_BUDGET), None, skipped
+        ))
+    
+    stages.append(_run_stage(
+        "retrieval", aretrieve_query_context(resume_text, job_description),
+        min(RETRIEVAL_TIMEOUT, PIPELINE_BUDGET), "", skipped
+    ))
+    
+    results = await asyncio.gather(*stages)
+    company_info = results[0] if company_name else None
+    retrieved_context = results[-1]
+    
+    with observe_stage("prompt_build"):
+        messages, prompt_tokens = build_budgeted_messages(
+            resume_text=resume_text,
+            job_description=job_description,
+            retrieved_context=retrieved_context,
+            previous_output=previous_output,
+            company_info=company_info,
+            model=DEFAULT_MODEL
+        )
+    print(f"Prompt size: {prompt_tokens} tokens")
+    return {
+        "messages": messages,
+        "skipped": skipped,
+        "prompt_tokens": prompt_tokens,
+        "retrieved_context": retrieved_context
+    }
+
+
+async def process_query(
+    resume_text: str,
+    job_description: str,
+    previous_output: str = None,
+    session_id: str = None
+) -> QueryResponse:
     """
     Process interview preparation query with RAG-enhanced context.
     
     This function is stateless and contains NO logic.
-    It chains: retrieve → scrape → build prompt → generate.
+    It chains: (scrape ‖ retrieve) → build prompt → generate.
+    Identical queries are answered from the response cache, and
+    identical queries already in flight share one generation.
+    
+    With a session_id, job_description is treated as the follow-up
+    question and the stored session provides the rest of the context.
+    A new analysis starts a session whose id is returned.
     
     Args:
         resume_text: Candidate's resume
-        job_description: Target job description
+        job_description: Target job description (or follow-up question)
         previous_output: Optional previous AI output for continuation
+        session_id: Optional server-side session for follow-ups
         
     Returns:
-        AI-generated analysis as string
+        AI-generated analysis and the names of any skipped stages
+        
+    Raises:
+        SessionNotFoundError: If session_id is unknown or expired
+    """
+    if session_id:
+        session = await get_session_store().get(session_id)
+        if session is None:
+            raise SessionNotFoundError(f"Unknown or expired session: {session_id}")
+        return await _run_session_turn(session, job_description)
+    
+    key = response_key(resume_text, job_description, previous_output, DEFAULT_MODEL, PROMPT_VERSION)
+    
+    response, retrieved_context = await get_response_cache().get_or_compute(
+        key,
+        lambda: _run_query(resume_text, job_description, previous_output),
+        # Degraded answers are shared with concurrent duplicates but not kept
+        cacheable=lambda result: not result[0].skipped_stages
+    )
+    
+    if previous_output:
+        return response
+    
+    # Sessions are per caller, never shared through the response cache
+    session = await get_session_store().create(
+        resume_text, job_description, retrieved_context, response.ai_output
+    )
+    return response.model_copy(update={"session_id": session["id"]})
+
+
+async def _run_query(
+    resume_text: str,
+    job_description: str,
+    previous_output: str = None
+) -> tuple[QueryResponse, str]:
+    """Uncached pipeline behind process_query; also returns the retrieved context."""
+    prepared = await _prepare_prompt(resume_text, job_description, previous_output)
+    
+    with observe_stage("generation"):
+        ai_output = await agenerate(prepared["messages"])
+    
+    response = QueryResponse(
+        ai_output=ai_output,
+        skipped_stages=prepared["skipped"],
+        prompt_tokens=prepared["prompt_tokens"]
+    )
+    return response, prepared["retrieved_context"]
+
+
+async def _fold_summary(session: dict) -> str:
     """
+    Fold the session's most recent turn into its rolling summary.
+    
+    Falls back to keeping the tail of the plain text if the LLM call fails.
+    """
+    if not session["last_output"]:
+        return session["summary"]
+    messages = build_summary_messages(session["summary"], session["last_question"], session["last_output"])
+    try:
+        with observe_stage("summary"):
+            summary = await agenerate(messages, max_tokens=SESSION_SUMMARY_MAX_TOKENS, priority=PRIORITY_INTERACTIVE)
+    except Exception as e:
+        print(f"Summary update failed, truncating instead: {e}")
+        summary = f"{session['summary']}\n{session['last_question'] or 'Initial analysis'}: {session['last_output']}"
+    return truncate_tokens(summary.strip(), SESSION_SUMMARY_MAX_TOKENS, keep_end=True)
+
+
+async def _run_session_turn(session: dict, question: str) -> QueryResponse:
+    """
+    Answer a follow-up question inside a session.
+    
+    The previous turn is folded into the rolling summary concurrently with
+    generation, so summarizing adds no latency to the answer.
+    """
+    store = get_session_store()
+    async with store.lock(session["id"]):
+        session = await store.get(session["id"], fresh=True) or session
+        with observe_stage("prompt_build"):
+            messages, prompt_tokens = build_budgeted_session_messages(session, question, DEFAULT_MODEL)
+        print(f"Session {session['id']} turn {session['turns'] + 1}, prompt size: {prompt_tokens} tokens")
+        
+        fold = asyncio.ensure_future(_fold_summary(session))
+        try:
+            with observe_stage("generation"):
+                ai_output = await agenerate(messages, priority=PRIORITY_INTERACTIVE)
+        except Exception:
+            fold.cancel()
+            raise
+        
+        session.update(
+            summary=await fold,
+            last_question=question,
+            last_output=ai_output,
+            turns=session["turns"] + 1
+        )
+        await store.save(session)
+    
+    return QueryResponse(ai_output=ai_output, prompt_tokens=prompt_tokens, session_id=session["id"])
+
+
+async def stream_query(
+    resume_text: str,
+    job_description: str,
+    previous_output: str = None,
+    session_id: str = None
+) -> AsyncIterator[tuple[str, object]]:
+    """
+    Streaming variant of process_query.
+    
+    Runs the same pre-generation stages, then yields the generated text
+    as the provider produces it. A cached response is replayed as a
+    single token; a completed, non-degraded stream is added to the cache.
+    
+    Args:
+        resume_text: Candidate's resume
+        job_description: Target job description (or follow-up question)
+        previous_output: Optional previous AI output for continuation
+        session_id: Optional server-side session for follow-ups
+        
+    Yields:
+        ("stages", {"skipped_stages": [...], "prompt_tokens": n}) once,
+        then ("token", text) deltas, then ("session", {"session_id": id})
+        unless this was a stateless continuation
+    """
+    store = get_session_store()
+    if session_id:
+        session = await store.get(session_id)
+        if session is None:
+            raise SessionNotFoundError(f"Unknown or expired session: {session_id}")
+        async for event in _stream_session_turn(session, job_description):
+            yield event
+        return
+    
+    cache = get_response_cache()
+    key = response_key(resume_text, job_description, previous_output, DEFAULT_MODEL, PROMPT_VERSION)
+    cached = cache.get(key)
+    if cached is not None:
+        response, retrieved_context = cached
+        yield "stages", {"skipped_stages": response.skipped_stages, "prompt_tokens": response.prompt_tokens}
+        yield "token", response.ai_output
+        ai_output = response.ai_output
+    else:
+        prepared = await _prepare_prompt(resume_text, job_description, previous_output)
+        retrieved_context = prepared["retrieved_context"]
+        yield "stages", {"skipped_stages": prepared["skipped"], "prompt_tokens": prepared["prompt_tokens"]}
+        
+        parts = []
+        started = time.perf_counter()
+        async for token in astream(prepared["messages"]):
+            if not parts:
+                STAGE_LATENCY.labels("first_token").observe(time.perf_counter() - started)
+            parts.append(token)
+            yield "token", token
+        STAGE_LATENCY.labels("generation").observe(time.perf_counter() - started)
+        ai_output = "".join(parts)
+        
+        if not prepared["skipped"]:
+            response = QueryResponse(
+                ai_output=ai_output,
+                skipped_stages=prepared["skipped"],
+                prompt_tokens=prepared["prompt_tokens"]
+            )
+            cache.put(key, (response, retrieved_context))
     
-    company_info = None
     if not previous_output:
+        session = await store.create(resume_text, job_description, retrieved_context, ai_output)
+        yield "session", {"session_id": session["id"]}
+
+
+async def _stream_session_turn(session: dict, question: str) -> AsyncIterator[tuple[str, object]]:
+    """Streaming variant of _run_session_turn."""
+    store = get_session_store()
+    async with store.lock(session["id"]):
+        session = await store.get(session["id"], fresh=True) or session
+        with observe_stage("prompt_build"):
+            messages, prompt_tokens = build_budgeted_session_messages(session, question, DEFAULT_MODEL)
+        yield "stages", {"skipped_stages": [], "prompt_tokens": prompt_tokens}
+        
+        fold = asyncio.ensure_future(_fold_summary(session))
+        parts = []
+        started = time.perf_counter()
+        try:
+            async for token in astream(messages, priority=PRIORITY_INTERACTIVE):
+                if not parts:
+                    STAGE_LATENCY.labels("first_token").observe(time.perf_counter() - started)
+                parts.append(token)
+                yield "token", token
+        except BaseException:
+            fold.cancel()
+            raise
+        STAGE_LATENCY.labels("generation").observe(time.perf_counter() - started)
+        
+        session.update(
+            summary=await fold,
+            last_question=question,
+            last_output="".join(parts),
+            turns=session["turns"] + 1
+        )
+        await store.save(session)
+        yield "session", {"session_id": session["id"]}
+
+
+async def batch_query(resume_texts: list[str], job_description: str,
+                      admission: AdmissionController = None) -> AsyncIterator[tuple[str, dict]]:
+    """
+    Analyze many resumes against one job description.
+    
+    The job-description side runs once: company extraction and scraping,
+    and a single batched embedding + retrieval pass for all resumes.
+    LLM calls then fan out with at most BATCH_CONCURRENCY in flight, and
+    results are yielded in completion order. Each resume goes through the
+    response cache, so repeats are answered without a new generation.
+    
+    With admission, the caller's slot on it is handed over: it covers the
+    shared scrape and retrieval and is released before the fan-out, after
+    which every in-flight generation holds a background slot of its own.
+    
+    Args:
+        resume_texts: Candidates' resumes
+        job_description: Target job description
+        admission: Controller the caller acquired one slot on
+        
+    Yields:
+        ("result", {"index": i, **QueryResponse}) for each success and
+        ("failed", {"index": i, "detail": "..."}) for each failure
+    """
+    cache = get_response_cache()
+    keys = [response_key(resume, job_description, None, DEFAULT_MODEL, PROMPT_VERSION) for resume in resume_texts]
+    
+    try:
+        pending = []
+        for index, key in enumerate(keys):
+            cached = cache.get(key)
+            if cached is not None:
+                yield "result", {"index": index, **cached[0].model_dump()}
+            else:
+                pending.append(index)
+        if not pending:
+            return
+        
+        skipped = []
+        stages = []
         company_name = extract_company_name(job_description)
         if company_name:
             print(f"Scraping interview info for: {company_name}")
-            company_info = await scrape_company_info(company_name)
-    
-    query = f"{resume_text}\n\n{job_description}"
-    retrieved_context = retrieve_context(query)
+            stages.append(_run_stage(
+                "company_insights", scrape_company_info(company_name),
+                min(SCRAPE_TIMEOUT, PIPELINE_BUDGET), None, skipped
+            ))
+        
+        queries = [(resume_texts[index], job_description) for index in pending]
+        stages.append(_run_stage(
+            "retrieval", aretrieve_contexts(queries),
+            BATCH_RETRIEVAL_TIMEOUT, [""] * len(queries), skipped
+        ))
+        
+        results = await asyncio.gather(*stages)
+        company_info = results[0] if company_name else None
+        contexts = results[-1]
+    finally:
+        if admission is not None:
+            admission.release()
     
-    prompt = build_analysis_prompt(
-        resume_text=resume_text,
-        job_description=job_description,
-        retrieved_context=retrieved_context,
-        previous_output=previous_output,
-        company_info=company_info
-    )
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
     
-    ai_output = generate(prompt)
+    async def run_one(index: int, retrieved_context: str) -> tuple[str, dict]:
+        async with semaphore, (admission.background_slot() if admission else contextlib.nullcontext()):
+            with observe_stage("prompt_build"):
+                messages, prompt_tokens = build_budgeted_messages(
+                    resume_text=resume_texts[index],
+                    job_description=job_description,
+                    retrieved_context=retrieved_context,
+                    company_info=company_info,
+                    model=DEFAULT_MODEL
+                )
+            
+            async def generate():
+                with observe_stage("generation"):
+                    ai_output = await agenerate(messages, priority=PRIORITY_BATCH)
+                response = QueryResponse(
+                    ai_output=ai_output,
+                    skipped_stages=list(skipped),
+                    prompt_tokens=prompt_tokens
+                )
+                return response, retrieved_context
+            
+            try:
+                response, _ = await cache.get_or_compute(
+                    keys[index], generate,
+                    cacheable=lambda result: not result[0].skipped_stages
+                )
+            except Exception as e:
+                print(f"Batch item {index} failed: {e}")
+                return "failed", {"index": index, "detail": str(e)}
+            return "result", {"index": index, **response.model_dump()}
     
-    return ai_output
+    tasks = [asyncio.ensure_future(run_one(index, context)) for index, context in zip(pending, contexts)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # Stop outstanding generations if the client went away
+        for task in tasks:
+            task.cancel()
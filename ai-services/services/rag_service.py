@@ -1,13 +1,332 @@
 """
 RAG Service - Context Retrieval
 
-Retrieves relevant documents from ChromaDB using similarity search.
+Retrieves relevant documents from ChromaDB (or its memory-mapped NumPy
+export, see vector_index) using similarity search.
 NO logic, NO scoring, NO thresholds - just raw retrieval.
 Preserves existing RAG implementation.
 """
 
-import chromadb
-from services.embedding_service import generate_embedding
+import asyncio
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+from services.embedding_service import generate_embedding, generate_embeddings, agenerate_embedding
+from services.vector_index import NumpyStore, VECTOR_INDEX_PATH
+from utils.chunking import CHUNK_SIZE, chunk_text
+from utils.metrics import observe_stage
+
+CHROMA_PATH = os.getenv("CHROMA_PATH", "./chroma_db")
+
+# Where requests search: "chroma" (HNSW) or "numpy" (exact search over a
+# memory-mapped export written by ingest). Ingestion always goes to Chroma.
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma")
+
+# Resume + JD queries are split into chunks the encoder sees in full
+# (instead of one string truncated at 256 word pieces). Chunks per query
+# are capped so retrieval cost stays bounded however long the input is.
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "3"))
+QUERY_CHUNK_CHARS = int(os.getenv("QUERY_CHUNK_CHARS", str(CHUNK_SIZE)))
+QUERY_MAX_CHUNKS = int(os.getenv("QUERY_MAX_CHUNKS", "8"))
+
+# Retrieval results per query; dropped whenever the knowledge base version
+# changes. 0 disables the cache.
+RETRIEVAL_CACHE_MAX_ENTRIES = int(os.getenv("RETRIEVAL_CACHE_MAX_ENTRIES", "2048"))
+
+# How often (seconds) readers check whether another process re-ingested
+VERSION_CHECK_INTERVAL = float(os.getenv("CHROMA_VERSION_CHECK_INTERVAL", "2.0"))
+
+_VERSION_FILE = "kb_version"
+
+
+class ChromaStore:
+    """
+    Process-wide ChromaDB handle shared by all requests.
+    
+    The client and collection handles are opened once and reused. Writers
+    call bump_version() after ingesting; other processes notice the new
+    version on disk and swap in a freshly opened client without a restart.
+    Readers always work on a local reference, so a swap never disturbs
+    queries already in flight. Async callers use aget_collection, which
+    moves the version check and any reopen off the event loop.
+    """
+    
+    def __init__(self, path: str = CHROMA_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._client = None
+        self._retired = None
+        self._collections = {}
+        self._version = 0
+        self._last_check = 0.0
+    
+    @property
+    def version(self) -> int:
+        """Knowledge base version currently loaded by this process."""
+        return self._version
+    
+    def open(self):
+        """Open the persistent client if it is not open yet."""
+        with self._lock:
+            if self._client is None:
+                # Imported here: chromadb takes seconds to import and
+                # workers on the numpy backend never need it
+                import chromadb
+                self._client = chromadb.PersistentClient(path=self.path)
+                self._version = self._read_version()
+                self._last_check = time.monotonic()
+            return self._client
+    
+    def get_collection(self, name: str):
+        """
+        Get a cached collection handle for reading.
+        
+        Args:
+            name: Collection name
+            
+        Returns:
+            Collection handle, or None if the collection does not exist
+        """
+        self._maybe_reload()
+        collection = self._collections.get(name)
+        if collection is not None:
+            return collection
+        
+        client = self.open()
+        try:
+            collection = client.get_collection(name=name)
+        except Exception:
+            return None
+        
+        with self._lock:
+            if self._client is client:
+                self._collections[name] = collection
+        return collection
+    
+    def peek_collection(self, name: str):
+        """Cached handle if no disk access is due (no open, no version check), else None."""
+        if self._client is None or time.monotonic() - self._last_check >= VERSION_CHECK_INTERVAL:
+            return None
+        return self._collections.get(name)
+    
+    def get_or_create_collection(self, name: str, metadata: Optional[dict] = None):
+        """
+        Get or create a collection handle for writing.
+        
+        Args:
+            name: Collection name
+            metadata: Metadata used when the collection is created
+            
+        Returns:
+            Collection handle
+        """
+        client = self.open()
+        collection = client.get_or_create_collection(name=name, metadata=metadata)
+        with self._lock:
+            if self._client is client:
+                self._collections[name] = collection
+        return collection
+    
+    def bump_version(self) -> int:
+        """
+        Record that the knowledge base changed.
+        
+        Writes the new version next to the database so that other worker
+        processes reload, and updates this process immediately (its own
+        client already sees the written data).
+        
+        Returns:
+            The new version number
+        """
+        with self._lock:
+            version = max(self._version, self._read_version()) + 1
+            tmp_path = os.path.join(self.path, _VERSION_FILE + ".tmp")
+            os.makedirs(self.path, exist_ok=True)
+            with open(tmp_path, "w") as f:
+                f.write(str(version))
+            os.replace(tmp_path, os.path.join(self.path, _VERSION_FILE))
+            self._version = version
+            return version
+    
+    def _read_version(self) -> int:
+        try:
+            with open(os.path.join(self.path, _VERSION_FILE)) as f:
+                return int(f.read().strip() or 0)
+        except (OSError, ValueError):
+            return 0
+    
+    def _maybe_reload(self):
+        """Swap in a fresh client if another process bumped the version."""
+        now = time.monotonic()
+        if self._client is None or now - self._last_check < VERSION_CHECK_INTERVAL:
+            return
+        
+        with self._lock:
+            if now - self._last_check < VERSION_CHECK_INTERVAL:
+                return
+            self._last_check = now
+            version = self._read_version()
+            if version == self._version:
+                return
+            
+            print(f"Knowledge base changed (v{self._version} -> v{version}), reopening ChromaDB")
+            import chromadb
+            # Chroma caches one System per path; evict it so a new one is
+            # opened. The previous System is stopped on the next swap, once
+            # in-flight queries against it have long finished. Client._system
+            # is a chromadb internal (0.5.23 is pinned); without it the old
+            # System is left to the garbage collector instead.
+            if self._retired is not None:
+                self._retired.stop()
+            self._retired = getattr(self._client, "_system", None)
+            self._client.clear_system_cache()
+            self._client = chromadb.PersistentClient(path=self.path)
+            self._collections = {}
+            self._version = version
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> ChromaStore:
+    """Return the process-wide ChromaStore (opened lazily on first use)."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ChromaStore(CHROMA_PATH)
+    return _store
+
+
+_vector_store = None
+# Separate from _store_lock: the chroma branch calls get_store(), which
+# takes that (non-reentrant) lock itself
+_vector_store_lock = threading.Lock()
+
+def get_vector_store():
+    """
+    Return the store requests search, chosen by VECTOR_BACKEND.
+    
+    Both backends expose get_collection(name) returning an object with
+    a Chroma-compatible query(), and peek_collection(name) for callers
+    that must not touch the disk (see aget_collection).
+    """
+    global _vector_store
+    if _vector_store is None:
+        with _vector_store_lock:
+            if _vector_store is None:
+                _vector_store = NumpyStore(VECTOR_INDEX_PATH) if VECTOR_BACKEND == "numpy" else get_store()
+    return _vector_store
+
+
+async def aget_collection(store, name: str):
+    """
+    store.get_collection for the event loop.
+    
+    The cached handle is returned directly; opening the store, the
+    periodic version check and a reload after an ingest (which reopens
+    ChromaDB or remaps the snapshot) run in a worker thread.
+    """
+    collection = store.peek_collection(name)
+    if collection is None:
+        collection = await asyncio.to_thread(store.get_collection, name)
+    return collection
+
+
+def retrieval_key(collection_name: str, top_k: int, query_parts: list[str]) -> str:
+    """
+    Cache key for a retrieval.
+    
+    Args:
+        collection_name: Collection searched
+        top_k: Number of documents retrieved
+        query_parts: The query string, or the chunks of a chunked query
+        
+    Returns:
+        Hex SHA-256 digest
+    """
+    digest = hashlib.sha256()
+    for part in (collection_name, str(top_k), *query_parts):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class RetrievalCache:
+    """
+    LRU of retrieved context keyed by query hash, top_k and collection.
+    
+    Entries belong to one knowledge base version: the first lookup with a
+    newer version (after an ingest called bump_version) empties the cache,
+    and results computed against an older version are not stored.
+    """
+    
+    def __init__(self, max_entries: int = RETRIEVAL_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = None
+        self._hits = 0
+        self._misses = 0
+        self._invalidations = 0
+    
+    def get(self, key: str, version: int) -> Optional[str]:
+        """Return the cached context for key at this version, or None."""
+        with self._lock:
+            self._check_version(version)
+            context = self._entries.get(key)
+            if context is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return context
+    
+    def put(self, key: str, context: str, version: int):
+        """Store context retrieved at version (ignored if the version moved on)."""
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            if version != self._version:
+                return
+            self._entries[key] = context
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def _check_version(self, version: int):
+        if version == self._version:
+            return
+        if self._version is not None:
+            self._invalidations += 1
+        self._entries.clear()
+        self._version = version
+    
+    def stats(self) -> dict:
+        """Hit/miss counters since startup and the cached version."""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "version": self._version,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 3) if lookups else 0.0,
+                "invalidations": self._invalidations
+            }
+
+
+_retrieval_cache = None
+
+def get_retrieval_cache() -> RetrievalCache:
+    global _retrieval_cache
+    if _retrieval_cache is None:
+        _retrieval_cache = RetrievalCache()
+    return _retrieval_cache
 
 
 def retrieve_context(query: str, collection_name: str = "interview_prep", top_k: int = 3) -> str:
@@ -25,22 +344,206 @@ def retrieve_context(query: str, collection_name: str = "interview_prep", top_k:
     Returns:
         Concatenated text from retrieved documents
     """
-    client = chromadb.PersistentClient(path="./chroma_db")
-    
-    try:
-        collection = client.get_collection(name=collection_name)
-    except Exception:
+    store = get_vector_store()
+    collection = store.get_collection(collection_name)
+    if collection is None:
         # If collection doesn't exist, return empty context
         return ""
     
+    cache = get_retrieval_cache()
+    version = store.version
+    key = retrieval_key(collection_name, top_k, [query])
+    context = cache.get(key, version)
+    if context is not None:
+        return context
+    
     # Generate query embedding using existing embedding provider
     query_embedding = generate_embedding(query)
     
+    context = _query_collection(collection, query_embedding, top_k)
+    cache.put(key, context, version)
+    return context
+
+
+async def aretrieve_context(query: str, collection_name: str = "interview_prep", top_k: int = 3) -> str:
+    """
+    Async variant of retrieve_context for the request path.
+    
+    The query embedding goes through the micro-batching executor and the
+    ANN lookup runs in a worker thread, so neither blocks the event loop.
+    
+    Args:
+        query: Search query (typically resume + job description)
+        collection_name: ChromaDB collection name
+        top_k: Number of documents to retrieve
+        
+    Returns:
+        Concatenated text from retrieved documents
+    """
+    store = get_vector_store()
+    collection = await aget_collection(store, collection_name)
+    if collection is None:
+        return ""
+    
+    cache = get_retrieval_cache()
+    version = store.version
+    key = retrieval_key(collection_name, top_k, [query])
+    context = cache.get(key, version)
+    if context is not None:
+        return context
+    
+    with observe_stage("embedding"):
+        query_embedding = await agenerate_embedding(query)
+    
+    context = await asyncio.to_thread(_query_collection, collection, query_embedding, top_k)
+    cache.put(key, context, version)
+    return context
+
+
+def split_query(resume_text: str, job_description: str, max_chunks: int = QUERY_MAX_CHUNKS) -> list[str]:
+    """
+    Split a resume + job description query into section-sized chunks.
+    
+    Chunks follow paragraph and line boundaries. When there are more than
+    max_chunks, resume and JD chunks are taken alternately so both sides
+    stay represented; the tail of the longer text is dropped.
+    
+    Args:
+        resume_text: Candidate's resume
+        job_description: Target job description
+        max_chunks: Upper bound on chunks returned
+        
+    Returns:
+        Query chunks (at least one for non-empty input)
+    """
+    resume_chunks = chunk_text(resume_text, QUERY_CHUNK_CHARS, 0)
+    jd_chunks = chunk_text(job_description, QUERY_CHUNK_CHARS, 0)
+    chunks = []
+    for i in range(max(len(resume_chunks), len(jd_chunks))):
+        chunks.extend(side[i] for side in (resume_chunks, jd_chunks) if i < len(side))
+    return list(dict.fromkeys(chunks))[:max_chunks]
+
+
+async def aretrieve_query_context(resume_text: str, job_description: str,
+                                  collection_name: str = "interview_prep", top_k: int = RETRIEVAL_TOP_K) -> str:
+    """
+    Retrieve context for a resume + job description with one vector per chunk.
+    
+    All chunks are embedded in one micro-batch (JD chunks shared by many
+    candidates are usually cached), searched with a single multi-query
+    lookup, and the hits are fused: each document keeps its best score
+    across chunks and the top_k documents are returned.
+    
+    Args:
+        resume_text: Candidate's resume
+        job_description: Target job description
+        collection_name: ChromaDB collection name
+        top_k: Number of documents to retrieve
+        
+    Returns:
+        Concatenated text from retrieved documents
+    """
+    store = get_vector_store()
+    collection = await aget_collection(store, collection_name)
+    chunks = split_query(resume_text, job_description)
+    if collection is None or not chunks:
+        return ""
+    
+    cache = get_retrieval_cache()
+    version = store.version
+    key = retrieval_key(collection_name, top_k, chunks)
+    context = cache.get(key, version)
+    if context is not None:
+        return context
+    
+    with observe_stage("embedding"):
+        query_embeddings = await asyncio.gather(*(agenerate_embedding(chunk) for chunk in chunks))
+    
+    def search() -> str:
+        with observe_stage("vector_search"):
+            results = collection.query(query_embeddings=list(query_embeddings), n_results=top_k)
+        return "\n\n".join(_fuse(results, range(len(chunks)), top_k))
+    
+    context = await asyncio.to_thread(search)
+    cache.put(key, context, version)
+    return context
+
+
+async def aretrieve_contexts(queries: list[tuple[str, str]], collection_name: str = "interview_prep",
+                             top_k: int = RETRIEVAL_TOP_K) -> list[str]:
+    """
+    Retrieve context for many resume + job description queries at once.
+    
+    Every query is chunked like aretrieve_query_context and looked up in
+    the retrieval cache. Unique chunks across the remaining queries (the
+    shared JD once) are embedded in one batched forward pass and looked
+    up with a single multi-query similarity search, both in a worker
+    thread; hits are fused per query.
+    
+    Args:
+        queries: (resume_text, job_description) pairs
+        collection_name: ChromaDB collection name
+        top_k: Number of documents to retrieve per query
+        
+    Returns:
+        Concatenated context per query, in input order
+    """
+    store = get_vector_store()
+    collection = await aget_collection(store, collection_name)
+    if collection is None or not queries:
+        return [""] * len(queries)
+    
+    cache = get_retrieval_cache()
+    version = store.version
+    groups = [split_query(resume_text, job_description) for resume_text, job_description in queries]
+    keys = [retrieval_key(collection_name, top_k, chunks) for chunks in groups]
+    contexts = [cache.get(key, version) if chunks else "" for key, chunks in zip(keys, groups)]
+    missing = [i for i, context in enumerate(contexts) if context is None]
+    if not missing:
+        return contexts
+    
+    unique = list(dict.fromkeys(chunk for i in missing for chunk in groups[i]))
+    position = {chunk: i for i, chunk in enumerate(unique)}
+    
+    def search() -> list[str]:
+        with observe_stage("embedding"):
+            query_embeddings = generate_embeddings(unique)
+        with observe_stage("vector_search"):
+            results = collection.query(
+                query_embeddings=query_embeddings,
+                n_results=top_k
+            )
+        return ["\n\n".join(_fuse(results, [position[chunk] for chunk in groups[i]], top_k)) for i in missing]
+    
+    for i, context in zip(missing, await asyncio.to_thread(search)):
+        contexts[i] = context
+        cache.put(keys[i], context, version)
+    return contexts
+
+
+def _fuse(results: dict, rows, top_k: int) -> list[str]:
+    """
+    Merge the hits of several query vectors into one ranked list.
+    
+    Documents found by more than one chunk are kept once, with their best
+    (smallest) distance; the top_k closest documents are returned.
+    """
+    best = {}
+    for row in rows:
+        for doc_id, document, distance in zip(results["ids"][row], results["documents"][row], results["distances"][row]):
+            if doc_id not in best or distance < best[doc_id][0]:
+                best[doc_id] = (distance, document)
+    return [document for _, document in sorted(best.values(), key=lambda hit: hit[0])[:top_k]]
+
+
+def _query_collection(collection, query_embedding: list, top_k: int) -> str:
+    """Run the similarity search and concatenate the matched documents."""
     # Retrieve similar documents
-    results = collection.query(
-        query_embeddings=[query_embedding],
-        n_results=top_k
-    )
+    with observe_stage("vector_search"):
+        results = collection.query(
+            query_embeddings=[query_embedding],
+            n_results=top_k
+        )
     
     # Concatenate retrieved documents
     if results['documents'] and len(results['documents']) > 0:
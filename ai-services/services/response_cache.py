@@ -0,0 +1,134 @@
+"""
+Response Cache
+
+Exact-match cache for whole query responses with in-flight coalescing.
+Double-clicks, proxy retries and page-reload re-submits of the same
+resume/JD pair are answered from one LLM call.
+"""
+
+import asyncio
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional
+
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "600"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1000"))
+
+
+def response_key(resume_text: str, job_description: str, previous_output: Optional[str],
+                 model: str, prompt_version: str) -> str:
+    """
+    Cache key for a query.
+    
+    Args:
+        resume_text: Candidate's resume
+        job_description: Target job description
+        previous_output: Optional previous AI output for continuation
+        model: LLM model name
+        prompt_version: Prompt template version
+        
+    Returns:
+        Hex SHA-256 digest
+    """
+    digest = hashlib.sha256()
+    for part in (model, prompt_version, resume_text, job_description, previous_output or ""):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class ResponseCache:
+    """
+    Size- and TTL-bounded LRU of responses with single-flight coalescing.
+    
+    Identical requests that arrive while the first is still being computed
+    await the same result instead of issuing duplicate LLM calls.
+    """
+    
+    def __init__(self, ttl: float = RESPONSE_CACHE_TTL, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._in_flight = {}
+        self._hits = 0
+        self._misses = 0
+        self._coalesced = 0
+    
+    def get(self, key: str):
+        """Return a fresh cached value, or None."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        self._hits += 1
+        return value
+    
+    def put(self, key: str, value):
+        """Store a value for the configured TTL."""
+        if self.ttl <= 0 or self.max_entries <= 0:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+    
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable],
+                             cacheable: Callable[[object], bool] = lambda value: True):
+        """
+        Return the cached value for key, or compute it once.
+        
+        Args:
+            key: Cache key
+            compute: Coroutine function producing the value
+            cacheable: Predicate deciding whether a computed value is stored
+            
+        Returns:
+            Cached, shared in-flight, or freshly computed value
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+        
+        task = self._in_flight.get(key)
+        if task is not None:
+            self._coalesced += 1
+            return await asyncio.shield(task)
+        
+        self._misses += 1
+        task = asyncio.ensure_future(compute())
+        self._in_flight[key] = task
+        
+        def on_done(done: asyncio.Future):
+            # Runs even if the original caller went away, so the result
+            # still lands in the cache for the retry
+            self._in_flight.pop(key, None)
+            if not done.cancelled() and done.exception() is None and cacheable(done.result()):
+                self.put(key, done.result())
+        
+        task.add_done_callback(on_done)
+        return await asyncio.shield(task)
+    
+    def stats(self) -> dict:
+        """Hit/miss/coalesced counters since startup."""
+        return {
+            "entries": len(self._entries),
+            "hits": self._hits,
+            "misses": self._misses,
+            "coalesced": self._coalesced,
+            "in_flight": len(self._in_flight)
+        }
+
+
+_response_cache = None
+
+def get_response_cache() -> ResponseCache:
+    global _response_cache
+    if _response_cache is None:
+        _response_cache = ResponseCache()
+    return _response_cache
@@ -1,11 +1,174 @@
 import re
 import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
 from typing import Dict, Optional
 import httpx
 from bs4 import BeautifulSoup
+from utils.metrics import SCRAPES, observe_stage
+
+# Company info cache. Failed scrapes (default info) are cached for a
+# shorter time so a transient failure is retried soon.
+SCRAPE_CACHE_TTL = float(os.getenv("SCRAPE_CACHE_TTL", "86400"))
+SCRAPE_NEGATIVE_TTL = float(os.getenv("SCRAPE_NEGATIVE_TTL", "900"))
+SCRAPE_CACHE_MAX_ENTRIES = int(os.getenv("SCRAPE_CACHE_MAX_ENTRIES", "5000"))
+# Optional SQLite file so cached results survive restarts (empty = memory only)
+SCRAPE_CACHE_PATH = os.getenv("SCRAPE_CACHE_PATH", "")
+
+# Search page queried for interview snippets (overridable for offline benchmarks)
+SCRAPE_SEARCH_URL = os.getenv("SCRAPE_SEARCH_URL", "https://www.google.com/search")
+
+
+class CompanyInfoCache:
+    """
+    TTL cache with single-flight coalescing for company info.
+    
+    Keys are normalized company names. Concurrent lookups for a company
+    that is not cached share one in-flight scrape instead of each hitting
+    the search page.
+    """
+    
+    def __init__(self, ttl: float = SCRAPE_CACHE_TTL, negative_ttl: float = SCRAPE_NEGATIVE_TTL,
+                 max_entries: int = SCRAPE_CACHE_MAX_ENTRIES, path: str = SCRAPE_CACHE_PATH):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._in_flight = {}
+        self._db = None
+        self._db_lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._coalesced = 0
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False, timeout=10.0)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS company_info ("
+                "key TEXT PRIMARY KEY, info TEXT NOT NULL, expires REAL NOT NULL)"
+            )
+            self._db.commit()
+    
+    @staticmethod
+    def normalize(company_name: str) -> str:
+        """Cache key for a company name."""
+        return " ".join(company_name.lower().split())
+    
+    async def get(self, company_name: str, fetch) -> Dict[str, str]:
+        """
+        Return cached company info, fetching it at most once concurrently.
+        
+        Args:
+            company_name: Company name as extracted from the job description
+            fetch: Coroutine function performing the actual scrape
+            
+        Returns:
+            Company interview info dictionary
+        """
+        key = self.normalize(company_name)
+        now = time.time()
+        
+        entry = self._entries.get(key)
+        if entry is None and self._db is not None and key not in self._in_flight:
+            entry = await asyncio.to_thread(self._load, key)
+            if entry is not None:
+                self._store_memory(key, entry)
+        if entry is not None and entry[0] > now:
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return dict(entry[1])
+        
+        task = self._in_flight.get(key)
+        if task is not None:
+            self._coalesced += 1
+            return dict(await asyncio.shield(task))
+        
+        self._misses += 1
+        loop = asyncio.get_running_loop()
+        task = asyncio.ensure_future(fetch(company_name))
+        self._in_flight[key] = task
+        
+        def on_done(done: asyncio.Future):
+            # Runs even if the caller's deadline cancelled it, so a slow
+            # scrape still lands in the cache for the next request
+            self._in_flight.pop(key, None)
+            if done.cancelled() or done.exception() is not None:
+                return
+            info = done.result()
+            ttl = self.negative_ttl if info == _get_default_info() else self.ttl
+            entry = (time.time() + ttl, info)
+            self._store_memory(key, entry)
+            if self._db is not None:
+                loop.run_in_executor(None, self._save, key, entry)
+        
+        task.add_done_callback(on_done)
+        return dict(await asyncio.shield(task))
+    
+    def _store_memory(self, key: str, entry: tuple):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+    
+    def _load(self, key: str) -> Optional[tuple]:
+        with self._db_lock:
+            row = self._db.execute("SELECT expires, info FROM company_info WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        return row[0], json.loads(row[1])
+    
+    def _save(self, key: str, entry: tuple):
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO company_info (key, info, expires) VALUES (?, ?, ?)",
+                (key, json.dumps(entry[1]), entry[0])
+            )
+            self._db.commit()
+    
+    def stats(self) -> dict:
+        """Hit/miss/coalesced counters since startup."""
+        return {
+            "entries": len(self._entries),
+            "hits": self._hits,
+            "misses": self._misses,
+            "coalesced": self._coalesced,
+            "in_flight": len(self._in_flight)
+        }
+
+
+_company_cache = None
+
+def get_company_cache() -> CompanyInfoCache:
+    global _company_cache
+    if _company_cache is None:
+        _company_cache = CompanyInfoCache()
+    return _company_cache
 
 
 async def scrape_company_info(company_name: str) -> Dict[str, str]:
+    """
+    Get company interview information, served from the TTL cache when
+    possible. Concurrent requests for the same company share one scrape.
+    
+    Args:
+        company_name: Name of the company
+        
+    Returns:
+        Dictionary with interview process, rounds, and questions
+    """
+    return await get_company_cache().get(company_name, _timed_scrape)
+
+
+async def _timed_scrape(company_name: str) -> Dict[str, str]:
+    """Cache-miss path: the actual scrape, timed for /metrics."""
+    with observe_stage("scrape"):
+        return await _scrape_company_info(company_name)
+
+
+async def _scrape_company_info(company_name: str) -> Dict[str, str]:
     """
     Scrape company interview information from Glassdoor-like sources.
     
@@ -24,11 +187,12 @@ async def scrape_company_info(company_name: str) -> Dict[str, str]:
         
         async with httpx.AsyncClient(timeout=10.0, follow_redirects=True) as client:
             response = await client.get(
-                f"https://www.google.com/search?q={search_query}",
+                f"{SCRAPE_SEARCH_URL}?q={search_query}",
                 headers=headers
             )
             
             if response.status_code != 200:
+                SCRAPES.labels("http_error").inc()
                 return _get_default_info()
             
             soup = BeautifulSoup(response.text, 'html.parser')
@@ -40,17 +204,20 @@ async def scrape_company_info(company_name: str) -> Dict[str, str]:
                     snippets.append(text)
             
             if not snippets:
+                SCRAPES.labels("no_results").inc()
                 return _get_default_info()
             
+            SCRAPES.labels("ok").inc()
             return {
                 'process': _extract_process(snippets),
                 'rounds': _extract_rounds(snippets),
                 'questions': _extract_questions(snippets),
                 'tips': _extract_tips(snippets)
             }
-            
+    
     except Exception as e:
         print(f"Scraping error: {e}")
+        SCRAPES.labels("error").inc()
         return _get_default_info()
 
 
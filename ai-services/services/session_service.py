@@ -0,0 +1,166 @@
+"""
+Session Service - Conversation State
+
+Stores follow-up conversation state server-side so clients don't resend
+the whole previous analysis every turn. A session holds the resume, job
+description and retrieved context once, plus a rolling summary of
+earlier turns and the most recent turn verbatim.
+
+Sessions live in memory (bounded LRU) and in SQLite so they survive
+restarts and are visible to every worker on the node.
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Optional
+
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "./sessions.sqlite3")
+SESSION_TTL = float(os.getenv("SESSION_TTL", "86400"))
+SESSION_MEMORY_MAX_ENTRIES = int(os.getenv("SESSION_MEMORY_MAX_ENTRIES", "1000"))
+
+
+class SessionStore:
+    """
+    In-memory + SQLite store of conversation sessions.
+    
+    Sessions are plain dicts with keys: id, resume_text, job_description,
+    retrieved_context, summary, last_question, last_output, turns, updated.
+    """
+    
+    def __init__(self, path: str = SESSION_DB_PATH, ttl: float = SESSION_TTL,
+                 max_memory_entries: int = SESSION_MEMORY_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_memory_entries = max_memory_entries
+        self._memory = OrderedDict()
+        self._locks = {}
+        self._db = None
+        self._db_lock = threading.Lock()
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False, timeout=10.0)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "id TEXT PRIMARY KEY, data TEXT NOT NULL, updated REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS sessions_updated ON sessions (updated)")
+            self._db.commit()
+    
+    def lock(self, session_id: str) -> asyncio.Lock:
+        """Per-session lock so concurrent follow-ups apply one at a time."""
+        lock = self._locks.get(session_id)
+        if lock is None:
+            lock = self._locks[session_id] = asyncio.Lock()
+        return lock
+    
+    async def create(self, resume_text: str, job_description: str, retrieved_context: str, output: str) -> dict:
+        """
+        Start a session from a completed analysis.
+        
+        Args:
+            resume_text: Candidate's resume
+            job_description: Target job description
+            retrieved_context: Context retrieved for the analysis
+            output: The analysis returned to the candidate
+            
+        Returns:
+            The new session
+        """
+        session = {
+            "id": uuid.uuid4().hex,
+            "resume_text": resume_text,
+            "job_description": job_description,
+            "retrieved_context": retrieved_context,
+            "summary": "",
+            "last_question": None,
+            "last_output": output,
+            "turns": 1,
+            "updated": time.time()
+        }
+        await self.save(session)
+        return session
+    
+    async def get(self, session_id: str, fresh: bool = False) -> Optional[dict]:
+        """
+        Load a session, or None if unknown or expired.
+        
+        Args:
+            session_id: Session id
+            fresh: Check SQLite for a newer copy than the in-memory one.
+                Another worker may have answered a turn since this worker
+                last saw the session; callers pass this under the session
+                lock before building a turn.
+        """
+        session = self._memory.get(session_id)
+        if self._db is not None and (session is None or fresh):
+            newer = await asyncio.to_thread(self._load, session_id, session["updated"] if session else None)
+            if newer is not None:
+                session = newer
+                self._remember(session)
+        if session is None:
+            return None
+        if time.time() - session["updated"] > self.ttl:
+            self._memory.pop(session_id, None)
+            if self._db is not None:
+                await asyncio.to_thread(self._delete, session_id)
+            return None
+        self._memory.move_to_end(session_id)
+        return dict(session)
+    
+    async def save(self, session: dict):
+        """Persist a session after a turn."""
+        session["updated"] = time.time()
+        self._remember(dict(session))
+        if self._db is not None:
+            await asyncio.to_thread(self._store, dict(session))
+    
+    def _remember(self, session: dict):
+        self._memory[session["id"]] = session
+        self._memory.move_to_end(session["id"])
+        while len(self._memory) > self.max_memory_entries:
+            session_id, _ = self._memory.popitem(last=False)
+            lock = self._locks.get(session_id)
+            if lock is not None and not lock.locked():
+                del self._locks[session_id]
+    
+    def _delete(self, session_id: str):
+        with self._db_lock:
+            self._db.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+            self._db.commit()
+    
+    def _load(self, session_id: str, newer_than: float = None) -> Optional[dict]:
+        """Read a session row, only if it was updated after newer_than."""
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT data FROM sessions WHERE id = ? AND updated > ?",
+                (session_id, newer_than if newer_than is not None else float("-inf"))
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+    
+    def _store(self, session: dict):
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO sessions (id, data, updated) VALUES (?, ?, ?)",
+                (session["id"], json.dumps(session), session["updated"])
+            )
+            # Opportunistically drop expired sessions
+            self._db.execute("DELETE FROM sessions WHERE updated < ?", (time.time() - self.ttl,))
+            self._db.commit()
+    
+    def stats(self) -> dict:
+        """Session counts for the health endpoint."""
+        return {"memory_sessions": len(self._memory)}
+
+
+_store = None
+
+def get_session_store() -> SessionStore:
+    global _store
+    if _store is None:
+        _store = SessionStore()
+    return _store
@@ -0,0 +1,297 @@
+"""
+Vector Index - Memory-Mapped NumPy Backend
+
+Read-only exact-search index for VECTOR_BACKEND=numpy. ChromaDB stays
+the system of record for ingestion; after each ingest that changes the
+knowledge base, every collection is exported to a snapshot directory:
+
+    <path>/CURRENT                      version of the live snapshot
+    <path>/v<version>/<collection>/
+        embeddings.npy                  L2-normalized vectors (float16 by default)
+        documents.bin, documents.idx    UTF-8 texts and their byte offsets
+        ids.bin, ids.idx                chunk ids and their byte offsets
+
+Workers open every file with mmap, so all processes on a node share one
+copy through the OS page cache and neither chromadb nor its HNSW index
+is loaded. Search is a blocked matrix product plus argpartition, which
+is exact and fast enough for tens of thousands of chunks.
+"""
+
+import os
+import shutil
+import threading
+import time
+import numpy as np
+
+VECTOR_INDEX_PATH = os.getenv("VECTOR_INDEX_PATH", "./vector_index")
+
+# Stored vector precision. float16 halves disk and page cache but every
+# search converts rows to float32; float32 is searched in place.
+VECTOR_INDEX_DTYPE = os.getenv("VECTOR_INDEX_DTYPE", "float16")
+
+# Rows converted per matrix product; small enough that the float32 copy
+# is still in cache when it is multiplied
+SEARCH_BLOCK_ROWS = int(os.getenv("VECTOR_SEARCH_BLOCK_ROWS", "1024"))
+
+# How often (seconds) readers check for a newer snapshot
+SNAPSHOT_CHECK_INTERVAL = float(os.getenv("VECTOR_INDEX_CHECK_INTERVAL", "2.0"))
+
+# Snapshots kept on disk besides the live one (readers may still map them)
+_KEEP_SNAPSHOTS = 1
+_CURRENT_FILE = "CURRENT"
+_EXPORT_PAGE_SIZE = 5000
+
+# Per-thread float32 scratch block (searches run in worker threads)
+_scratch = threading.local()
+
+
+class _StringTable:
+    """Memory-mapped UTF-8 strings addressed by row."""
+    
+    def __init__(self, prefix: str):
+        self._offsets = np.load(prefix + ".idx", mmap_mode="r")
+        size = int(self._offsets[-1])
+        self._data = np.memmap(prefix + ".bin", dtype=np.uint8, mode="r") if size else np.zeros(0, np.uint8)
+    
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+    
+    def __getitem__(self, row: int) -> str:
+        start, end = int(self._offsets[row]), int(self._offsets[row + 1])
+        return self._data[start:end].tobytes().decode("utf-8")
+    
+    @staticmethod
+    def write(prefix: str, strings: list[str]):
+        encoded = [s.encode("utf-8") for s in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        with open(prefix + ".bin", "wb") as f:
+            for b in encoded:
+                f.write(b)
+        np.save(prefix + ".idx", offsets)
+        os.replace(prefix + ".idx.npy", prefix + ".idx")
+
+
+class NumpyCollection:
+    """
+    One exported collection, queried like a ChromaDB collection.
+    
+    query() returns the same shape as Chroma's, so the retrieval code
+    does not care which backend answered. Distances are cosine distances
+    (1 - similarity).
+    """
+    
+    def __init__(self, path: str):
+        self.embeddings = np.load(os.path.join(path, "embeddings.npy"), mmap_mode="r")
+        self.documents = _StringTable(os.path.join(path, "documents"))
+        self.ids = _StringTable(os.path.join(path, "ids"))
+    
+    def count(self) -> int:
+        return self.embeddings.shape[0]
+    
+    def query(self, query_embeddings, n_results: int = 10) -> dict:
+        """
+        Exact top-k by cosine similarity.
+        
+        Args:
+            query_embeddings: One vector or a list of vectors
+            n_results: Results per query
+            
+        Returns:
+            Dict with 'ids', 'documents' and 'distances', one list per query
+        """
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries[None, :]
+        # Not in place: asarray returns the caller's own float32 array
+        queries = queries / np.clip(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12, None)
+        
+        total = self.count()
+        k = min(n_results, total)
+        if k <= 0:
+            return {"ids": [[] for _ in queries], "documents": [[] for _ in queries], "distances": [[] for _ in queries]}
+        
+        scores = np.empty((len(queries), total), dtype=np.float32)
+        if self.embeddings.dtype == np.float32:
+            np.matmul(queries, self.embeddings.T, out=scores)
+        else:
+            buffer = _scratch_block(self.embeddings.shape[1])
+            for start in range(0, total, SEARCH_BLOCK_ROWS):
+                rows = self.embeddings[start:start + SEARCH_BLOCK_ROWS]
+                block = buffer[:len(rows)]
+                np.copyto(block, rows)
+                np.matmul(queries, block.T, out=scores[:, start:start + len(rows)])
+        
+        if k < total:
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            top = np.tile(np.arange(total), (len(queries), 1))
+        ranked = np.take_along_axis(top, np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1), axis=1)
+        
+        return {
+            "ids": [[self.ids[row] for row in rows] for rows in ranked],
+            "documents": [[self.documents[row] for row in rows] for rows in ranked],
+            "distances": [(1.0 - scores[i, rows]).tolist() for i, rows in enumerate(ranked)]
+        }
+
+
+def _scratch_block(dim: int) -> np.ndarray:
+    buffer = getattr(_scratch, "buffer", None)
+    if buffer is None or buffer.shape != (SEARCH_BLOCK_ROWS, dim):
+        buffer = _scratch.buffer = np.empty((SEARCH_BLOCK_ROWS, dim), dtype=np.float32)
+    return buffer
+
+
+class NumpyStore:
+    """
+    Process-wide reader for the exported snapshots.
+    
+    Mirrors ChromaStore's read interface (open, get_collection,
+    peek_collection, version).
+    A newer snapshot written by an ingest is picked up without a restart;
+    queries already running keep their own reference to the old one.
+    """
+    
+    def __init__(self, path: str = VECTOR_INDEX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._collections = None
+        self._version = 0
+        self._last_check = 0.0
+    
+    @property
+    def version(self) -> int:
+        """Knowledge base version of the loaded snapshot."""
+        return self._version
+    
+    def open(self):
+        """Map the current snapshot if nothing is mapped yet."""
+        with self._lock:
+            if self._collections is None:
+                self._load(read_current_version(self.path))
+            return self._collections
+    
+    def get_collection(self, name: str):
+        """
+        Get a collection from the live snapshot.
+        
+        Args:
+            name: Collection name
+            
+        Returns:
+            NumpyCollection, or None if the snapshot does not contain it
+        """
+        self._maybe_reload()
+        return self.open().get(name)
+    
+    def peek_collection(self, name: str):
+        """Mapped collection if no disk access is due (no open, no version check), else None."""
+        collections = self._collections
+        if collections is None or time.monotonic() - self._last_check >= SNAPSHOT_CHECK_INTERVAL:
+            return None
+        return collections.get(name)
+    
+    def _load(self, version: int):
+        collections = {}
+        snapshot = os.path.join(self.path, f"v{version}")
+        if version and os.path.isdir(snapshot):
+            for name in sorted(os.listdir(snapshot)):
+                collections[name] = NumpyCollection(os.path.join(snapshot, name))
+        self._collections = collections
+        self._version = version
+        self._last_check = time.monotonic()
+    
+    def _maybe_reload(self):
+        """Map the newer snapshot if an ingest exported one."""
+        now = time.monotonic()
+        if self._collections is None or now - self._last_check < SNAPSHOT_CHECK_INTERVAL:
+            return
+        
+        with self._lock:
+            if now - self._last_check < SNAPSHOT_CHECK_INTERVAL:
+                return
+            self._last_check = now
+            version = read_current_version(self.path)
+            if version == self._version:
+                return
+            print(f"Vector index changed (v{self._version} -> v{version}), remapping snapshot")
+            self._load(version)
+
+
+def read_current_version(path: str) -> int:
+    """Version of the live snapshot under path (0 if none was exported)."""
+    try:
+        with open(os.path.join(path, _CURRENT_FILE)) as f:
+            return int(f.read().strip() or 0)
+    except (OSError, ValueError):
+        return 0
+
+
+def write_collection(path: str, ids: list[str], embeddings, documents: list[str], dtype: str = VECTOR_INDEX_DTYPE):
+    """
+    Write one collection in the snapshot layout.
+    
+    Args:
+        path: Collection directory (created)
+        ids: Chunk ids
+        embeddings: Vectors, one row per id (normalized here)
+        documents: Chunk texts, one per id
+        dtype: Stored precision ("float16" or "float32")
+    """
+    os.makedirs(path, exist_ok=True)
+    vectors = np.asarray(embeddings, dtype=np.float32).reshape(len(ids), -1) if ids else np.zeros((0, 0), np.float32)
+    vectors = vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+    np.save(os.path.join(path, "embeddings.npy"), vectors.astype(dtype))
+    _StringTable.write(os.path.join(path, "documents"), documents)
+    _StringTable.write(os.path.join(path, "ids"), ids)
+
+
+def export_snapshot(client, version: int, path: str = VECTOR_INDEX_PATH) -> str:
+    """
+    Export every collection of a ChromaDB client as snapshot version.
+    
+    The snapshot is fully written before CURRENT is switched to it, so
+    readers never see a partial index. Older snapshots beyond the
+    previous one are deleted.
+    
+    Args:
+        client: ChromaDB client to read from
+        version: Knowledge base version the snapshot represents
+        path: Index root directory
+        
+    Returns:
+        Snapshot directory
+    """
+    snapshot = os.path.join(path, f"v{version}")
+    staging = snapshot + f".tmp-{os.getpid()}"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    
+    for collection in client.list_collections():
+        collection = client.get_collection(getattr(collection, "name", collection))
+        ids, embeddings, documents = [], [], []
+        offset = 0
+        while True:
+            page = collection.get(include=["embeddings", "documents"], limit=_EXPORT_PAGE_SIZE, offset=offset)
+            if not len(page["ids"]):
+                break
+            ids.extend(page["ids"])
+            embeddings.extend(np.asarray(page["embeddings"], dtype=np.float32))
+            documents.extend(page["documents"])
+            offset += len(page["ids"])
+        write_collection(os.path.join(staging, collection.name), ids, embeddings, documents)
+    
+    shutil.rmtree(snapshot, ignore_errors=True)
+    os.replace(staging, snapshot)
+    tmp_path = os.path.join(path, _CURRENT_FILE + ".tmp")
+    with open(tmp_path, "w") as f:
+        f.write(str(version))
+    os.replace(tmp_path, os.path.join(path, _CURRENT_FILE))
+    
+    stale = sorted(
+        (int(name[1:]) for name in os.listdir(path) if name.startswith("v") and name[1:].isdigit()),
+        reverse=True
+    )[1 + _KEEP_SNAPSHOTS:]
+    for old in stale:
+        shutil.rmtree(os.path.join(path, f"v{old}"), ignore_errors=True)
+    return snapshot
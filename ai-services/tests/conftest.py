@@ -0,0 +1,49 @@
+"""
+Test configuration: run the service against throwaway stores, with no
+model download or network access.
+"""
+
+import os
+import sys
+import tempfile
+import zlib
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_workdir = tempfile.mkdtemp(prefix="neuraflow-tests-")
+os.environ["CHROMA_PATH"] = os.path.join(_workdir, "chroma_db")
+os.environ["VECTOR_INDEX_PATH"] = os.path.join(_workdir, "vector_index")
+os.environ["SESSION_DB_PATH"] = os.path.join(_workdir, "sessions.sqlite3")
+os.environ["EMBED_CACHE_PATH"] = ""
+
+
+class FakeEncoder:
+    """
+    Stand-in for the embedding model (no download needed).
+    
+    Each text maps to a fixed pseudo-random unit vector; every encode
+    call is recorded with its batch size.
+    """
+    
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+        self.calls = []
+    
+    def encode(self, texts, batch_size=None):
+        self.calls.append((list(texts), batch_size))
+        vectors = np.stack([
+            np.random.default_rng(zlib.crc32(text.encode("utf-8"))).standard_normal(self.dim)
+            for text in texts
+        ]).astype(np.float32) if texts else np.zeros((0, self.dim), np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True) if len(texts) else vectors
+
+
+@pytest.fixture
+def fake_encoder(monkeypatch):
+    """Install a FakeEncoder as the embedding model."""
+    from services import embedding_service
+    encoder = FakeEncoder()
+    monkeypatch.setattr(embedding_service, "_model", encoder)
+    return encoder
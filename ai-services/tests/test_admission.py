@@ -0,0 +1,218 @@
+"""
+Admission control tests: shedding, queue timeouts and cancellation, and
+batch generations that count against the analysis limit without
+crowding out interactive requests.
+"""
+
+import asyncio
+import time
+import pytest
+from services import llm_service
+from services.admission import AdmissionController
+from utils.errors import OverloadedError
+
+
+def test_background_slots_leave_reserved_capacity():
+    async def scenario():
+        admission = AdmissionController("analysis", max_concurrent=4, max_queue=2, queue_timeout=1.0)
+        held = asyncio.Event()
+        release = asyncio.Event()
+        running = 0
+        
+        async def batch_generation():
+            nonlocal running
+            async with admission.background_slot(reserved=2, poll_interval=0.01):
+                running += 1
+                if running == 2:
+                    held.set()
+                await release.wait()
+                running -= 1
+        
+        tasks = [asyncio.ensure_future(batch_generation()) for _ in range(5)]
+        await held.wait()
+        await asyncio.sleep(0.05)
+        assert running == 2
+        assert admission.stats()["active"] == 2
+        assert admission.stats()["background"] == 2
+        
+        # Interactive requests still get the reserved slots straight away
+        await admission.acquire()
+        await admission.acquire()
+        assert admission.stats()["active"] == 4
+        admission.release()
+        admission.release()
+        
+        release.set()
+        await asyncio.gather(*tasks)
+        assert admission.stats()["active"] == 0
+        assert admission.stats()["background"] == 0
+    
+    asyncio.run(scenario())
+
+
+def test_background_slots_wait_for_queued_requests():
+    async def scenario():
+        admission = AdmissionController("analysis", max_concurrent=2, max_queue=2, queue_timeout=1.0)
+        await admission.acquire()
+        await admission.acquire()
+        queued = asyncio.ensure_future(admission.acquire())
+        await asyncio.sleep(0)
+        
+        order = []
+        
+        async def batch_generation():
+            async with admission.background_slot(reserved=0, poll_interval=0.01):
+                order.append("batch")
+        
+        batch = asyncio.ensure_future(batch_generation())
+        await asyncio.sleep(0.03)
+        admission.release()
+        await queued
+        order.append("queued")
+        admission.release()
+        await batch
+        admission.release()
+        assert order == ["queued", "batch"]
+        assert admission.stats()["active"] == 0
+    
+    asyncio.run(scenario())
+
+
+def test_batch_holds_one_slot_per_generation(monkeypatch):
+    admission = AdmissionController("analysis", max_concurrent=16, max_queue=4)
+    peak = {"active": 0, "generating": 0, "max_generating": 0}
+    
+    async def fake_contexts(queries):
+        assert admission.stats()["active"] == 1
+        return [""] * len(queries)
+    
+    async def fake_generate(messages, **kwargs):
+        peak["generating"] += 1
+        peak["max_generating"] = max(peak["max_generating"], peak["generating"])
+        peak["active"] = max(peak["active"], admission.stats()["active"])
+        await asyncio.sleep(0.01)
+        peak["generating"] -= 1
+        return "analysis"
+    
+    monkeypatch.setattr(llm_service, "aretrieve_contexts", fake_contexts)
+    monkeypatch.setattr(llm_service, "agenerate", fake_generate)
+    monkeypatch.setattr(llm_service, "BATCH_CONCURRENCY", 3)
+    
+    async def run():
+        await admission.acquire()
+        resumes = [f"Resume {i} for the admission test" for i in range(10)]
+        return [event async for event, _ in llm_service.batch_query(resumes, "Backend engineer", admission)]
+    
+    events = asyncio.run(run())
+    assert events == ["result"] * 10
+    assert peak["max_generating"] == 3
+    assert peak["active"] == 3
+    assert admission.stats()["active"] == 0
+
+
+def test_full_queue_sheds_immediately():
+    async def scenario():
+        admission = AdmissionController("analysis", max_concurrent=1, max_queue=1, queue_timeout=1.0, retry_after=3.0)
+        await admission.acquire()
+        queued = asyncio.ensure_future(admission.acquire())
+        await asyncio.sleep(0)
+        
+        started = time.monotonic()
+        with pytest.raises(OverloadedError) as shed:
+            await admission.acquire()
+        assert time.monotonic() - started < 0.05
+        assert shed.value.retry_after == 3.0
+        assert admission.stats()["rejected"] == 1
+        
+        admission.release()
+        await queued
+        admission.release()
+        assert admission.stats()["active"] == 0
+    
+    asyncio.run(scenario())
+
+
+def test_queue_wait_times_out():
+    async def scenario():
+        admission = AdmissionController("analysis", max_concurrent=1, max_queue=4, queue_timeout=0.05)
+        await admission.acquire()
+        with pytest.raises(OverloadedError):
+            await admission.acquire()
+        stats = admission.stats()
+        assert stats["timed_out"] == 1
+        assert stats["waiting"] == 0
+        
+        # The timed-out waiter must not be handed the released slot
+        admission.release()
+        assert admission.stats()["active"] == 0
+        await admission.acquire()
+        assert admission.stats()["active"] == 1
+    
+    asyncio.run(scenario())
+
+
+def test_released_slot_goes_to_the_oldest_waiter():
+    async def scenario():
+        admission = AdmissionController("analysis", max_concurrent=1, max_queue=4, queue_timeout=1.0)
+        await admission.acquire()
+        order = []
+        
+        async def request(name):
+            async with admission.slot():
+                order.append(name)
+        
+        tasks = []
+        for name in ("first", "second", "third"):
+            tasks.append(asyncio.ensure_future(request(name)))
+            await asyncio.sleep(0)
+        admission.release()
+        await asyncio.gather(*tasks)
+        assert order == ["first", "second", "third"]
+        assert admission.stats()["active"] == 0
+    
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_gives_up_its_place():
+    async def scenario():
+        admission = AdmissionController("analysis", max_concurrent=1, max_queue=4, queue_timeout=1.0)
+        await admission.acquire()
+        cancelled = asyncio.ensure_future(admission.acquire())
+        later = asyncio.ensure_future(admission.acquire())
+        await asyncio.sleep(0)
+        
+        cancelled.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+        admission.release()
+        await asyncio.wait_for(later, 0.5)
+        assert admission.stats()["active"] == 1
+        admission.release()
+        assert admission.stats()["active"] == 0
+    
+    asyncio.run(scenario())
+
+
+def test_slot_handed_over_as_the_waiter_cancels_is_returned():
+    async def scenario():
+        admission = AdmissionController("analysis", max_concurrent=1, max_queue=4, queue_timeout=1.0)
+        await admission.acquire()
+        waiter = asyncio.ensure_future(admission.acquire())
+        await asyncio.sleep(0)
+        
+        # release() resolves the waiter's future; cancel before it resumes.
+        # Either the caller keeps the slot (wait_for already had the
+        # result) or it is returned; it must never leak.
+        admission.release()
+        waiter.cancel()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            assert admission.stats()["active"] == 0
+        else:
+            assert admission.stats()["active"] == 1
+            admission.release()
+            assert admission.stats()["active"] == 0
+        assert admission.stats()["waiting"] == 0
+    
+    asyncio.run(scenario())
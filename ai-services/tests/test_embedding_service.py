@@ -0,0 +1,149 @@
+"""
+Embedding service tests: the two-tier cache, micro-batching, bounded
+batch encoding and one-time model loading.
+"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pytest
+from conftest import FakeEncoder
+from services.embedding_service import (
+    EMBED_ENCODE_BATCH_SIZE, EmbeddingBatcher, EmbeddingCache, agenerate_embedding, generate_embeddings, get_cache
+)
+
+
+def _vector(seed: int) -> list:
+    return np.random.default_rng(seed).standard_normal(8).astype(np.float32).tolist()
+
+
+def test_memory_hits_and_lru_eviction():
+    cache = EmbeddingCache(max_entries=2, path="")
+    cache.put_many({"a": _vector(1), "b": _vector(2)})
+    assert cache.get_memory("a") == _vector(1)
+    cache.put_many({"c": _vector(3)})
+    
+    found = cache.get_many(["a", "b", "c"])
+    assert set(found) == {"a", "c"}
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["memory_hits"] == 3 and stats["misses"] == 1
+
+
+def test_disk_tier_survives_restart(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite3")
+    EmbeddingCache(max_entries=10, path=path).put_many({"a": _vector(1), "b": _vector(2)})
+    
+    cache = EmbeddingCache(max_entries=10, path=path)
+    found = cache.get_many(["a", "b", "missing"])
+    assert found["a"] == pytest.approx(_vector(1))
+    assert found["b"] == pytest.approx(_vector(2))
+    assert cache.stats()["disk_hits"] == 2 and cache.stats()["misses"] == 1
+    
+    # Disk hits are promoted to memory
+    assert cache.get_memory("a") == pytest.approx(_vector(1))
+
+
+def test_disk_tier_is_pruned_oldest_first(tmp_path):
+    cache = EmbeddingCache(max_entries=10, path=str(tmp_path / "embeddings.sqlite3"), disk_max_entries=500)
+    for batch in range(3):
+        cache.put_many({f"{batch}-{i}": _vector(i) for i in range(400)})
+    
+    rows = cache._db.execute("SELECT key FROM embeddings").fetchall()
+    assert len(rows) == 500
+    assert not any(key.startswith("0-") for (key,) in rows)
+    plan = cache._db.execute("EXPLAIN QUERY PLAN SELECT key FROM embeddings ORDER BY created LIMIT 1").fetchall()
+    assert "embeddings_created" in str(plan)
+
+
+def test_key_ignores_whitespace_and_separates_models():
+    assert EmbeddingCache.key("Senior  Python\n Engineer ") == EmbeddingCache.key("Senior Python Engineer")
+    assert EmbeddingCache.key("text", "model-a") != EmbeddingCache.key("text", "model-b")
+
+
+def test_batcher_coalesces_concurrent_requests(fake_encoder):
+    async def scenario():
+        batcher = EmbeddingBatcher(max_batch_size=4, max_wait_ms=50)
+        texts = [f"batcher coalescing text {i}" for i in range(10)]
+        vectors = await asyncio.gather(*(batcher.embed(text) for text in texts))
+        return texts, vectors, batcher.stats()
+    
+    texts, vectors, stats = asyncio.run(scenario())
+    assert [len(batch) for batch, _ in fake_encoder.calls] == [4, 4, 2]
+    assert stats["batches"] == 3 and stats["max_batch_size"] == 4
+    # Every caller gets the vector of its own text
+    expected = FakeEncoder().encode(texts)
+    assert np.allclose(vectors, expected, atol=1e-6)
+
+
+def test_batcher_skips_cancelled_callers_and_shares_errors(fake_encoder, monkeypatch):
+    async def scenario():
+        batcher = EmbeddingBatcher(max_batch_size=8, max_wait_ms=30)
+        gone = asyncio.ensure_future(batcher.embed("batcher cancelled text"))
+        kept = asyncio.ensure_future(batcher.embed("batcher kept text"))
+        await asyncio.sleep(0)
+        gone.cancel()
+        await kept
+        encoded = [text for batch, _ in fake_encoder.calls for text in batch]
+        assert encoded == ["batcher kept text"]
+        
+        def broken(texts, batch_size=None):
+            raise RuntimeError("encoder crashed")
+        
+        monkeypatch.setattr(fake_encoder, "encode", broken)
+        outcomes = await asyncio.gather(
+            batcher.embed("batcher failing text 1"), batcher.embed("batcher failing text 2"),
+            return_exceptions=True
+        )
+        assert all(isinstance(outcome, RuntimeError) for outcome in outcomes)
+    
+    asyncio.run(scenario())
+
+
+def test_memory_cached_texts_skip_the_batcher(fake_encoder):
+    async def scenario():
+        first = await agenerate_embedding("batcher memory cached text")
+        calls = len(fake_encoder.calls)
+        assert await agenerate_embedding("batcher   memory cached text") == first
+        assert len(fake_encoder.calls) == calls
+    
+    asyncio.run(scenario())
+
+
+def test_generate_embeddings_bounds_the_encoder_batch(fake_encoder):
+    texts = [f"bounded batch text {i}" for i in range(150)] + ["bounded batch text 0"]
+    vectors = generate_embeddings(texts)
+    assert len(vectors) == 151 and vectors[0] == vectors[-1]
+    # Only the unique misses are encoded, EMBED_ENCODE_BATCH_SIZE at a time
+    (encoded, batch_size), = fake_encoder.calls
+    assert len(encoded) == 150
+    assert batch_size == EMBED_ENCODE_BATCH_SIZE == 64
+    
+    generate_embeddings(texts[:10])
+    assert len(fake_encoder.calls) == 1
+
+
+def test_generate_embeddings_without_cache(fake_encoder):
+    before = get_cache().stats()
+    texts = [f"uncached ingest chunk {i}" for i in range(3)]
+    assert generate_embeddings(texts, use_cache=False) == generate_embeddings(texts, use_cache=False)
+    assert len(fake_encoder.calls) == 2
+    assert get_cache().stats()["memory_entries"] == before["memory_entries"]
+
+
+def test_concurrent_first_callers_load_the_model_once(monkeypatch):
+    from services import embedding_service
+    loads = []
+    
+    def slow_load(*args):
+        loads.append(args)
+        time.sleep(0.05)
+        return FakeEncoder()
+    
+    monkeypatch.setattr(embedding_service, "_model", None)
+    monkeypatch.setattr(embedding_service, "load_backend", slow_load)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        models = list(pool.map(lambda _: embedding_service._get_model(), range(8)))
+    assert len(loads) == 1
+    assert all(model is models[0] for model in models)
@@ -0,0 +1,119 @@
+"""
+Groq client tests: model fallback and hedged requests in agenerate,
+run against the fake LLM server from the benchmarks.
+"""
+
+import asyncio
+import socket
+import pytest
+from groq import AsyncGroq
+from benchmarks import fake_llm_server
+from clients import groq_client
+from clients.groq_client import LLMStats, agenerate
+from utils.errors import LLMError
+
+PRIMARY = "primary-model"
+FALLBACK = "fallback-model"
+
+
+class ScriptedRandom:
+    """Replaces the fake server's random source with fixed draws, then 0.99 (no error, no slow tail)."""
+    
+    def __init__(self, draws: list):
+        self.draws = list(draws)
+    
+    def random(self) -> float:
+        return self.draws.pop(0) if self.draws else 0.99
+
+
+@pytest.fixture(scope="module")
+def fake_server():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    server = fake_llm_server.start_in_thread(port=port)
+    yield f"http://127.0.0.1:{port}"
+    server.should_exit = True
+
+
+@pytest.fixture
+def llm(fake_server, monkeypatch):
+    """Point agenerate at the fake server with a fresh stats window and a one-model fallback chain."""
+    monkeypatch.setattr(fake_llm_server, "LATENCY", 0.05)
+    monkeypatch.setattr(groq_client, "FALLBACK_MODELS", [FALLBACK])
+    monkeypatch.setattr(groq_client, "LLM_HEDGE", False)
+    monkeypatch.setattr(groq_client, "_stats", LLMStats())
+    monkeypatch.setattr(groq_client, "_async_client", AsyncGroq(api_key="test-key", base_url=fake_server, max_retries=0))
+    return groq_client._stats
+
+
+def test_agenerate_returns_the_completion(llm):
+    assert asyncio.run(agenerate("prompt", model=PRIMARY)) == fake_llm_server.COMPLETION
+    stats = llm.stats()
+    assert stats["attempts"] == 1 and stats["fallbacks"] == 0
+    assert stats["latency"][f"{PRIMARY}:2048"]["samples"] == 1
+
+
+def test_agenerate_falls_back_on_server_errors(llm, monkeypatch):
+    monkeypatch.setattr(fake_llm_server, "FAILING_MODELS", {PRIMARY})
+    assert asyncio.run(agenerate("prompt", model=PRIMARY)) == fake_llm_server.COMPLETION
+    stats = llm.stats()
+    assert stats["attempts"] == 2 and stats["failures"] == 1 and stats["fallbacks"] == 1
+    assert list(stats["latency"]) == [f"{FALLBACK}:2048"]
+
+
+def test_agenerate_raises_when_every_model_fails(llm, monkeypatch):
+    monkeypatch.setattr(fake_llm_server, "FAILING_MODELS", {PRIMARY, FALLBACK})
+    with pytest.raises(LLMError) as error:
+        asyncio.run(agenerate("prompt", model=PRIMARY))
+    assert PRIMARY in str(error.value) and FALLBACK in str(error.value)
+    assert llm.stats()["failures"] == 2
+
+
+def test_agenerate_does_not_fall_back_on_client_errors(llm, monkeypatch):
+    monkeypatch.setattr(fake_llm_server, "FAILING_MODELS", {PRIMARY})
+    monkeypatch.setattr(fake_llm_server, "ERROR_STATUS", 400)
+    with pytest.raises(LLMError) as error:
+        asyncio.run(agenerate("prompt", model=PRIMARY))
+    assert FALLBACK not in str(error.value)
+    assert llm.stats()["fallbacks"] == 0
+
+
+def test_agenerate_gives_up_at_the_deadline(llm, monkeypatch):
+    monkeypatch.setattr(fake_llm_server, "LATENCY", 2.0)
+    monkeypatch.setattr(groq_client, "LLM_TIMEOUT", 0.3)
+    with pytest.raises(LLMError) as error:
+        asyncio.run(agenerate("prompt", model=PRIMARY))
+    assert "deadline exceeded" in str(error.value)
+
+
+def test_slow_attempt_is_hedged(llm, monkeypatch):
+    monkeypatch.setattr(groq_client, "LLM_HEDGE", True)
+    monkeypatch.setattr(groq_client, "HEDGE_MIN_DELAY", 0.1)
+    for _ in range(groq_client.HEDGE_MIN_SAMPLES):
+        llm.record(PRIMARY, 2048, 0.05)
+    # First request: no injected error, slow tail; the hedge is fast
+    monkeypatch.setattr(fake_llm_server, "SLOW_RATE", 0.5)
+    monkeypatch.setattr(fake_llm_server, "SLOW_LATENCY", 5.0)
+    monkeypatch.setattr(fake_llm_server, "random", ScriptedRandom([0.99, 0.0]))
+    
+    async def timed():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        result = await agenerate("prompt", model=PRIMARY)
+        return result, loop.time() - started
+    
+    result, elapsed = asyncio.run(timed())
+    assert result == fake_llm_server.COMPLETION
+    assert elapsed < 2.0
+    stats = llm.stats()
+    assert stats["hedges"] == 1 and stats["hedge_wins"] == 1 and stats["fallbacks"] == 0
+
+
+def test_fast_attempt_is_not_hedged(llm, monkeypatch):
+    monkeypatch.setattr(groq_client, "LLM_HEDGE", True)
+    monkeypatch.setattr(groq_client, "HEDGE_MIN_DELAY", 0.5)
+    for _ in range(groq_client.HEDGE_MIN_SAMPLES):
+        llm.record(PRIMARY, 2048, 0.05)
+    assert asyncio.run(agenerate("prompt", model=PRIMARY)) == fake_llm_server.COMPLETION
+    assert llm.stats()["hedges"] == 0
@@ -0,0 +1,54 @@
+"""
+Ingestion tests: interrupted runs resumed from a checkpoint must still
+publish what the interrupted run wrote.
+"""
+
+import pytest
+import ingest
+from services.rag_service import get_store
+from services.vector_index import VECTOR_INDEX_PATH, NumpyStore, read_current_version
+
+
+def _docs(text: str) -> list[dict]:
+    return [{"id": f"doc-{i}", "text": f"{text} {i}"} for i in range(5)]
+
+
+def test_resume_after_crash_bumps_version_and_exports(fake_encoder, monkeypatch, tmp_path):
+    monkeypatch.setattr(ingest, "VECTOR_BACKEND", "numpy")
+    store = get_store()
+    checkpoint = str(tmp_path / "checkpoint.json")
+    
+    ingest.ingest_stream(_docs("old text"), collection_name="resume_test", batch_size=2)
+    published = store.version
+    assert read_current_version(VECTOR_INDEX_PATH) == published
+    
+    def crash():
+        raise RuntimeError("killed before the version bump")
+    
+    # The changed chunks are upserted, then the run dies before publishing
+    with monkeypatch.context() as patch:
+        patch.setattr(store, "bump_version", crash)
+        with pytest.raises(RuntimeError):
+            ingest.ingest_stream(_docs("new text"), collection_name="resume_test",
+                                 batch_size=2, checkpoint_path=checkpoint)
+    assert store.version == published
+    
+    # Everything now looks unchanged to the resumed run, but it must publish
+    summary = ingest.ingest_stream(_docs("new text"), collection_name="resume_test",
+                                   batch_size=2, checkpoint_path=checkpoint)
+    assert summary["added"] == summary["updated"] == 0
+    assert store.version == published + 1
+    assert read_current_version(VECTOR_INDEX_PATH) == store.version
+    
+    collection = NumpyStore(VECTOR_INDEX_PATH).get_collection("resume_test")
+    assert sorted(collection.documents[row] for row in range(collection.count())) == [
+        f"new text {i}" for i in range(5)
+    ]
+    assert not (tmp_path / "checkpoint.json").exists()
+
+
+def test_legacy_checkpoint_counts_as_dirty(tmp_path):
+    path = tmp_path / "checkpoint.json"
+    path.write_text('{"kb::default": 3}')
+    assert ingest._load_checkpoint(str(path), "kb::default") == (3, True)
+    assert ingest._load_checkpoint(str(path), "other::default") == (0, False)
@@ -0,0 +1,145 @@
+"""
+Retrieval tests: query chunking and hit fusion, the retrieval cache and
+its invalidation on ingest, and store reloads that stay off the event loop.
+"""
+
+import asyncio
+import threading
+from conftest import FakeEncoder
+from services import rag_service
+from services.rag_service import ChromaStore, RetrievalCache, _fuse, aget_collection, retrieve_context, split_query
+
+
+def _paragraphs(prefix: str, count: int) -> list[str]:
+    return [f"{prefix} section {i}: " + "experience with distributed systems. " * 22 for i in range(count)]
+
+
+def test_split_query_alternates_resume_and_jd_chunks():
+    resume = _paragraphs("resume", 3)
+    jd = _paragraphs("jd", 2)
+    chunks = split_query("\n\n".join(resume), "\n\n".join(jd))
+    assert [chunk.split(":")[0] for chunk in chunks] == [
+        "resume section 0", "jd section 0", "resume section 1", "jd section 1", "resume section 2"
+    ]
+    assert all(len(chunk) <= rag_service.QUERY_CHUNK_CHARS for chunk in chunks)
+
+
+def test_split_query_caps_and_dedupes_chunks():
+    resume = "\n\n".join(_paragraphs("resume", 6))
+    capped = split_query(resume, "\n\n".join(_paragraphs("jd", 6)), max_chunks=4)
+    assert [chunk.split(":")[0] for chunk in capped] == ["resume section 0", "jd section 0", "resume section 1", "jd section 1"]
+    
+    # The same text on both sides is searched once
+    assert split_query("Python engineer", "Python engineer") == ["Python engineer"]
+    assert split_query("", "   ") == []
+
+
+def test_fuse_keeps_each_document_once_at_its_best_distance():
+    results = {
+        "ids": [["a", "b", "c"], ["b", "d", "a"], ["e", "f", "g"]],
+        "documents": [["A", "B", "C"], ["B", "D", "A"], ["E", "F", "G"]],
+        "distances": [[0.30, 0.50, 0.70], [0.10, 0.40, 0.90], [0.05, 0.06, 0.07]]
+    }
+    # Only the rows of this query's chunks are fused
+    assert _fuse(results, [0, 1], top_k=3) == ["B", "A", "D"]
+    assert _fuse(results, [0, 1], top_k=10) == ["B", "A", "D", "C"]
+    assert _fuse(results, [2], top_k=2) == ["E", "F"]
+
+
+def test_retrieval_cache_is_dropped_when_the_version_changes():
+    cache = RetrievalCache(max_entries=8)
+    assert cache.get("q", 1) is None
+    cache.put("q", "context v1", 1)
+    assert cache.get("q", 1) == "context v1"
+    
+    # The first lookup at a newer version empties the cache
+    assert cache.get("q", 2) is None
+    stats = cache.stats()
+    assert stats["entries"] == 0 and stats["version"] == 2 and stats["invalidations"] == 1
+    
+    # A retrieval that started before the ingest is not stored
+    cache.put("q", "context v1", 1)
+    assert cache.get("q", 2) is None
+    cache.put("q", "context v2", 2)
+    assert cache.get("q", 2) == "context v2"
+    assert cache.stats()["hits"] == 2
+
+
+def test_retrieval_cache_evicts_least_recently_used():
+    cache = RetrievalCache(max_entries=2)
+    cache.get("a", 1)
+    cache.put("a", "A", 1)
+    cache.put("b", "B", 1)
+    assert cache.get("a", 1) == "A"
+    cache.put("c", "C", 1)
+    assert cache.get("b", 1) is None
+    assert cache.get("a", 1) == "A" and cache.get("c", 1) == "C"
+    
+    disabled = RetrievalCache(max_entries=0)
+    disabled.get("a", 1)
+    disabled.put("a", "A", 1)
+    assert disabled.get("a", 1) is None
+
+
+def test_ingest_invalidates_cached_retrievals(tmp_path, monkeypatch, fake_encoder):
+    monkeypatch.setattr(rag_service, "VERSION_CHECK_INTERVAL", 0.0)
+    reader = ChromaStore(str(tmp_path))
+    writer = ChromaStore(str(tmp_path))
+    monkeypatch.setattr(rag_service, "get_vector_store", lambda: reader)
+    monkeypatch.setattr(rag_service, "_retrieval_cache", RetrievalCache())
+    vector = FakeEncoder().encode(["anything"])[0].tolist()
+    writer.get_or_create_collection("knowledge").add(ids=["a"], embeddings=[vector], documents=["old"])
+    writer.bump_version()
+    
+    assert retrieve_context("system design", "knowledge", top_k=1) == "old"
+    assert retrieve_context("system design", "knowledge", top_k=1) == "old"
+    assert rag_service.get_retrieval_cache().stats()["hits"] == 1
+    
+    collection = writer.get_or_create_collection("knowledge")
+    collection.delete(ids=["a"])
+    collection.add(ids=["b"], embeddings=[vector], documents=["new"])
+    writer.bump_version()
+    
+    assert retrieve_context("system design", "knowledge", top_k=1) == "new"
+    assert rag_service.get_retrieval_cache().stats()["invalidations"] == 1
+
+
+def test_reload_after_ingest_runs_off_the_event_loop(tmp_path, monkeypatch):
+    monkeypatch.setattr(rag_service, "VERSION_CHECK_INTERVAL", 0.0)
+    reader = ChromaStore(str(tmp_path))
+    writer = ChromaStore(str(tmp_path))
+    writer.get_or_create_collection("knowledge").add(ids=["a"], embeddings=[[1.0, 0.0]], documents=["old"])
+    writer.bump_version()
+    assert reader.get_collection("knowledge") is not None
+    
+    reload_threads = []
+    reload = reader._maybe_reload
+    
+    def tracked_reload():
+        reload_threads.append(threading.current_thread())
+        reload()
+    
+    monkeypatch.setattr(reader, "_maybe_reload", tracked_reload)
+    previous_client = reader.open()
+    writer.bump_version()
+    
+    async def lookup():
+        return threading.current_thread(), await aget_collection(reader, "knowledge")
+    
+    loop_thread, collection = asyncio.run(lookup())
+    assert reload_threads and loop_thread not in reload_threads
+    assert reader.version == writer.version
+    assert reader.open() is not previous_client
+    assert collection.query(query_embeddings=[[1.0, 0.0]], n_results=1)["documents"] == [["old"]]
+
+
+def test_cached_collection_skips_the_thread_hop(tmp_path, monkeypatch):
+    monkeypatch.setattr(rag_service, "VERSION_CHECK_INTERVAL", 3600.0)
+    store = ChromaStore(str(tmp_path))
+    handle = store.get_or_create_collection("knowledge")
+    
+    def fail(*args, **kwargs):
+        raise AssertionError("cached lookup went through a worker thread")
+    
+    monkeypatch.setattr(asyncio, "to_thread", fail)
+    assert asyncio.run(aget_collection(store, "knowledge")) is handle
@@ -0,0 +1,99 @@
+"""
+Rate limiter tests: grant order, quota refunds and the 429 pause.
+"""
+
+import asyncio
+import time
+import pytest
+from clients.rate_limiter import PRIORITY_BATCH, PRIORITY_INTERACTIVE, PRIORITY_STANDARD, RateLimiter
+
+
+def test_penalize_pauses_grants_then_serves_by_priority():
+    async def scenario():
+        limiter = RateLimiter(rpm=0, tpm=0)
+        await limiter.acquire(10)
+        limiter.penalize(0.2)
+        started = time.monotonic()
+        order = []
+        
+        async def request(name, priority):
+            await limiter.acquire(10, priority)
+            order.append((name, time.monotonic() - started))
+        
+        await asyncio.gather(
+            request("batch", PRIORITY_BATCH),
+            request("standard", PRIORITY_STANDARD),
+            request("interactive", PRIORITY_INTERACTIVE),
+            request("interactive-2", PRIORITY_INTERACTIVE)
+        )
+        assert [name for name, _ in order] == ["interactive", "interactive-2", "standard", "batch"]
+        assert min(elapsed for _, elapsed in order) >= 0.19
+        assert limiter.stats()["throttled_429"] == 1
+    
+    asyncio.run(scenario())
+
+
+def test_token_bucket_orders_waiters_by_priority():
+    async def scenario():
+        # 600 tokens/minute = 10 per second; the first grant empties it
+        limiter = RateLimiter(rpm=0, tpm=600)
+        await limiter.acquire(600)
+        order = []
+        
+        async def request(name, priority):
+            await limiter.acquire(2, priority)
+            order.append(name)
+        
+        tasks = [asyncio.ensure_future(request("batch", PRIORITY_BATCH))]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.ensure_future(request("interactive", PRIORITY_INTERACTIVE)))
+        await asyncio.gather(*tasks)
+        assert order == ["interactive", "batch"]
+    
+    asyncio.run(scenario())
+
+
+def test_settle_refunds_overestimates():
+    async def scenario():
+        limiter = RateLimiter(rpm=0, tpm=1000)
+        reserved = await limiter.acquire(800)
+        assert limiter.stats()["tokens_available"] == pytest.approx(200, abs=2)
+        limiter.settle(reserved, 300)
+        assert limiter.stats()["tokens_available"] == pytest.approx(700, abs=2)
+    
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_takes_no_quota():
+    async def scenario():
+        limiter = RateLimiter(rpm=0, tpm=1000)
+        await limiter.acquire(900)
+        waiter = asyncio.ensure_future(limiter.acquire(500))
+        await asyncio.sleep(0.01)
+        assert limiter.stats()["queue_depth"] == 1
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert limiter.stats()["queue_depth"] == 0
+        # The next request is served from the remaining quota at once
+        assert await asyncio.wait_for(limiter.acquire(50), 0.5) == 50
+    
+    asyncio.run(scenario())
+
+
+def test_grant_racing_a_cancel_is_refunded():
+    async def scenario():
+        limiter = RateLimiter(rpm=10, tpm=1000)
+        waiter = asyncio.ensure_future(limiter.acquire(400))
+        while not limiter.stats()["granted"]:
+            await asyncio.sleep(0)
+        # Granted, but the caller has not resumed yet: cancel it now
+        assert not waiter.done()
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        stats = limiter.stats()
+        assert stats["tokens_available"] == pytest.approx(1000, abs=2)
+        assert stats["requests_available"] == pytest.approx(10, abs=0.1)
+    
+    asyncio.run(scenario())
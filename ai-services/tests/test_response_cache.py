@@ -0,0 +1,87 @@
+"""
+Response cache tests: single-flight coalescing and what gets stored.
+"""
+
+import asyncio
+import pytest
+from services.response_cache import ResponseCache, response_key
+
+
+def test_identical_concurrent_requests_share_one_computation():
+    async def scenario():
+        cache = ResponseCache(ttl=60, max_entries=10)
+        calls = 0
+        
+        async def compute():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.02)
+            return "analysis"
+        
+        results = await asyncio.gather(*(cache.get_or_compute("key", compute) for _ in range(5)))
+        assert results == ["analysis"] * 5
+        assert calls == 1
+        assert cache.stats()["coalesced"] == 4
+        assert await cache.get_or_compute("key", compute) == "analysis"
+        assert calls == 1
+        assert cache.stats()["hits"] == 1
+    
+    asyncio.run(scenario())
+
+
+def test_result_is_cached_when_the_first_caller_goes_away():
+    async def scenario():
+        cache = ResponseCache(ttl=60, max_entries=10)
+        
+        async def compute():
+            await asyncio.sleep(0.05)
+            return "analysis"
+        
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(cache.get_or_compute("key", compute), 0.01)
+        await asyncio.sleep(0.08)
+        assert cache.get("key") == "analysis"
+    
+    asyncio.run(scenario())
+
+
+def test_failures_and_uncacheable_results_are_not_stored():
+    async def scenario():
+        cache = ResponseCache(ttl=60, max_entries=10)
+        
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("provider down")
+        
+        outcomes = await asyncio.gather(*(cache.get_or_compute("bad", fail) for _ in range(3)), return_exceptions=True)
+        assert all(isinstance(outcome, RuntimeError) for outcome in outcomes)
+        assert cache.get("bad") is None
+        assert cache.stats()["in_flight"] == 0
+        
+        async def degraded():
+            return "partial"
+        
+        assert await cache.get_or_compute("partial", degraded, cacheable=lambda value: False) == "partial"
+        assert cache.get("partial") is None
+    
+    asyncio.run(scenario())
+
+
+def test_entries_expire_and_are_evicted_lru():
+    cache = ResponseCache(ttl=60, max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    
+    expired = ResponseCache(ttl=-1, max_entries=2)
+    expired._entries["a"] = (0.0, 1)
+    assert expired.get("a") is None
+
+
+def test_response_key_separates_fields():
+    assert response_key("ab", "c", None, "m", "v1") != response_key("a", "bc", None, "m", "v1")
+    assert response_key("a", "b", None, "m", "v1") != response_key("a", "b", None, "m", "v2")
+    assert response_key("a", "b", None, "m", "v1") == response_key("a", "b", "", "m", "v1")
@@ -0,0 +1,98 @@
+"""
+Company info cache tests: single-flight scrapes, late results and the
+SQLite tier.
+"""
+
+import asyncio
+from services.scraper_service import CompanyInfoCache, _get_default_info
+
+INFO = {"process": "Three rounds", "rounds": "Coding, design", "questions": "Why us?", "tips": "Be concise"}
+
+
+def test_concurrent_lookups_share_one_scrape():
+    async def scenario():
+        cache = CompanyInfoCache(path="")
+        calls = []
+        
+        async def fetch(company_name):
+            calls.append(company_name)
+            await asyncio.sleep(0.02)
+            return dict(INFO)
+        
+        results = await asyncio.gather(*(
+            cache.get(name, fetch) for name in ("Acme Corp", "acme  corp", "ACME CORP", "Acme Corp")
+        ))
+        assert results == [INFO] * 4
+        assert len(calls) == 1
+        assert cache.stats()["coalesced"] == 3
+        
+        # Callers get copies: mutating one does not change the cache
+        results[0]["tips"] = "changed"
+        assert await cache.get("Acme Corp", fetch) == INFO
+        assert len(calls) == 1
+    
+    asyncio.run(scenario())
+
+
+def test_scrape_finishing_after_the_deadline_is_cached(tmp_path):
+    async def scenario():
+        path = str(tmp_path / "company.sqlite3")
+        cache = CompanyInfoCache(path=path)
+        calls = 0
+        
+        async def slow_fetch(company_name):
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.05)
+            return dict(INFO)
+        
+        try:
+            await asyncio.wait_for(cache.get("Acme", slow_fetch), 0.01)
+        except asyncio.TimeoutError:
+            pass
+        await asyncio.sleep(0.1)
+        assert await cache.get("Acme", slow_fetch) == INFO
+        assert calls == 1
+        
+        # The SQLite tier serves a fresh process without scraping
+        assert await CompanyInfoCache(path=path).get("Acme", slow_fetch) == INFO
+        assert calls == 1
+    
+    asyncio.run(scenario())
+
+
+def test_failed_scrapes_use_the_short_negative_ttl():
+    async def scenario():
+        cache = CompanyInfoCache(ttl=3600, negative_ttl=0, path="")
+        calls = 0
+        
+        async def fetch_nothing(company_name):
+            nonlocal calls
+            calls += 1
+            return _get_default_info()
+        
+        await cache.get("Unknown Co", fetch_nothing)
+        await asyncio.sleep(0.01)
+        await cache.get("Unknown Co", fetch_nothing)
+        assert calls == 2
+    
+    asyncio.run(scenario())
+
+
+def test_errors_are_shared_but_not_cached():
+    async def scenario():
+        cache = CompanyInfoCache(path="")
+        calls = 0
+        
+        async def broken(company_name):
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            raise RuntimeError("search page changed")
+        
+        outcomes = await asyncio.gather(cache.get("Acme", broken), cache.get("Acme", broken), return_exceptions=True)
+        assert all(isinstance(outcome, RuntimeError) for outcome in outcomes)
+        assert calls == 1
+        assert cache.stats()["entries"] == 0 and cache.stats()["in_flight"] == 0
+    
+    asyncio.run(scenario())
@@ -0,0 +1,23 @@
+"""
+Startup smoke test: the lifespan warm-up must finish and /ready must
+report ready while the health endpoint keeps answering.
+"""
+
+import time
+from fastapi.testclient import TestClient
+
+
+def test_lifespan_warm_up_reports_ready(fake_encoder):
+    import app
+    
+    with TestClient(app.app) as client:
+        assert client.get("/").status_code == 200
+        deadline = time.monotonic() + 30
+        response = client.get("/ready")
+        while response.status_code != 200 and time.monotonic() < deadline:
+            time.sleep(0.1)
+            response = client.get("/ready")
+        
+        assert response.status_code == 200, response.json()
+        assert response.json()["ready"] is True
+        assert client.get("/").json()["ready"] is True
@@ -0,0 +1,147 @@
+"""
+Token budget tests: prompts are trimmed in priority order and never
+exceed the model's input-token budget.
+"""
+
+import os
+import tempfile
+import pytest
+from prompts import token_budget
+from prompts.system_prompt import build_session_messages
+from prompts.token_budget import (
+    _template_tokens, build_budgeted_messages, build_budgeted_session_messages,
+    count_message_tokens, count_tokens, truncate_tokens
+)
+
+
+def _session(**overrides) -> dict:
+    session = {
+        "id": "s1",
+        "resume_text": "Python engineer. " * 200,
+        "job_description": "Backend role. " * 100,
+        "retrieved_context": "Interview tip. " * 300,
+        "summary": "Earlier we discussed system design. " * 50,
+        "last_question": "What about caching?",
+        "last_output": "Use a read-through cache. " * 200,
+        "turns": 2,
+        "updated": 0.0
+    }
+    session.update(overrides)
+    return session
+
+
+def test_session_fits_budget_as_is(monkeypatch):
+    monkeypatch.setenv("PROMPT_TOKEN_BUDGET", "100000")
+    session = _session()
+    messages, tokens = build_budgeted_session_messages(session, "How do I prepare?")
+    assert tokens <= 100000
+    assert session["retrieved_context"] in messages[1]["content"]
+    assert session["last_output"] in messages[1]["content"]
+
+
+def test_session_long_question_is_capped(monkeypatch):
+    monkeypatch.setenv("PROMPT_TOKEN_BUDGET", "2000")
+    question = "Please explain in detail how to answer behavioral questions. " * 800
+    last_question = "And how about the coding round? " * 400
+    messages, tokens = build_budgeted_session_messages(_session(last_question=last_question), question)
+    assert tokens <= 2000
+    assert count_tokens(messages[1]["content"]) < count_tokens(question)
+
+
+def test_session_trims_context_before_conversation(monkeypatch):
+    session = _session()
+    monkeypatch.setenv("PROMPT_TOKEN_BUDGET", "100000")
+    _, full = build_budgeted_session_messages(session, "Next?")
+    
+    # Just over budget: only the retrieved context has to shrink
+    monkeypatch.setenv("PROMPT_TOKEN_BUDGET", str(full - 50))
+    messages, tokens = build_budgeted_session_messages(session, "Next?")
+    assert tokens <= full - 50
+    assert session["retrieved_context"] not in messages[1]["content"]
+    assert session["summary"] in messages[1]["content"]
+    assert session["last_output"] in messages[1]["content"]
+    assert session["resume_text"] in messages[1]["content"]
+
+
+@pytest.fixture
+def bpe_tokenizer(monkeypatch):
+    """A small byte-level BPE tokenizer (same model family as Llama 3's)."""
+    from tokenizers import Tokenizer, decoders, models, pre_tokenizers, trainers
+    tokenizer = Tokenizer(models.BPE())
+    tokenizer.pre_tokenizer = pre_tokenizers.ByteLevel(add_prefix_space=False)
+    tokenizer.decoder = decoders.ByteLevel()
+    corpus = [_session()[name] for name in ("resume_text", "job_description", "retrieved_context", "last_output")]
+    tokenizer.train_from_iterator(corpus, trainers.BpeTrainer(
+        vocab_size=400, initial_alphabet=pre_tokenizers.ByteLevel.alphabet()
+    ))
+    path = os.path.join(tempfile.mkdtemp(), "tokenizer.json")
+    tokenizer.save(path)
+    monkeypatch.setattr(token_budget, "_tokenizer", token_budget._HFTokenizer(path))
+    monkeypatch.setattr(token_budget, "_tokenizer_loaded", True)
+    _template_tokens.cache_clear()
+    yield
+    _template_tokens.cache_clear()
+
+
+def test_truncate_tokens_cuts_at_token_offsets(bpe_tokenizer):
+    text = "Distributed systems and caching, résumé review. " * 20
+    head = truncate_tokens(text, 10)
+    tail = truncate_tokens(text, 10, keep_end=True)
+    assert text.startswith(head) and text.endswith(tail)
+    assert count_tokens(head) <= 10 and count_tokens(tail) <= 10
+    assert truncate_tokens(text, 10_000) == text
+
+
+def test_analysis_trims_in_priority_order(bpe_tokenizer, monkeypatch):
+    session = _session()
+    company = {"process": "Three rounds. " * 50, "rounds": "Coding, design. " * 50,
+               "questions": "Tell me about yourself. " * 50, "tips": "Be concise. " * 50}
+    args = dict(resume_text=session["resume_text"], job_description=session["job_description"],
+                retrieved_context=session["retrieved_context"], company_info=company)
+    monkeypatch.setenv("PROMPT_TOKEN_BUDGET", "100000")
+    _, full = build_budgeted_messages(**args)
+    context = count_tokens(session["retrieved_context"])
+    
+    # Over by less than the retrieved context: nothing else is touched
+    monkeypatch.setenv("PROMPT_TOKEN_BUDGET", str(full - context // 2))
+    messages, tokens = build_budgeted_messages(**args)
+    content = messages[1]["content"]
+    assert tokens <= full - context // 2
+    assert session["retrieved_context"] not in content
+    assert company["tips"] in content and session["resume_text"] in content
+    
+    # Over by more than the context: company snippets go next, core stays
+    monkeypatch.setenv("PROMPT_TOKEN_BUDGET", str(full - context - 20))
+    messages, tokens = build_budgeted_messages(**args)
+    content = messages[1]["content"]
+    assert tokens <= full - context - 20
+    assert not all(value in content for value in company.values())
+    assert session["resume_text"] in content and session["job_description"] in content
+
+
+@pytest.mark.parametrize("room", [40, 500, 2000, 6000])
+def test_continuation_never_exceeds_budget(bpe_tokenizer, monkeypatch, room):
+    # Continuations repeat the job description, so its cut is split
+    # across two copies; rounding must not push the prompt over budget
+    budget = _template_tokens(False, True) + room
+    monkeypatch.setenv("PROMPT_TOKEN_BUDGET", str(budget))
+    session = _session()
+    messages, tokens = build_budgeted_messages(
+        resume_text=session["resume_text"] * 3,
+        job_description=session["job_description"] * 7,
+        retrieved_context=session["retrieved_context"],
+        previous_output=session["last_output"] * 3
+    )
+    assert tokens == count_message_tokens(messages)
+    assert tokens <= budget
+
+
+@pytest.mark.parametrize("room", [40, 2000, 6000])
+def test_session_never_exceeds_budget(bpe_tokenizer, monkeypatch, room):
+    question = "How should I explain the caching trade-offs? " * 600
+    shape = dict.fromkeys(("resume_text", "job_description", "retrieved_context", "summary", "last_output", "question"), "")
+    budget = count_message_tokens(build_session_messages(**shape, last_question="-")) + room
+    monkeypatch.setenv("PROMPT_TOKEN_BUDGET", str(budget))
+    messages, tokens = build_budgeted_session_messages(_session(), question)
+    assert tokens == count_message_tokens(messages)
+    assert tokens <= budget
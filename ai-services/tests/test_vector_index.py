@@ -0,0 +1,28 @@
+"""
+NumPy vector index tests: exact search and callers' arrays left untouched.
+"""
+
+import numpy as np
+import pytest
+from services.vector_index import NumpyCollection, write_collection
+
+
+@pytest.mark.parametrize("dtype", ["float16", "float32"])
+def test_query_ranks_by_cosine_similarity(tmp_path, dtype):
+    write_collection(str(tmp_path), ["x", "y", "xy"], [[2.0, 0.0], [0.0, 3.0], [1.0, 1.0]], ["X", "Y", "XY"], dtype=dtype)
+    collection = NumpyCollection(str(tmp_path))
+    results = collection.query([[4.0, 0.5]], n_results=2)
+    assert results["ids"] == [["x", "xy"]]
+    assert results["documents"] == [["X", "XY"]]
+    assert results["distances"][0][0] == pytest.approx(1 - 4.0 / np.hypot(4.0, 0.5), abs=1e-3)
+
+
+def test_query_and_write_do_not_modify_the_callers_vectors(tmp_path):
+    embeddings = np.array([[3.0, 4.0], [0.0, 2.0]], dtype=np.float32)
+    write_collection(str(tmp_path), ["a", "b"], embeddings, ["A", "B"])
+    np.testing.assert_array_equal(embeddings, [[3.0, 4.0], [0.0, 2.0]])
+    
+    queries = np.array([[0.0, 5.0], [6.0, 8.0]], dtype=np.float32)
+    results = NumpyCollection(str(tmp_path)).query(queries, n_results=1)
+    np.testing.assert_array_equal(queries, [[0.0, 5.0], [6.0, 8.0]])
+    assert results["ids"] == [["b"], ["a"]]
@@ -0,0 +1,48 @@
+"""
+Chunking Utilities
+
+Splits long text into pieces the embedding model sees in full. Shared
+by ingestion (documents) and retrieval (resume and job description
+queries), so both sides are embedded at the same granularity.
+"""
+
+# MiniLM truncates at 256 word pieces (roughly 1000 characters)
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 150
+
+
+def chunk_text(text: str, chunk_size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP) -> list[str]:
+    """
+    Split text into overlapping chunks, preferring paragraph, line and
+    sentence boundaries.
+    
+    Args:
+        text: Document text
+        chunk_size: Maximum characters per chunk
+        overlap: Characters repeated between consecutive chunks
+        
+    Returns:
+        List of chunk strings (a single chunk for short texts)
+    """
+    text = text.strip()
+    if len(text) <= chunk_size:
+        return [text] if text else []
+    
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(start + chunk_size, len(text))
+        if end < len(text):
+            window = text[start:end]
+            for sep in ("\n\n", "\n", ". ", " "):
+                cut = window.rfind(sep)
+                if cut > chunk_size // 2:
+                    end = start + cut + len(sep)
+                    break
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append(chunk)
+        if end >= len(text):
+            break
+        start = max(end - overlap, start + 1)
+    return chunks
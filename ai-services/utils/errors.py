@@ -15,6 +15,27 @@ class LLMError(AIServiceError):
     pass
 
 
+class LLMRateLimitError(LLMError):
+    """Exception when the LLM provider's rate limit could not be met in time."""
+    
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class OverloadedError(AIServiceError):
+    """Exception when a request is shed because the service is at capacity."""
+    
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class SessionNotFoundError(AIServiceError):
+    """Exception when a follow-up names an unknown or expired session."""
+    pass
+
+
 class RAGError(AIServiceError):
     """Exception for RAG retrieval errors."""
     pass
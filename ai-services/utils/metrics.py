@@ -0,0 +1,150 @@
+"""
+Metrics Utilities
+
+Prometheus metrics for the request pipeline. The hot path only observes
+histograms and increments counters; counters that components already
+keep for the health endpoint are read through collectors when /metrics
+is scraped, so they cost nothing per request.
+"""
+
+import time
+from typing import Callable, Iterable, Optional
+from prometheus_client import Counter, Gauge, Histogram, REGISTRY
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+# Seconds; spans cache hits (ms) to full generations (tens of seconds)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+STAGE_LATENCY = Histogram(
+    "neuraflow_stage_duration_seconds",
+    "Latency of each pipeline stage",
+    ["stage"], buckets=LATENCY_BUCKETS
+)
+STAGE_SKIPS = Counter(
+    "neuraflow_stage_skipped_total",
+    "Pipeline stages skipped after overrunning their deadline",
+    ["stage"]
+)
+REQUEST_LATENCY = Histogram(
+    "neuraflow_request_duration_seconds",
+    "End-to-end HTTP request latency, including streamed bodies",
+    ["endpoint"], buckets=LATENCY_BUCKETS
+)
+REQUESTS = Counter(
+    "neuraflow_requests_total",
+    "HTTP requests by endpoint and status code",
+    ["endpoint", "status"]
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "neuraflow_requests_in_flight",
+    "HTTP requests currently being processed",
+    ["endpoint"]
+)
+LLM_TOKENS = Counter(
+    "neuraflow_llm_tokens_total",
+    "LLM tokens by model and kind (prompt/completion); streams are estimated",
+    ["model", "kind"]
+)
+LLM_ERRORS = Counter(
+    "neuraflow_llm_errors_total",
+    "Failed LLM attempts by model and error type",
+    ["model", "type"]
+)
+SCRAPES = Counter(
+    "neuraflow_scrapes_total",
+    "Company scrape outcomes (cache misses only)",
+    ["outcome"]
+)
+COLD_START = Gauge(
+    "neuraflow_cold_start_seconds",
+    "Startup time by warm-up phase; phase=\"total\" is process import to ready",
+    ["phase"]
+)
+ERRORS = Counter(
+    "neuraflow_errors_total",
+    "Errors returned to clients by type",
+    ["type"]
+)
+
+
+def observe_stage(stage: str):
+    """Context manager timing one pipeline stage."""
+    return STAGE_LATENCY.labels(stage).time()
+
+
+class StatsCollector:
+    """
+    Exports a component's stats() dict at scrape time.
+    
+    If label is set, stats() returns a mapping of label value to stats
+    dict (e.g. one entry per model). Keys missing or None are skipped.
+    """
+    
+    def __init__(self, name: str, stats: Callable[[], dict], counters: Iterable[str] = (),
+                 gauges: Iterable[str] = (), label: Optional[str] = None):
+        self.name = name
+        self.stats = stats
+        self.counters = tuple(counters)
+        self.gauges = tuple(gauges)
+        self.label = label
+    
+    def collect(self):
+        stats = self.stats()
+        rows = stats.items() if self.label else [(None, stats)]
+        labels = [self.label] if self.label else []
+        families = {}
+        for key in self.counters:
+            families[key] = CounterMetricFamily(f"neuraflow_{self.name}_{key}", f"{self.name} {key}", labels=labels)
+        for key in self.gauges:
+            families[key] = GaugeMetricFamily(f"neuraflow_{self.name}_{key}", f"{self.name} {key}", labels=labels)
+        for label_value, values in rows:
+            for key, family in families.items():
+                value = values.get(key)
+                if value is not None:
+                    family.add_metric([label_value] if self.label else [], value)
+        return list(families.values())
+
+
+def register_stats(name: str, stats: Callable[[], dict], counters: Iterable[str] = (),
+                   gauges: Iterable[str] = (), label: Optional[str] = None):
+    """Expose a component's stats() counters and gauges on /metrics."""
+    REGISTRY.register(StatsCollector(name, stats, counters, gauges, label))
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording request latency, status and in-flight count.
+    
+    Latency runs until the last body chunk is sent, so streamed responses
+    are measured end to end. Unknown paths share one "other" label to
+    keep label cardinality bounded.
+    """
+    
+    def __init__(self, app):
+        self.app = app
+        self._paths = None
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        if self._paths is None:
+            self._paths = {route.path for route in scope["app"].routes}
+        endpoint = scope["path"] if scope["path"] in self._paths else "other"
+        status = {"code": 500}
+        started = time.perf_counter()
+        
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+        
+        in_flight = REQUESTS_IN_FLIGHT.labels(endpoint)
+        in_flight.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            in_flight.dec()
+            REQUEST_LATENCY.labels(endpoint).observe(time.perf_counter() - started)
+            REQUESTS.labels(endpoint, str(status["code"])).inc()
@@ -0,0 +1,117 @@
+"""
+Profiler Utilities
+
+Low-overhead sampling profiler for live workers. A background thread
+snapshots every thread's Python stack at a fixed interval; the result
+is returned as collapsed stacks (the input format of flamegraph.pl and
+speedscope) plus a top-functions summary. Nothing is traced, so the
+application runs at full speed between samples.
+"""
+
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+# Leaf frames that mean a thread is blocked waiting rather than on CPU
+_IDLE_LEAVES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("queue.py", "get"),
+    ("socket.py", "accept"),
+    ("ssl.py", "read"),
+}
+
+_profile_lock = threading.Lock()
+_STDLIB = os.path.dirname(os.__file__) + os.sep
+
+
+def _frame_label(code) -> str:
+    """Function name with a short source path, stable across lines."""
+    path = code.co_filename
+    marker = "site-packages" + os.sep
+    if marker in path:
+        path = path.split(marker, 1)[1]
+    elif path.startswith(_STDLIB):
+        path = path[len(_STDLIB):]
+    elif path.startswith(os.getcwd()):
+        path = os.path.relpath(path)
+    return f"{code.co_name} ({path}:{code.co_firstlineno})"
+
+
+def _is_idle(frame) -> bool:
+    code = frame.f_code
+    return (os.path.basename(code.co_filename), code.co_name) in _IDLE_LEAVES
+
+
+def sample_stacks(seconds: float, interval: float = 0.01, include_idle: bool = False) -> dict:
+    """
+    Sample all thread stacks for a while (blocking; run it in a thread).
+    
+    Args:
+        seconds: How long to sample
+        interval: Seconds between samples
+        include_idle: Keep samples of threads blocked in select/wait/get
+        
+    Returns:
+        Dict with sample counts, a top-functions table and collapsed stacks
+        
+    Raises:
+        RuntimeError: If another profile is already running
+    """
+    if not _profile_lock.acquire(blocking=False):
+        raise RuntimeError("A profile is already running")
+    try:
+        own_id = threading.get_ident()
+        stacks = Counter()
+        samples = 0
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id or (not include_idle and _is_idle(frame)):
+                    continue
+                labels = []
+                while frame is not None:
+                    labels.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                labels.append(names.get(thread_id, f"thread-{thread_id}"))
+                stacks[";".join(reversed(labels))] += 1
+            samples += 1
+            time.sleep(interval)
+    finally:
+        _profile_lock.release()
+    
+    return {
+        "seconds": seconds,
+        "interval_ms": interval * 1000,
+        "samples": samples,
+        "top": _top_functions(stacks),
+        "collapsed": "\n".join(f"{stack} {count}" for stack, count in stacks.most_common())
+    }
+
+
+def _top_functions(stacks: Counter, limit: int = 25) -> list:
+    """Per-function self and inclusive sample counts, busiest first."""
+    own = Counter()
+    total = Counter()
+    for stack, count in stacks.items():
+        frames = stack.split(";")[1:]
+        if not frames:
+            continue
+        own[frames[-1]] += count
+        for frame in set(frames):
+            total[frame] += count
+    
+    on_cpu = sum(own.values()) or 1
+    return [
+        {
+            "function": function,
+            "self": count,
+            "total": total[function],
+            "self_pct": round(100.0 * count / on_cpu, 1),
+            "total_pct": round(100.0 * total[function] / on_cpu, 1)
+        }
+        for function, count in own.most_common(limit)
+    ]